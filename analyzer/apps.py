@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
 
 
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analyzer'
+
+    def ready(self):
+        connection_created.connect(configure_sqlite, dispatch_uid='analyzer.configure_sqlite')
@@ -0,0 +1,135 @@
+"""Async versions of the I/O-bound API endpoints, served under /api/async/
+
+Under an ASGI server (uvicorn repo_analyzer.asgi:application) the waits on GitHub and
+Ollama are awaited on the event loop over pooled connections, so one worker process can
+hold hundreds of slow requests open. DRF's @api_view is sync-only, so these are plain
+Django async views returning the same JSON as their DRF counterparts.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .models import Repository, RepositoryFile, CodeSearch
+from .services.cache_service import AnalysisCache
+from .services.embedding_service import EmbeddingIndex
+from .services.file_listing_service import FileListing
+from .services.ingestion_service import IngestionService, IngestionError, INGEST_MODES
+from .services.llm_service import AsyncFileAnalyzer
+from .services.memory_service import MemoryService
+from .services.text_search import SearchQueryError
+from .views import _flag, _ingestion_response, _search_inputs, _search_options, _search_response
+
+def async_api_view(methods):
+    """Method check, JSON body parsing (as request.data) and CSRF exemption, like @api_view"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+            request.data = request.GET
+            if request.method == 'POST':
+                try:
+                    request.data = json.loads(request.body or b'{}')
+                except ValueError:
+                    return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+                if not isinstance(request.data, dict):
+                    return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+            return await view(request, *args, **kwargs)
+
+        # django.views.decorators.csrf.csrf_exempt would wrap the coroutine in a sync function on Django 4.2
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+@async_api_view(['POST'])
+async def analyze_repository(request):
+    """Load and analyze a GitHub repository, fetching files concurrently on the event loop"""
+    github_url = request.data.get('github_url')
+    if not github_url:
+        return JsonResponse({'error': 'GitHub URL required'}, status=400)
+
+    ingest_mode = request.data.get('ingest_mode') or getattr(settings, 'GITHUB_INGEST_MODE', 'api')
+    if ingest_mode not in INGEST_MODES:
+        return JsonResponse({'error': "ingest_mode must be 'api', 'tarball' or 'zipball'"}, status=400)
+
+    try:
+        result = await IngestionService().aingest(github_url, ingest_mode)
+    except IngestionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    files = None
+    if _flag(request.data.get('include_files', False)):
+        files = await sync_to_async(FileListing.all)(result['repository'])
+    return JsonResponse(_ingestion_response(result, files))
+
+@async_api_view(['POST'])
+async def analyze_file(request):
+    """Analyze a specific file using local LLM"""
+    file_id = request.data.get('file_id')
+
+    try:
+        repo_file = await RepositoryFile.objects.select_related('blob').aget(id=file_id)
+    except (RepositoryFile.DoesNotExist, TypeError, ValueError):
+        return JsonResponse({'error': 'File not found'}, status=404)
+
+    analyzer = AsyncFileAnalyzer()
+    analysis = await analyzer.analyze_file(repo_file.content, repo_file.file_path)
+    await sync_to_async(MemoryService.store_analysis)(repo_file, analysis)
+
+    return JsonResponse({
+        'file_id': repo_file.id,
+        'file_path': repo_file.file_path,
+        'analysis': analysis,
+        'analyzed_at': repo_file.analyzed_at.isoformat(),
+        'token_usage': analyzer.usage.as_dict()
+    })
+
+@async_api_view(['POST'])
+async def search_code(request):
+    """Search code across repository"""
+    repository_id = request.data.get('repository_id')
+    search_query = request.data.get('search_query')
+
+    if not repository_id or not search_query:
+        return JsonResponse({'error': 'Repository ID and search query required'}, status=400)
+
+    try:
+        repository = await Repository.objects.aget(id=repository_id)
+    except (Repository.DoesNotExist, TypeError, ValueError):
+        return JsonResponse({'error': 'Repository not found'}, status=404)
+
+    try:
+        options = _search_options(request.data)
+        files_content, matches, files_searched = await sync_to_async(_search_inputs)(
+            repository, search_query, options
+        )
+    except SearchQueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    snippets = await EmbeddingIndex().asearch(repository, search_query)
+
+    analyzer = AsyncFileAnalyzer()
+    search_results = await analyzer.search_code(files_content, search_query, snippets, matches)
+    await CodeSearch.objects.acreate(repository=repository, search_query=search_query, results=search_results)
+
+    return JsonResponse(_search_response(
+        search_query, search_results, files_searched, files_content, matches, snippets, analyzer.usage.as_dict()
+    ))
+
+@async_api_view(['GET'])
+async def llm_status(request):
+    """Check LLM service status"""
+    analyzer = AsyncFileAnalyzer()
+
+    return JsonResponse({
+        'ollama_available': await analyzer.allm.is_available(),
+        'circuit_open': analyzer.allm.breaker.is_open,
+        'available_models': await analyzer.allm.get_available_models(),
+        'recommended_models': list(analyzer.llm.models.values()),
+        'context_windows': analyzer.llm.known_context_windows(),
+        'token_usage': analyzer.llm.usage.as_dict(),
+        'analysis_cache': await sync_to_async(AnalysisCache.stats)()
+    })
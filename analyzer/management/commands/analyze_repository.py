@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.models import Repository
+from analyzer.services.batch_analysis_service import BatchAnalyzer
+
+
+class Command(BaseCommand):
+    help = 'Analyze every not-yet-analyzed file of a repository with the LLM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('repository_id', type=int)
+        parser.add_argument('--concurrency', type=int, help='Concurrent Ollama requests (default: OLLAMA_PARALLEL)')
+        parser.add_argument('--time-budget', type=float, help='Stop starting new files after this many seconds')
+
+    def handle(self, *args, **options):
+        try:
+            repository = Repository.objects.get(id=options['repository_id'])
+        except Repository.DoesNotExist:
+            raise CommandError(f'Repository {options["repository_id"]} does not exist')
+
+        def progress(**counters):
+            if 'files_total' in counters:
+                self.stdout.write(f'{counters["files_total"]} file(s) pending analysis')
+            elif 'files_analyzed' in counters:
+                self.stdout.write(f'  analyzed {counters["files_analyzed"]}')
+
+        try:
+            result = BatchAnalyzer(options['concurrency'], options['time_budget']).run(repository, progress)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f'{result["files_analyzed"]} analyzed, {result["files_remaining"]} remaining, '
+            f'{len(result["errors"])} error(s) in {result["elapsed_seconds"]}s ({result["stopped_reason"]})'
+        )
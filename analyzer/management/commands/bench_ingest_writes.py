@@ -0,0 +1,75 @@
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from analyzer.models import Repository, RepositoryFile
+from analyzer.services.blob_store import BlobStore
+from analyzer.services.persistence_service import BulkWriter
+from .benchmark import create_scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row and batched RepositoryFile inserts on a synthetic repository, in a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=10000, help='Number of synthetic files')
+        parser.add_argument('--file-size', type=int, default=2000, help='Characters per synthetic file')
+        parser.add_argument('--batch-size', type=int, default=settings.INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        # The baseline changes journal settings, so it never runs against the configured database
+        with tempfile.TemporaryDirectory(prefix='reposcope-bench-') as scratch:
+            old_name = create_scratch_database(scratch)
+            try:
+                self._run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, options):
+        count = options['files']
+        body = ('x = 1\n' * (options['file_size'] // 6 + 1))[:options['file_size']]
+        blob_hash = BlobStore.put(body)
+
+        # Baseline: SQLite defaults and one autocommitted INSERT per file, as ingestion used to do
+        self._set_pragmas({'journal_mode': 'DELETE', 'synchronous': 'FULL'})
+        repository = self._scratch_repository('per-row')
+        started = time.perf_counter()
+        for i in range(count):
+            RepositoryFile.objects.create(
+                repository=repository, file_path=f'src/module_{i}.py', file_type='py',
+                file_size=len(body), blob_id=blob_hash
+            )
+        before = count / (time.perf_counter() - started)
+        repository.delete()
+
+        # Tuned: configured pragmas and chunked bulk_create inside transactions
+        self._set_pragmas(getattr(settings, 'SQLITE_PRAGMAS', {}))
+        repository = self._scratch_repository('bulk')
+        started = time.perf_counter()
+        with BulkWriter(RepositoryFile, batch_size=options['batch_size']) as writer:
+            for i in range(count):
+                writer.create(RepositoryFile(
+                    repository=repository, file_path=f'src/module_{i}.py', directory='src', file_type='py',
+                    file_size=len(body), blob_id=blob_hash
+                ))
+        after = count / (time.perf_counter() - started)
+        repository.delete()
+
+        self.stdout.write(f'files: {count}, batch size: {options["batch_size"]}')
+        self.stdout.write(f'per-row create: {before:,.0f} rows/s')
+        self.stdout.write(f'bulk writer:    {after:,.0f} rows/s ({after / before:.1f}x)')
+
+    def _scratch_repository(self, label):
+        return Repository.objects.create(
+            github_url=f'https://github.com/benchmark/{label}', owner='benchmark', repo_name=f'bench-{label}'
+        )
+
+    def _set_pragmas(self, pragmas):
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            for pragma, value in pragmas.items():
+                cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -0,0 +1,537 @@
+import base64
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from analyzer.models import FileBlob, GitHubCacheEntry, Repository, RepositoryFile
+from .load_test import StubHandler, StubServer, percentile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_OWNER = 'benchmark'
+BENCH_REPO = 'synthetic'
+SCENARIOS = (
+    'analyze_repository', 'analyze_repository_unchanged', 'search_code', 'file_relationships',
+    'preview_file', 'analyze_file',
+)
+RESULT_VERSION = 1
+# Words the synthetic code is written with, so that searches have something to find
+WORDS = (
+    'cache', 'token', 'session', 'parser', 'queue', 'buffer', 'index', 'stream', 'record', 'window',
+    'budget', 'graph', 'symbol', 'metric', 'worker', 'request', 'payload', 'cursor', 'batch', 'shard',
+)
+SEARCH_QUERIES = (
+    'cache token', 'where is the session parser', 'queue buffer', 'compute_3_1', 'Model2',
+    'stream window budget', 'how are records indexed', 'worker request payload',
+)
+# Metrics compared between runs, and whether a larger value is the better one
+COMPARED_METRICS = {
+    'p50_ms': False, 'p95_ms': False, 'throughput_rps': True, 'queries_per_request': False,
+    'peak_memory_kib': False,
+}
+
+
+def _python_module(rng, index, package, imports, lines):
+    path = f'pkg{package}/module_{index}.py'
+    head = [f'"""Synthetic module {index}: {rng.choice(WORDS)} {rng.choice(WORDS)}"""', 'import os']
+    head += [f'from pkg{target_package}.module_{target} import compute_{target}_0' for target, target_package in imports]
+    body = []
+    j = 0
+    while len(head) + len(body) < lines:
+        if j % 4 == 0:
+            body += ['', '', f'class Service{index}_{j}:', f'    """Keeps the {rng.choice(WORDS)} of a {rng.choice(WORDS)}"""', '',
+                     '    def __init__(self, factor):', '        self.factor = factor']
+        body += [
+            '', '',
+            f'def compute_{index}_{j}(value):',
+            f'    """Compute the {rng.choice(WORDS)} {rng.choice(WORDS)} of value"""',
+            f'    result = value + {rng.randint(1, 999)}',
+            f'    for step in range({rng.randint(1, 9)}):',
+            f'        result = result * 3 + step  # {rng.choice(WORDS)}',
+            '    return result',
+        ]
+        j += 1
+    return path, '\n'.join(head + body) + '\n'
+
+
+def _javascript_module(rng, index, package, imports, lines):
+    path = f'web/part{package}/widget{index}.js'
+    head = [f'// Synthetic widget {index}: {rng.choice(WORDS)} {rng.choice(WORDS)}']
+    head += [
+        f"import {{ compute{target}_0 }} from '../part{target_package}/widget{target}.js';"
+        for target, target_package in imports
+    ]
+    body = []
+    j = 0
+    while len(head) + len(body) < lines:
+        body += [
+            '',
+            f'export function compute{index}_{j}(value) {{',
+            f'  // {rng.choice(WORDS)} {rng.choice(WORDS)}',
+            f'  let result = value + {rng.randint(1, 999)};',
+            f'  for (let step = 0; step < {rng.randint(1, 9)}; step++) {{',
+            '    result = result * 3 + step;',
+            '  }',
+            '  return result;',
+            '}',
+        ]
+        j += 1
+    return path, '\n'.join(head + body) + '\n'
+
+
+def _go_module(rng, index, package, imports, lines):
+    path = f'svc/group{package}/handler{index}.go'
+    head = [f'package group{package}', '', 'import (', '\t"fmt"']
+    head += [f'\t"bench/svc/group{target_package}"' for _, target_package in imports if target_package != package]
+    head.append(')')
+    body = []
+    j = 0
+    while len(head) + len(body) < lines:
+        body += [
+            '',
+            f'// Compute{index}_{j} computes the {rng.choice(WORDS)} {rng.choice(WORDS)} of value',
+            f'func Compute{index}_{j}(value int) int {{',
+            f'\tresult := value + {rng.randint(1, 999)}',
+            f'\tfor step := 0; step < {rng.randint(1, 9)}; step++ {{',
+            '\t\tresult = result*3 + step',
+            '\t}',
+            '\treturn result',
+            '}',
+        ]
+        j += 1
+    return path, '\n'.join(head + body) + '\n'
+
+
+def _java_module(rng, index, package, imports, lines):
+    path = f'src/main/java/com/bench/part{package}/Model{index}.java'
+    head = [f'package com.bench.part{package};', '']
+    head += [f'import com.bench.part{target_package}.Model{target};' for target, target_package in imports]
+    head += ['', f'public class Model{index} {{']
+    body = []
+    j = 0
+    while len(head) + len(body) < lines - 1:
+        body += [
+            f'    // {rng.choice(WORDS)} {rng.choice(WORDS)}',
+            f'    public int compute{j}(int value) {{',
+            f'        int result = value + {rng.randint(1, 999)};',
+            f'        for (int step = 0; step < {rng.randint(1, 9)}; step++) {{',
+            '            result = result * 3 + step;',
+            '        }',
+            '        return result;',
+            '    }',
+            '',
+        ]
+        j += 1
+    return path, '\n'.join(head + body + ['}']) + '\n'
+
+
+def _markdown_document(rng, index, package, imports, lines):
+    path = f'docs/section{package}/page{index}.md'
+    text = [f'# Page {index}', '']
+    while len(text) < lines:
+        text.append(' '.join(rng.choice(WORDS) for _ in range(12)))
+    return path, '\n'.join(text) + '\n'
+
+
+GENERATORS = {
+    'py': _python_module,
+    'js': _javascript_module,
+    'go': _go_module,
+    'java': _java_module,
+    'md': _markdown_document,
+}
+
+
+def parse_mix(mix):
+    """'py=50,js=30' -> {'py': 50.0, 'js': 30.0}"""
+    weights = {}
+    for part in mix.split(','):
+        language, _, weight = part.partition('=')
+        language = language.strip()
+        if language not in GENERATORS:
+            raise CommandError(f"Unknown language '{language}'; choose from {', '.join(GENERATORS)}")
+        try:
+            weights[language] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Invalid weight in --languages: {part}')
+    if not weights or sum(weights.values()) <= 0:
+        raise CommandError('--languages needs at least one positive weight')
+    return weights
+
+
+def synthetic_repository(files, mix, lines, seed):
+    """{path: content} of a repository with the given language mix, importing across its own modules
+
+    Sizes vary around lines; the same arguments always give the same repository.
+    """
+    rng = random.Random(seed)
+    total = sum(mix.values())
+    counts = {language: int(files * weight / total) for language, weight in mix.items()}
+    # Rounding leftovers go to the largest share
+    counts[max(mix, key=mix.get)] += files - sum(counts.values())
+
+    tree = {}
+    for language, count in counts.items():
+        packages = max(1, count // 20)
+        for index in range(count):
+            package = index % packages
+            earlier = rng.sample(range(index), min(index, rng.randint(0, 3)))
+            imports = [(target, target % packages) for target in earlier]
+            size = max(10, int(rng.uniform(0.5, 1.5) * lines))
+            path, content = GENERATORS[language](rng, index, package, imports, size)
+            tree[path] = content
+    return tree
+
+
+class BenchmarkStubHandler(StubHandler):
+    """The load_test stubs, serving the synthetic repository and the Ollama endpoints ingestion and search use"""
+
+    def do_GET(self):
+        prefix = f'/repos/{BENCH_OWNER}/{BENCH_REPO}'
+        self.server.count(self.path.split('?')[0] if self.path.startswith('/api/') else 'github')
+        if self.path == '/api/tags':
+            self._json({'models': [{'name': name} for name in self.server.models]})
+        elif self.path == prefix:
+            self._json({'description': 'Synthetic benchmark repository', 'language': 'Python', 'default_branch': 'main'})
+        elif self.path.startswith(f'{prefix}/git/trees/'):
+            self._json({'tree': [
+                {'path': path, 'type': 'blob', 'sha': hashlib.sha1(content.encode()).hexdigest()}
+                for path, content in self.server.files.items()
+            ]})
+        elif self.path.startswith(f'{prefix}/contents/'):
+            content = self.server.files.get(self.path[len(f'{prefix}/contents/'):])
+            if content is None:
+                self._json({}, 404)
+            else:
+                self._json({'size': len(content), 'content': base64.b64encode(content.encode()).decode()})
+        else:
+            self._json({}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.count(self.path)
+        if self.path == '/api/generate':
+            time.sleep(self.server.delay)
+            self._json({
+                'response': 'Stub analysis of the module. ' * 20, 'done': True,
+                'prompt_eval_count': len(body.get('prompt', '')) // 4, 'eval_count': 100,
+            })
+        elif self.path == '/api/show':
+            self._json({'model_info': {'llama.context_length': 8192}})
+        elif self.path == '/api/embed':
+            texts = body.get('input') or []
+            self._json({'embeddings': [stub_embedding(text) for text in texts]})
+        else:
+            self._json({}, 404)
+
+
+def stub_embedding(text):
+    """A fixed 32-dimensional vector per text"""
+    digest = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).digest()
+    return [byte / 255 - 0.5 for byte in digest]
+
+
+class BenchmarkStubServer(StubServer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] += 1
+
+
+class QueryCounter:
+    """execute_wrapper counting the queries run on this thread's connection"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def summarize(latencies, wall_seconds, queries, errors, llm_requests):
+    latencies = sorted(seconds * 1000 for seconds in latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'mean_ms': round(sum(latencies) / count, 2) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p90_ms': round(percentile(latencies, 0.90), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(latencies[-1], 2) if count else 0.0,
+        'throughput_rps': round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        'queries_per_request': round(queries / count, 1) if count else 0.0,
+        'llm_requests_per_request': round(llm_requests / count, 2) if count else 0.0,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Rows of (scenario, metric, before, after, relative change, regressed) for scenarios in both runs"""
+    rows = []
+    for name, after in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def create_scratch_database(scratch):
+    """Point the default connection at a fresh, migrated database in directory scratch
+
+    Returns what connection.creation.destroy_test_db needs to switch back and delete it.
+    """
+    if connection.vendor == 'sqlite':
+        # On disk, like the real database, rather than the in-memory test default
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(scratch) / 'benchmark.sqlite3')
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+class Command(BaseCommand):
+    help = ('Benchmark ingestion, search, relationships, preview and analysis on a synthetic repository '
+            'against fake GitHub and Ollama servers, in a scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=500, help='Files in the synthetic repository')
+        parser.add_argument('--languages', default='py=50,js=25,go=10,java=10,md=5',
+                            help=f"Language mix as ext=weight pairs (from {', '.join(GENERATORS)})")
+        parser.add_argument('--lines', type=int, default=120, help='Average lines per file')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per request scenario')
+        parser.add_argument('--ingest-runs', type=int, default=3, help='Timed runs of the ingestion scenarios')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests before each request scenario')
+        parser.add_argument('--llm-delay', type=float, default=0.0, help='Seconds the fake Ollama takes per generation')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Results JSON of an earlier run to compare with')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative change counted as a regression in --compare (default 0.2)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when --compare finds a regression')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = [name for name in scenarios if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s) {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        files = synthetic_repository(options['files'], parse_mix(options['languages']), options['lines'], options['seed'])
+        self.stdout.write(f'synthetic repository: {len(files)} files, {sum(map(len, files.values())):,} characters')
+
+        stub = BenchmarkStubServer(('127.0.0.1', 0), BenchmarkStubHandler)
+        stub.files = files
+        stub.delay = options['llm_delay']
+        stub.models = ['codellama:7b', 'llama3:8b', getattr(settings, 'OLLAMA_EMBED_MODEL', 'nomic-embed-text')]
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+
+        with tempfile.TemporaryDirectory(prefix='reposcope-bench-') as scratch:
+            overrides = override_settings(
+                OLLAMA_HOST=stub_url, GITHUB_API_URL=stub_url, GITHUB_TOKEN='', JOBS_BACKGROUND_DEFAULT=False,
+                EMBEDDINGS_DIR=Path(scratch) / 'embeddings', ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            )
+            old_name = create_scratch_database(scratch)
+            try:
+                with overrides:
+                    results = self._run(scenarios, stub, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                stub.shutdown()
+
+        results['dataset'] = {
+            'files': len(files),
+            'characters': sum(map(len, files.values())),
+            'by_language': dict(Counter(path.rsplit('.', 1)[-1] for path in files)),
+        }
+        self._report(results)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f'results written to {options["output"]}')
+        if baseline is not None:
+            regressions = self._report_comparison(baseline, results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} metric(s) regressed by more than {options["threshold"]:.0%}')
+
+    def _run(self, scenarios, stub, options):
+        client = Client(raise_request_exception=False)
+        github_url = f'https://github.com/{BENCH_OWNER}/{BENCH_REPO}'
+        ingest = lambda i: client.post('/api/analyze-repository/', {
+            'github_url': github_url, 'ingest_mode': 'api', 'include_files': False,
+        }, content_type='application/json')
+
+        results = {
+            'version': RESULT_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'environment': self._environment(),
+            'parameters': {key: options[key] for key in (
+                'files', 'languages', 'lines', 'seed', 'requests', 'ingest_runs', 'warmup', 'llm_delay'
+            )},
+            'scenarios': {},
+        }
+
+        for name in ('analyze_repository', 'analyze_repository_unchanged'):
+            if name in scenarios:
+                # A cold run starts from an empty database; an unchanged run re-ingests what is stored
+                setup = self._clear_repository if name == 'analyze_repository' else self._ensure_ingested(ingest)
+                results['scenarios'][name] = self._measure(name, ingest, stub, options['ingest_runs'], 0, setup)
+
+        self._ensure_ingested(ingest)(0)
+        repository = Repository.objects.get(owner=BENCH_OWNER, repo_name=BENCH_REPO)
+        file_ids = list(RepositoryFile.objects.filter(repository=repository).order_by('file_path').values_list('id', flat=True))
+        source_ids = list(RepositoryFile.objects.filter(repository=repository).exclude(file_type='md').order_by(
+            'file_path'
+        ).values_list('id', flat=True)) or file_ids
+        pick = lambda ids, i: ids[(i * 7919) % len(ids)]  # Spread over the repository, the same on every run
+
+        requests = {
+            'search_code': lambda i: client.post('/api/search-code/', {
+                'repository_id': repository.id, 'search_query': SEARCH_QUERIES[i % len(SEARCH_QUERIES)],
+            }, content_type='application/json'),
+            'file_relationships': lambda i: client.get(f'/api/file-relationships/{pick(source_ids, i)}/?depth=2'),
+            'preview_file': lambda i: client.get(f'/api/preview-file/{pick(file_ids, i)}/'),
+            # Each request analyzes a file not analyzed before (while the repository has enough of them)
+            'analyze_file': lambda i: client.post('/api/analyze-file/', {
+                'file_id': source_ids[i % len(source_ids)], 'background': False,
+            }, content_type='application/json'),
+        }
+        for name, request in requests.items():
+            if name in scenarios:
+                results['scenarios'][name] = self._measure(name, request, stub, options['requests'], options['warmup'])
+
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            results['max_rss_kib'] = max_rss // 1024 if platform.system() == 'Darwin' else max_rss
+        return results
+
+    def _measure(self, name, request, stub, runs, warmup, setup=None):
+        """Time runs requests, then one more under tracemalloc for the peak memory of a request"""
+        self.stdout.write(f'{name}: {runs} run(s)')
+        for i in range(warmup):
+            request(-1 - i)
+
+        latencies = []
+        errors = 0
+        counter = QueryCounter()
+        llm_before = stub.requests['/api/generate']
+        wall = 0.0
+        for i in range(runs):
+            if setup:
+                setup(i)
+            # Only the main thread's connection is counted; ingestion writes from there too
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = request(i)
+                elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            wall += elapsed
+            if response.status_code >= 400:
+                errors += 1
+                self.stderr.write(f'  {name} run {i}: HTTP {response.status_code} {response.content[:200]!r}')
+        result = summarize(latencies, wall, counter.count, errors, stub.requests['/api/generate'] - llm_before)
+
+        if setup:
+            setup(runs)
+        tracemalloc.start()
+        try:
+            request(runs)
+            result['peak_memory_kib'] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+        return result
+
+    @staticmethod
+    def _clear_repository(i=0):
+        Repository.objects.filter(owner=BENCH_OWNER, repo_name=BENCH_REPO).delete()
+        # Stored blobs and cached GitHub responses would let a cold run skip its downloads
+        FileBlob.objects.all().delete()
+        GitHubCacheEntry.objects.all().delete()
+
+    @staticmethod
+    def _ensure_ingested(ingest):
+        def setup(i):
+            if not Repository.objects.filter(owner=BENCH_OWNER, repo_name=BENCH_REPO).exists():
+                ingest(i)
+        return setup
+
+    @staticmethod
+    def _environment():
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        }
+
+    def _report(self, results):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"scenario":<30}{"runs":>6}{"err":>5}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+            f'{"req/s":>9}{"queries":>9}{"peak KiB":>10}'
+        )
+        for name, result in results['scenarios'].items():
+            self.stdout.write(
+                f'{name:<30}{result["requests"]:>6}{result["errors"]:>5}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["p99_ms"]:>10.1f}{result["max_ms"]:>10.1f}{result["throughput_rps"]:>9.1f}'
+                f'{result["queries_per_request"]:>9.1f}{result["peak_memory_kib"]:>10,}'
+            )
+        if 'max_rss_kib' in results:
+            self.stdout.write(f'max RSS: {results["max_rss_kib"]:,} KiB')
+
+    def _report_comparison(self, baseline, results, threshold):
+        """Print the changes against baseline; returns the number of regressed metrics"""
+        if baseline.get('parameters') != results['parameters']:
+            self.stderr.write('warning: the baseline was run with different parameters')
+        rows = compare(baseline, results, threshold)
+        self.stdout.write('')
+        self.stdout.write(f'compared with {baseline.get("environment", {}).get("git_commit") or "baseline"}:')
+        for name, metric, old, new, change, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            self.stdout.write(f'  {name:<30}{metric:<22}{old:>12,.1f} -> {new:>12,.1f} ({change:+.0%}){flag}')
+        return sum(1 for row in rows if row[-1])
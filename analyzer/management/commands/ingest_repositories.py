@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.services.ingestion_service import INGEST_MODES, IngestionError, IngestionService
+
+
+class Command(BaseCommand):
+    help = 'Ingest several GitHub repositories in one run that shares a single pool of GitHub requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('github_urls', nargs='*', help='Repository URLs')
+        parser.add_argument('--file', help='Read repository URLs from this file, one per line (# starts a comment)')
+        parser.add_argument('--mode', choices=INGEST_MODES, help='Ingest mode (default: GITHUB_INGEST_MODE)')
+        parser.add_argument('--concurrency', type=int, help='Concurrent GitHub requests (default: GITHUB_FETCH_CONCURRENCY)')
+        parser.add_argument('--json', action='store_true', help='Print the full summary as JSON')
+
+    def handle(self, *args, **options):
+        github_urls = list(options['github_urls'])
+        if options['file']:
+            try:
+                with open(options['file']) as url_file:
+                    lines = [line.split('#', 1)[0].strip() for line in url_file]
+            except OSError as e:
+                raise CommandError(str(e))
+            github_urls += [line for line in lines if line]
+        if not github_urls:
+            raise CommandError('Give repository URLs as arguments or with --file')
+
+        ingest_mode = options['mode'] or getattr(settings, 'GITHUB_INGEST_MODE', 'api')
+        try:
+            result = IngestionService().ingest_many(github_urls, ingest_mode, concurrency=options['concurrency'])
+        except IngestionError as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        for summary in result['repositories']:
+            timings = summary['timings']
+            if summary['status'] == 'failed':
+                self.stdout.write(self.style.ERROR(f"{summary['github_url']}: failed: {summary['error']}"))
+                continue
+            changes = summary['changes']
+            self.stdout.write(
+                f"{summary['github_url']}: {summary['total_files']} files "
+                f"(+{changes['added']} ~{changes['updated']} -{changes['removed']}, "
+                f"{len(summary['failed_files'])} failed), "
+                f"{summary['files_fetched']} fetched, {summary['files_reused']} reused; "
+                f"done at {timings['total_seconds']}s (listing {timings.get('listing_seconds', 0)}s, "
+                f"fetch {timings['fetch_seconds']}s, store {timings['store_seconds']}s)"
+            )
+        self.stdout.write(
+            f"{result['succeeded']} ingested, {result['failed']} failed, {result['files_fetched']} files fetched, "
+            f"{result['files_reused']} reused in {result['elapsed_seconds']}s"
+        )
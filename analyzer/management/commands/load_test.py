@@ -0,0 +1,209 @@
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STUB_OWNER = 'loadtest'
+STUB_REPO = 'demo'
+ENDPOINTS = ('search', 'analyze-file', 'llm-status')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Slow fake Ollama and GitHub APIs; the server carries delay and the synthetic files"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        files = self.server.files
+        prefix = f'/repos/{STUB_OWNER}/{STUB_REPO}'
+        if self.path == '/api/tags':
+            self._json({'models': [{'name': 'codellama:7b'}, {'name': 'llama3:8b'}]})
+        elif self.path == prefix:
+            self._json({'description': 'Load test repository', 'language': 'Python', 'default_branch': 'main'})
+        elif self.path.startswith(f'{prefix}/git/trees/'):
+            self._json({'tree': [{'path': path, 'type': 'blob', 'sha': f'{i:040x}'} for i, path in enumerate(files)]})
+        elif self.path.startswith(f'{prefix}/contents/'):
+            content = files.get(self.path[len(f'{prefix}/contents/'):])
+            if content is None:
+                self._json({}, 404)
+            else:
+                self._json({'size': len(content), 'content': base64.b64encode(content.encode()).decode()})
+        else:
+            self._json({}, 404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/api/generate':
+            time.sleep(self.server.delay)  # Stands in for the model generating
+            self._json({'response': 'Stub analysis. ' * 20, 'done': True})
+        else:
+            self._json({}, 404)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = 'Drive the async (or, with --sync, the DRF) endpoints with concurrent requests against stub Ollama/GitHub servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='search')
+        parser.add_argument('--requests', type=int, default=1000, help='Total requests to send')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once')
+        parser.add_argument('--llm-delay', type=float, default=1.0, help='Seconds the stub takes per generation')
+        parser.add_argument('--files', type=int, default=50, help='Files in the stub repository')
+        parser.add_argument('--sync', action='store_true', help='Target the sync endpoints instead of /api/async/')
+        parser.add_argument('--url', help='Server to test instead of starting uvicorn; it must use the stub '
+                                          'servers (see --stub-port) as OLLAMA_HOST and GITHUB_API_URL')
+        parser.add_argument('--stub-port', type=int, default=0, help='Port for the stub servers (default: any free port)')
+
+    def handle(self, *args, **options):
+        stub = StubServer(('127.0.0.1', options['stub_port']), StubHandler)
+        stub.delay = options['llm_delay']
+        stub.files = {
+            f'pkg/module_{i}.py': f'def handler_{i}(request):\n    """Handle request {i}"""\n    return request\n'
+            for i in range(options['files'])
+        }
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+        self.stdout.write(f'stub servers: {stub_url}')
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server, base_url = self._start_uvicorn(stub_url)
+        try:
+            asyncio.run(self._run(base_url.rstrip('/'), options, server.pid if server else None))
+        finally:
+            stub.shutdown()
+            if server:
+                server.terminate()
+                server.wait(10)
+
+    def _start_uvicorn(self, stub_url):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, OLLAMA_HOST=stub_url, GITHUB_API_URL=stub_url, GITHUB_TOKEN='')
+        env.setdefault('DEBUG', 'True')  # Without DEBUG, ALLOWED_HOSTS is empty and every request gets a 400
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'repo_analyzer.asgi:application',
+             '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--backlog', '2048'],
+            cwd=settings.BASE_DIR, env=env
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('uvicorn exited; is it installed (pip install -r requirements.txt)?')
+            try:
+                httpx.get(f'{base_url}/api/async/llm-status/', timeout=2)
+                self.stdout.write(f'uvicorn: {base_url}')
+                return server, base_url
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('uvicorn did not start within 30 seconds')
+
+    @staticmethod
+    def _thread_count(pid):
+        """Threads of a local process, from /proc (None where that is not available)"""
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('Threads:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    async def _run(self, base_url, options, server_pid=None):
+        prefix = '/api/' if options['sync'] else '/api/async/'
+        limits = httpx.Limits(max_connections=options['concurrency'], max_keepalive_connections=options['concurrency'])
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+            response = await client.post(f'{prefix}analyze-repository/', json={
+                'github_url': f'https://github.com/{STUB_OWNER}/{STUB_REPO}', 'ingest_mode': 'api'
+            })
+            if response.status_code != 200:
+                raise CommandError(f'Seeding the stub repository failed: {response.status_code} {response.text[:200]}')
+            seeded = response.json()
+            file_ids = [file['id'] for file in seeded['files']]
+            self.stdout.write(f"seeded repository {seeded['repository_id']} with {len(file_ids)} files")
+
+            def request_for(i):
+                if options['endpoint'] == 'llm-status':
+                    return client.get(f'{prefix}llm-status/')
+                if options['endpoint'] == 'analyze-file':
+                    # Cycling through the files; once every file is analyzed the cache answers instead of the LLM
+                    return client.post(f'{prefix}analyze-file/', json={'file_id': file_ids[i % len(file_ids)]})
+                return client.post(f'{prefix}search-code/', json={
+                    'repository_id': seeded['repository_id'], 'search_query': f'handler_{i % len(file_ids)}'
+                })
+
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            latencies, statuses = [], Counter()
+
+            async def one(i):
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await request_for(i)
+                        statuses[response.status_code] += 1
+                    except httpx.HTTPError as e:
+                        statuses[type(e).__name__] += 1
+                    latencies.append(time.perf_counter() - started)
+
+            peak_threads = 0
+
+            async def watch_threads():
+                nonlocal peak_threads
+                while True:
+                    peak_threads = max(peak_threads, self._thread_count(server_pid) or 0)
+                    await asyncio.sleep(0.05)
+
+            watcher = asyncio.create_task(watch_threads()) if server_pid else None
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(options['requests'])))
+            elapsed = time.perf_counter() - started
+            if watcher:
+                watcher.cancel()
+
+        latencies.sort()
+        self.stdout.write(f"{options['requests']} x {prefix}{options['endpoint']} "
+                          f"at concurrency {options['concurrency']}, stub LLM delay {options['llm_delay']}s")
+        self.stdout.write(f'elapsed:    {elapsed:.2f}s ({options["requests"] / elapsed:.1f} req/s)')
+        self.stdout.write('latency:    p50 {:.3f}s  p90 {:.3f}s  p99 {:.3f}s  max {:.3f}s'.format(
+            percentile(latencies, 0.5), percentile(latencies, 0.9), percentile(latencies, 0.99), latencies[-1]
+        ))
+        self.stdout.write(f'responses:  {dict(statuses)}')
+        if peak_threads:
+            self.stdout.write(f'server threads (peak): {peak_threads}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.models import Repository
+from analyzer.services.dependency_service import DependencyGraph
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the import graph for one or all repositories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('repository_ids', nargs='*', type=int, help='Repositories to process (default: all)')
+
+    def handle(self, *args, **options):
+        repositories = Repository.objects.all()
+        if options['repository_ids']:
+            repositories = repositories.filter(id__in=options['repository_ids'])
+
+        for repository in repositories:
+            DependencyGraph.rebuild(repository)
+            self.stdout.write(f'Rebuilt import graph for {repository} ({repository.dependencies.count()} edges)')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.models import Repository
+from analyzer.services.embedding_service import EmbeddingIndex
+
+
+class Command(BaseCommand):
+    help = 'Embed new or changed code chunks for semantic search, for one or all repositories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('repository_ids', nargs='*', type=int, help='Repositories to index (default: all)')
+
+    def handle(self, *args, **options):
+        repositories = Repository.objects.all()
+        if options['repository_ids']:
+            repositories = repositories.filter(id__in=options['repository_ids'])
+
+        index = EmbeddingIndex()
+        for repository in repositories:
+            result = index.update(repository)
+            self.stdout.write(f'{repository}: {result}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.models import Repository
+from analyzer.services.symbol_index import SymbolIndex
+
+
+class Command(BaseCommand):
+    help = 'Re-extract the class/function symbol table for one or all repositories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('repository_ids', nargs='*', type=int, help='Repositories to index (default: all)')
+
+    def handle(self, *args, **options):
+        repositories = Repository.objects.all()
+        if options['repository_ids']:
+            repositories = repositories.filter(id__in=options['repository_ids'])
+
+        for repository in repositories:
+            SymbolIndex.rebuild(repository)
+            self.stdout.write(f'Indexed {repository}: {repository.symbols.count()} symbols')
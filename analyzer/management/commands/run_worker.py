@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from analyzer.services.job_service import JobService
+
+
+class Command(BaseCommand):
+    help = 'Process queued ingestion and analysis jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained instead of polling forever')
+
+    def handle(self, *args, **options):
+        service = JobService()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        requeued = service.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s)')
+        self.stdout.write(f'Worker {service.worker_id} started')
+
+        while not self.stopping:
+            close_old_connections()
+            job = service.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running job {job.id} ({job.kind})')
+            service.run(job)
+            job.refresh_from_db()
+            self.stdout.write(f'Job {job.id} {job.status}')
+
+        self.stdout.write('Worker stopped')
+
+    def _stop(self, signum, frame):
+        # Finish the current job, then exit the loop
+        self.stopping = True
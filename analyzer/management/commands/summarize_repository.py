@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.models import Repository
+from analyzer.services.summary_service import RepositorySummarizer
+
+
+class Command(BaseCommand):
+    help = 'Build or refresh the LLM summary of a repository and its directories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('repository_id', type=int)
+        parser.add_argument('--concurrency', type=int, help='Concurrent Ollama requests (default: OLLAMA_PARALLEL)')
+
+    def handle(self, *args, **options):
+        try:
+            repository = Repository.objects.get(id=options['repository_id'])
+        except Repository.DoesNotExist:
+            raise CommandError(f'Repository {options["repository_id"]} does not exist')
+
+        def progress(**counters):
+            if 'files_total' in counters:
+                self.stdout.write(f'{counters["files_total"]} director(ies) to summarize')
+            elif 'files_analyzed' in counters:
+                self.stdout.write(f'  summarized {counters["files_analyzed"]}')
+
+        try:
+            result = RepositorySummarizer(options['concurrency']).run(repository, progress)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f'{result["nodes_generated"]} summarized, {result["nodes_reused"]} reused, '
+            f'{len(result["errors"])} error(s) in {result["elapsed_seconds"]}s'
+        )
+        if result['summary']:
+            self.stdout.write(result['summary'])
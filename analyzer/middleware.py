@@ -0,0 +1,54 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from .services import metrics
+
+
+class InstrumentationMiddleware:
+    """Per-request wall time, database queries and upstream calls, as metrics and a Server-Timing header
+
+    Removed from the stack at startup unless METRICS_ENABLED is set, so it costs nothing when off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        metrics.install_db_instrumentation()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timings)
+
+    @staticmethod
+    def _finish(request, response, timings):
+        # The URL pattern rather than the path, so ids do not make a series per object
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        # A streamed response is timed to its headers; the body is produced after this returns
+        elapsed = metrics.record_request(request.method, route, response.status_code, timings)
+        header = timings.server_timing(elapsed)
+        if response.has_header('Server-Timing'):
+            header = f"{response['Server-Timing']}, {header}"
+        response['Server-Timing'] = header
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositoryfile',
+            name='sha',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_repositoryfile_sha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ingest_repository', 'Ingest repository'), ('analyze_file', 'Analyze file')], max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('files_total', models.IntegerField(default=0)),
+                ('files_fetched', models.IntegerField(default=0)),
+                ('files_analyzed', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('attempts', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('repository', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='analyzer.repository')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='analyzer_jo_status_7d972d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('lines', models.TextField()),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='analyzer.repositoryfile')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='analyzer.repository')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['repository', 'term'], name='analyzer_se_reposit_8a3705_idx')],
+                'unique_together': {('file', 'term')},
+            },
+        ),
+    ]
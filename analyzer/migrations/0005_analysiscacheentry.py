@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_searchposting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('result', models.TextField()),
+                ('size', models.IntegerField(default=0)),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_analysiscacheentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest_repository', 'Ingest repository'), ('analyze_file', 'Analyze file'), ('analyze_repository', 'Analyze all repository files')], max_length=50),
+        ),
+    ]
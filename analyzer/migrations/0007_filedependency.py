@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_job_kind_analyze_repository'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('specifier', models.CharField(blank=True, max_length=300)),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependencies', to='analyzer.repository')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='analyzer.repositoryfile')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imported_by', to='analyzer.repositoryfile')),
+            ],
+            options={
+                'unique_together': {('source', 'target')},
+            },
+        ),
+    ]
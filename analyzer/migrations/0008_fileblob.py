@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+import zlib
+
+
+def move_content_to_blobs(apps, schema_editor):
+    FileBlob = apps.get_model('analyzer', 'FileBlob')
+    RepositoryFile = apps.get_model('analyzer', 'RepositoryFile')
+    stored = set(FileBlob.objects.values_list('hash', flat=True))
+    for file_id, content in RepositoryFile.objects.values_list('id', 'content').iterator():
+        raw = content.encode('utf-8', 'surrogatepass')
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest not in stored:
+            FileBlob.objects.create(hash=digest, data=zlib.compress(raw, 6), size=len(content))
+            stored.add(digest)
+        RepositoryFile.objects.filter(id=file_id).update(blob_id=digest)
+
+
+def restore_content(apps, schema_editor):
+    FileBlob = apps.get_model('analyzer', 'FileBlob')
+    RepositoryFile = apps.get_model('analyzer', 'RepositoryFile')
+    for blob in FileBlob.objects.iterator():
+        content = zlib.decompress(blob.data).decode('utf-8', 'surrogatepass')
+        RepositoryFile.objects.filter(blob_id=blob.hash).update(content=content)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_filedependency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='repositoryfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='analyzer.fileblob'),
+        ),
+        migrations.RunPython(move_content_to_blobs, restore_content),
+        # A default lets the column be recreated when migrating backwards
+        migrations.AlterField(
+            model_name='repositoryfile',
+            name='content',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='repositoryfile',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:14
+
+from django.db import migrations, models
+import struct
+import zlib
+
+LINE_INDEX_STEP = 64
+
+
+def index_lines(apps, schema_editor):
+    FileBlob = apps.get_model('analyzer', 'FileBlob')
+    for blob in FileBlob.objects.iterator():
+        lines = zlib.decompress(blob.data).decode('utf-8', 'surrogatepass').splitlines(keepends=True)
+        offsets = []
+        position = 0
+        for start in range(0, len(lines), LINE_INDEX_STEP):
+            offsets.append(position)
+            position += len(''.join(lines[start:start + LINE_INDEX_STEP]).encode('utf-8', 'surrogatepass'))
+        FileBlob.objects.filter(hash=blob.hash).update(
+            line_count=len(lines), line_index=struct.pack(f'<{len(offsets)}I', *offsets)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_fileblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='line_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='line_index',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(index_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0009_fileblob_line_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepositoryEmbeddings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('dimensions', models.IntegerField(default=0)),
+                ('chunk_count', models.IntegerField(default=0)),
+                ('generation', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('repository', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='analyzer.repository')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmbeddingChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blob_hash', models.CharField(max_length=64)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('start_line', models.IntegerField()),
+                ('end_line', models.IntegerField()),
+                ('row', models.IntegerField()),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_chunks', to='analyzer.repositoryfile')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_chunks', to='analyzer.repository')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['repository', 'row'], name='analyzer_em_reposit_4e23d1_idx')],
+            },
+        ),
+    ]
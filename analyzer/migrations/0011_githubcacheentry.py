@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0010_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('body', models.BinaryField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
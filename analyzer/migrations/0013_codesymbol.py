@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0012_job_kind_ingest_repositories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSymbol',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('qualified_name', models.CharField(max_length=500)),
+                ('kind', models.CharField(max_length=20)),
+                ('signature', models.CharField(max_length=300)),
+                ('start_line', models.IntegerField()),
+                ('end_line', models.IntegerField()),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symbols', to='analyzer.repositoryfile')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symbols', to='analyzer.repository')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['repository', 'name'], name='analyzer_co_reposit_146409_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0013_codesymbol'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest_repository', 'Ingest repository'), ('ingest_repositories', 'Ingest several repositories'), ('analyze_file', 'Analyze file'), ('analyze_repository', 'Analyze all repository files'), ('summarize_repository', 'Summarize repository')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='SummaryNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('input_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('summary', models.TextField()),
+                ('file_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_nodes', to='analyzer.repository')),
+            ],
+            options={
+                'unique_together': {('repository', 'path')},
+            },
+        ),
+    ]
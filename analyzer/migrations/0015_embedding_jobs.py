@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0014_summarynode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositoryembeddings',
+            name='complete',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('ingest_repository', 'Ingest repository'), ('ingest_repositories', 'Ingest several repositories'), ('analyze_file', 'Analyze file'), ('analyze_repository', 'Analyze all repository files'), ('summarize_repository', 'Summarize repository'), ('embed_repository', 'Index repository embeddings')], max_length=50),
+        ),
+    ]
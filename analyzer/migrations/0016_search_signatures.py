@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0015_embedding_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrams', models.BinaryField()),
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_signature', to='analyzer.repositoryfile')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_signatures', to='analyzer.repository')),
+            ],
+        ),
+    ]
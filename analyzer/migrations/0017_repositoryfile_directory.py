@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:29
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import posixpath
+
+
+def fill_directories(apps, schema_editor):
+    RepositoryFile = apps.get_model('analyzer', 'RepositoryFile')
+    ids_by_directory = defaultdict(list)
+    for file_id, file_path in RepositoryFile.objects.values_list('id', 'file_path').iterator():
+        ids_by_directory[posixpath.dirname(file_path)].append(file_id)
+    for directory, ids in ids_by_directory.items():
+        if not directory:
+            continue
+        for start in range(0, len(ids), 500):
+            RepositoryFile.objects.filter(id__in=ids[start:start + 500]).update(directory=directory)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0016_search_signatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositoryfile',
+            name='directory',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.RunPython(fill_directories, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='repositoryfile',
+            index=models.Index(fields=['repository', 'directory'], name='analyzer_re_reposit_8324b5_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0017_repositoryfile_directory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_bytes', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
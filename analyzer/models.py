@@ -1,5 +1,9 @@
 from django.db import models
+import hashlib
 import json
+import posixpath
+import struct
+import zlib
 
 class Repository(models.Model):
     github_url = models.URLField()
@@ -15,32 +19,135 @@ class Repository(models.Model):
     class Meta:
         unique_together = ['owner', 'repo_name']
 
+LINE_INDEX_STEP = 64  # Lines between two entries of FileBlob.line_index
+
+class FileBlob(models.Model):
+    """File content stored once per distinct text, zlib compressed and shared by every repository"""
+    hash = models.CharField(max_length=64, primary_key=True)  # SHA-256 of the UTF-8 text
+    data = models.BinaryField()
+    size = models.IntegerField(default=0)  # Uncompressed length in characters
+    line_count = models.IntegerField(default=0)
+    line_index = models.BinaryField(default=b'')  # UTF-8 byte offset of every LINE_INDEX_STEP-th line, uint32 LE
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.hash[:12]
+    
+    @classmethod
+    def from_text(cls, text: str) -> 'FileBlob':
+        """Unsaved blob holding text, with its hash and line index computed"""
+        line_count, line_index = cls.build_line_index(text)
+        return cls(
+            hash=cls.hash_text(text), data=cls.compress(text), size=len(text),
+            line_count=line_count, line_index=line_index
+        )
+    
+    @staticmethod
+    def build_line_index(text: str):
+        """(line count, packed offsets) using the same line breaks as str.splitlines"""
+        lines = text.splitlines(keepends=True)
+        offsets = []
+        position = 0
+        for start in range(0, len(lines), LINE_INDEX_STEP):
+            offsets.append(position)
+            position += len(''.join(lines[start:start + LINE_INDEX_STEP]).encode('utf-8', 'surrogatepass'))
+        return len(lines), struct.pack(f'<{len(offsets)}I', *offsets)
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+    
+    @staticmethod
+    def compress(text: str) -> bytes:
+        return zlib.compress(text.encode('utf-8', 'surrogatepass'), 6)
+    
+    @staticmethod
+    def decompress(data) -> str:
+        return zlib.decompress(data).decode('utf-8', 'surrogatepass')
+    
+    @property
+    def text(self) -> str:
+        return self.decompress(self.data)
+    
+    def read_lines(self, start: int, count: int):
+        """Lines start .. start+count-1 (0-based), decompressing only up to the last one needed"""
+        if count <= 0 or start >= self.line_count:
+            return []
+        index = bytes(self.line_index)
+        blocks = len(index) // 4
+        first_block = start // LINE_INDEX_STEP
+        end_block = (min(start + count, self.line_count) - 1) // LINE_INDEX_STEP + 1
+        begin = struct.unpack_from('<I', index, first_block * 4)[0]
+        
+        if end_block < blocks:
+            end = struct.unpack_from('<I', index, end_block * 4)[0]
+            raw = zlib.decompressobj().decompress(self.data, end)
+        else:
+            end = None
+            raw = zlib.decompress(self.data)
+        
+        window = raw[begin:end].decode('utf-8', 'surrogatepass').splitlines()
+        skip = start - first_block * LINE_INDEX_STEP
+        return window[skip:skip + count]
+
 class RepositoryFile(models.Model):
     repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='files')
     file_path = models.CharField(max_length=500)
+    directory = models.CharField(max_length=500, blank=True)  # dirname of file_path, '' at the root
     file_type = models.CharField(max_length=50)
     file_size = models.IntegerField(default=0)
-    content = models.TextField()
+    sha = models.CharField(max_length=40, blank=True)  # Git blob SHA, used for incremental re-ingestion
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='files')
     content_preview = models.TextField(blank=True)  # First 50 lines for preview
     analysis = models.TextField(blank=True)
     analyzed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ['repository', 'file_path']
+        indexes = [models.Index(fields=['repository', 'directory'])]
+    
+    @property
+    def content(self) -> str:
+        """File text, read from the blob store only when asked for"""
+        if '_pending_content' in self.__dict__:
+            return self._pending_content
+        return self.blob.text if self.blob_id else ''
+    
+    @content.setter
+    def content(self, text: str):
+        # Written to the blob store on save(); bulk writers must set blob_id themselves
+        self._pending_content = text
+    
+    def save(self, *args, **kwargs):
+        # Bulk writers bypass save() and must set directory themselves
+        self.directory = posixpath.dirname(self.file_path)
+        if '_pending_content' in self.__dict__:
+            text = self.__dict__.pop('_pending_content')
+            blob = FileBlob.from_text(text)
+            self.blob, _ = FileBlob.objects.get_or_create(
+                hash=blob.hash,
+                defaults={field: getattr(blob, field) for field in ('data', 'size', 'line_count', 'line_index')}
+            )
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'blob'}
+        super().save(*args, **kwargs)
     
     def get_preview(self, lines=50):
         """Get file preview with line numbers"""
         if self.content_preview:
             return self.content_preview
         
-        lines_list = self.content.splitlines()[:lines]
+        if not self.blob_id:
+            return ''
+        
+        lines_list = self.blob.read_lines(0, lines)
         preview = "\n".join([f"{i+1:4d} | {line}" for i, line in enumerate(lines_list)])
         
-        if len(self.content.splitlines()) > lines:
-            preview += f"\n\n... ({len(self.content.splitlines()) - lines} more lines)"
+        if self.blob.line_count > lines:
+            preview += f"\n\n... ({self.blob.line_count - lines} more lines)"
         
         self.content_preview = preview
-        self.save()
+        self.save(update_fields=['content_preview'])
         return preview
 
 class CodeSearch(models.Model):
@@ -51,3 +158,187 @@ class CodeSearch(models.Model):
     
     def __str__(self):
         return f"Search: {self.search_query} in {self.repository}"
+
+class Job(models.Model):
+    KIND_INGEST_REPOSITORY = 'ingest_repository'
+    KIND_ANALYZE_FILE = 'analyze_file'
+    KIND_ANALYZE_REPOSITORY = 'analyze_repository'
+    KIND_INGEST_REPOSITORIES = 'ingest_repositories'
+    KIND_SUMMARIZE_REPOSITORY = 'summarize_repository'
+    KIND_EMBED_REPOSITORY = 'embed_repository'
+    KIND_CHOICES = [
+        (KIND_INGEST_REPOSITORY, 'Ingest repository'),
+        (KIND_INGEST_REPOSITORIES, 'Ingest several repositories'),
+        (KIND_ANALYZE_FILE, 'Analyze file'),
+        (KIND_ANALYZE_REPOSITORY, 'Analyze all repository files'),
+        (KIND_SUMMARIZE_REPOSITORY, 'Summarize repository'),
+        (KIND_EMBED_REPOSITORY, 'Index repository embeddings'),
+    ]
+    
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    files_total = models.IntegerField(default=0)
+    files_fetched = models.IntegerField(default=0)
+    files_analyzed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Doubles as the worker heartbeat
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+    
+    def __str__(self):
+        return f"Job {self.id}: {self.kind} ({self.status})"
+    
+    def as_dict(self):
+        """Serialize job state for the status endpoints"""
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'repository_id': self.repository_id,
+            'progress': {
+                'files_total': self.files_total,
+                'files_fetched': self.files_fetched,
+                'files_analyzed': self.files_analyzed,
+            },
+            'errors': self.errors,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class SearchPosting(models.Model):
+    """Inverted index entry: the lines of one file that contain a term"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='search_postings')
+    file = models.ForeignKey(RepositoryFile, on_delete=models.CASCADE, related_name='search_postings')
+    term = models.CharField(max_length=100)
+    lines = models.TextField()  # Space separated, 0-based line numbers
+    
+    class Meta:
+        unique_together = ['file', 'term']
+        indexes = [models.Index(fields=['repository', 'term'])]
+
+class SearchSignature(models.Model):
+    """Hashed trigrams of one file, enough to rule it out of a substring search without reading it"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='search_signatures')
+    file = models.OneToOneField(RepositoryFile, on_delete=models.CASCADE, related_name='search_signature')
+    trigrams = models.BinaryField()  # Bit set of TRIGRAM_BITS bits, little-endian
+
+class AnalysisCacheEntry(models.Model):
+    """LLM output keyed by a hash of content, model, prompt version and generation options"""
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    result = models.TextField()
+    size = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.model}: {self.key[:12]}"
+
+class AnalysisCacheUsage(models.Model):
+    """Running total of AnalysisCacheEntry sizes in a single row, so storing an entry need not sum the table"""
+    total_bytes = models.BigIntegerField(default=0)
+
+class GitHubCacheEntry(models.Model):
+    """Last GitHub API response for a URL, replayed when a conditional request comes back 304"""
+    key = models.CharField(max_length=64, unique=True)  # SHA-256 of the URL and the credentials used
+    url = models.TextField()
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField()  # zlib compressed JSON
+    hit_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.url
+
+class FileDependency(models.Model):
+    """Import edge: source file imports target file"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='dependencies')
+    source = models.ForeignKey(RepositoryFile, on_delete=models.CASCADE, related_name='imports')
+    target = models.ForeignKey(RepositoryFile, on_delete=models.CASCADE, related_name='imported_by')
+    specifier = models.CharField(max_length=300, blank=True)  # Import text as written in the source
+    
+    class Meta:
+        unique_together = ['source', 'target']
+
+class RepositoryEmbeddings(models.Model):
+    """The on-disk embedding matrix currently serving a repository"""
+    repository = models.OneToOneField(Repository, on_delete=models.CASCADE, related_name='embeddings')
+    model = models.CharField(max_length=100)
+    dimensions = models.IntegerField(default=0)
+    chunk_count = models.IntegerField(default=0)
+    generation = models.CharField(max_length=32)  # Part of the matrix file name; changes on every rebuild
+    complete = models.BooleanField(default=True)  # False while some chunks still wait for their embedding
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.repository}: {self.chunk_count} chunks ({self.model})"
+
+class EmbeddingChunk(models.Model):
+    """A span of a file whose embedding is row `row` of the repository's matrix"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='embedding_chunks')
+    file = models.ForeignKey(RepositoryFile, on_delete=models.CASCADE, related_name='embedding_chunks')
+    blob_hash = models.CharField(max_length=64)  # File version the chunk was cut from
+    text_hash = models.CharField(max_length=64)  # Lets unchanged chunks keep their vectors
+    start_line = models.IntegerField()  # 1-based, inclusive
+    end_line = models.IntegerField()
+    row = models.IntegerField()
+    
+    class Meta:
+        indexes = [models.Index(fields=['repository', 'row'])]
+
+class CodeSymbol(models.Model):
+    """A class, function, method or type definition, extracted once when its file is ingested"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='symbols')
+    file = models.ForeignKey(RepositoryFile, on_delete=models.CASCADE, related_name='symbols')
+    name = models.CharField(max_length=200)
+    qualified_name = models.CharField(max_length=500)  # Dotted through the enclosing definitions
+    kind = models.CharField(max_length=20)  # class, function, method or type
+    signature = models.CharField(max_length=300)
+    start_line = models.IntegerField()  # 1-based, inclusive, decorators included
+    end_line = models.IntegerField()
+    
+    class Meta:
+        indexes = [models.Index(fields=['repository', 'name'])]
+    
+    def __str__(self):
+        return f"{self.kind} {self.qualified_name}"
+
+class SummaryNode(models.Model):
+    """LLM summary of one directory (path '' is the repository root), built from its files and subdirectories"""
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='summary_nodes')
+    path = models.CharField(max_length=500)
+    input_hash = models.CharField(max_length=64)  # Of everything the summary was built from; a change means rebuild
+    model = models.CharField(max_length=100)
+    summary = models.TextField()
+    file_count = models.IntegerField(default=0)  # Files anywhere below the directory
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['repository', 'path']
+    
+    def __str__(self):
+        return f"{self.repository}: /{self.path}"
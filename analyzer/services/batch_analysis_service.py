@@ -0,0 +1,144 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from ..models import Repository, RepositoryFile
+from .cache_service import AnalysisCache
+from .llm_service import FileAnalyzer
+from .memory_service import MemoryService
+
+ENTRY_POINT_NAMES = {
+    'main.py', '__main__.py', 'app.py', 'manage.py', 'wsgi.py', 'asgi.py', 'cli.py', 'setup.py',
+    'index.js', 'index.ts', 'index.jsx', 'index.tsx', 'main.js', 'main.ts', 'app.js', 'app.ts', 'server.js', 'server.ts',
+    'main.go', 'main.java', 'application.java', 'main.rs', 'lib.rs', 'program.cs',
+}
+SOURCE_EXTENSIONS = {
+    'py', 'js', 'ts', 'jsx', 'tsx', 'java', 'go', 'rs', 'rb', 'php', 'cs', 'c', 'cc', 'cpp', 'h', 'hpp',
+    'kt', 'scala', 'swift', 'vue', 'svelte',
+}
+
+
+def file_priority(file_path: str, file_size: int, importers: int = 0) -> Tuple:
+    """Sort key putting the most informative files first
+
+    Entry points, then other source code, then docs/config; within a group
+    the most imported files (import-graph centrality) first, then shallower
+    paths and smaller files so the budget covers as many files as possible.
+    """
+    name = file_path.split('/')[-1].lower()
+    ext = name.split('.')[-1] if '.' in name else ''
+    if name in ENTRY_POINT_NAMES:
+        group = 0
+    elif ext in SOURCE_EXTENSIONS:
+        group = 1
+    elif name.startswith('readme'):
+        group = 2
+    else:
+        group = 3
+    return (group, -importers, file_path.count('/'), file_size, file_path)
+
+
+class BatchAnalyzer:
+    """Analyze every not-yet-analyzed file of a repository with a bounded number of concurrent LLM calls"""
+
+    def __init__(self, concurrency: Optional[int] = None, time_budget: Optional[float] = None,
+                 analyzer: Optional[FileAnalyzer] = None):
+        # Match Ollama's OLLAMA_NUM_PARALLEL so requests fill its slots without queueing server-side
+        self.concurrency = max(1, concurrency or getattr(settings, 'OLLAMA_PARALLEL', 2))
+        self.time_budget = time_budget
+        # One chunk at a time per file, so large files do not multiply the generations in flight
+        self.analyzer = analyzer or FileAnalyzer(chunk_concurrency=1)
+
+    def pending_files(self, repository: Repository) -> List[Dict]:
+        """Files without an analysis, highest priority first"""
+        rows = RepositoryFile.objects.filter(repository=repository, analysis='').annotate(
+            importers=Count('imported_by')
+        ).values('id', 'file_path', 'file_size', 'importers')
+        return sorted(rows, key=lambda row: file_priority(row['file_path'], row['file_size'], row['importers']))
+
+    def run(self, repository: Repository, progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Analyze pending files until done, out of time, or Ollama goes away"""
+        progress = progress or (lambda **counters: None)
+        started = time.monotonic()
+        deadline = started + self.time_budget if self.time_budget else None
+
+        if not self.analyzer.llm.is_available():
+            # Storing pattern-based fallback analyses would mark every file as done
+            raise RuntimeError('Ollama is not available; batch analysis needs a running LLM')
+
+        queue = deque(self.pending_files(repository))
+        progress(files_total=len(queue))
+
+        analyzed = 0
+        errors = []
+        stopped_reason = 'completed'
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while queue or in_flight:
+                while queue and len(in_flight) < self.concurrency:
+                    if deadline and time.monotonic() >= deadline:
+                        stopped_reason = 'time_budget'
+                        queue.clear()
+                        break
+                    if self.analyzer.llm.breaker.is_open:
+                        stopped_reason = 'llm_unavailable'
+                        queue.clear()
+                        break
+
+                    row = queue.popleft()
+                    repo_file = RepositoryFile.objects.select_related('blob').get(id=row['id'])
+                    content = repo_file.content
+                    cache_keys = self.analyzer.analysis_cache_keys(content, repo_file.file_path)
+                    cached = AnalysisCache.get(*cache_keys.values())
+                    if cached is not None:
+                        MemoryService.store_analysis(repo_file, cached)
+                        analyzed += 1
+                        progress(files_analyzed=analyzed)
+                        continue
+
+                    # cached_chunks also fills the analyzer's symbols cache from the database here,
+                    # so the worker splitting this file into chunks finds them without a query
+                    future = executor.submit(
+                        self.analyzer.generate_analysis, content, repo_file.file_path,
+                        self.analyzer.cached_chunks(content, repo_file.file_path)
+                    )
+                    in_flight[future] = (repo_file, content, cache_keys)
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    repo_file, content, cache_keys = in_flight.pop(future)
+                    # The worker is done with the definitions; a long batch must not keep every file's
+                    self.analyzer.forget_symbols(content, repo_file.file_path)
+                    try:
+                        generated = future.result()
+                    except Exception as e:
+                        errors.append({'file_path': repo_file.file_path, 'error': str(e)})
+                        continue
+
+                    if generated is None:
+                        # Leave the file pending so a later run retries it with the LLM
+                        errors.append({'file_path': repo_file.file_path, 'error': 'LLM analysis failed'})
+                        continue
+
+                    # Database access stays on this thread; workers only talk to Ollama, given the
+                    # symbols pre-filled above
+                    self.analyzer.store_result(cache_keys, generated)
+                    MemoryService.store_analysis(repo_file, generated.analysis)
+                    analyzed += 1
+                    progress(files_analyzed=analyzed)
+
+        return {
+            'files_analyzed': analyzed,
+            'files_remaining': RepositoryFile.objects.filter(repository=repository, analysis='').count(),
+            'errors': errors,
+            'stopped_reason': stopped_reason,
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
@@ -0,0 +1,47 @@
+from typing import Dict, Iterable, List
+
+from ..models import FileBlob
+from .persistence_service import BulkWriter
+
+
+class BlobStore:
+    """Content-addressed storage for file text, deduplicated across repositories"""
+
+    @staticmethod
+    def put_many(texts: Iterable[str]) -> List[str]:
+        """Store texts and return their hashes, in input order
+
+        Every text is written, even one that looks stored already: a concurrent release() may be
+        deleting it. Call this in the same transaction as the writes of the files referring to the
+        hashes, so that no release() can remove a blob between its insert and those rows.
+        """
+        hashes = []
+        pending: Dict[str, str] = {}
+        for text in texts:
+            digest = FileBlob.hash_text(text)
+            hashes.append(digest)
+            pending.setdefault(digest, text)
+
+        # Blobs already stored (by this or another ingestion) are left as they are
+        with BulkWriter(FileBlob, ignore_conflicts=True) as writer:
+            for text in pending.values():
+                writer.create(FileBlob.from_text(text))
+
+        return hashes
+
+    @staticmethod
+    def put(text: str) -> str:
+        return BlobStore.put_many([text])[0]
+
+    @staticmethod
+    def release(hashes: Iterable[str]) -> int:
+        """Delete the given blobs if no file refers to them any more
+
+        Run it inside the transaction that removed or repointed those files, after their writes.
+        """
+        hashes = [digest for digest in set(hashes) if digest]
+        deleted = 0
+        for start in range(0, len(hashes), 500):
+            count, _ = FileBlob.objects.filter(hash__in=hashes[start:start + 500], files__isnull=True).delete()
+            deleted += count
+        return deleted
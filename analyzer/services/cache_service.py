@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models import AnalysisCacheEntry, AnalysisCacheUsage
+
+# Eviction frees down to this fraction of the limit, so the puts right after it do not evict again
+EVICTION_LOW_WATER = 0.9
+
+
+class AnalysisCache:
+    """Database-backed LLM output cache with size-bounded LRU eviction"""
+
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def make_key(content: str, model: str, prompt_version: str, options: Dict[str, Any]) -> str:
+        """Hash everything that determines the LLM output"""
+        digest = hashlib.sha256()
+        for part in (prompt_version, model, json.dumps(options, sort_keys=True), content):
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @classmethod
+    def get(cls, *keys: str) -> Optional[str]:
+        """Return the result for the first key (in priority order) that is cached, marking it used"""
+        found = dict(AnalysisCacheEntry.objects.filter(key__in=keys).values_list('key', 'result'))
+        key = next((key for key in keys if key in found), None)
+
+        with cls._lock:
+            if key is None:
+                cls.misses += 1
+            else:
+                cls.hits += 1
+
+        if key is None:
+            return None
+        AnalysisCacheEntry.objects.filter(key=key).update(hit_count=F('hit_count') + 1, last_used_at=timezone.now())
+        return found[key]
+
+    @classmethod
+    def get_many(cls, keys: List[str]) -> Dict[str, str]:
+        """Return {key: result} for every cached key, marking them used"""
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            found.update(AnalysisCacheEntry.objects.filter(key__in=batch).values_list('key', 'result'))
+
+        with cls._lock:
+            cls.hits += len(found)
+            cls.misses += len(set(keys)) - len(found)
+
+        hit_keys = list(found)
+        for start in range(0, len(hit_keys), 500):
+            AnalysisCacheEntry.objects.filter(key__in=hit_keys[start:start + 500]).update(
+                hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+            )
+        return found
+
+    @classmethod
+    def put(cls, key: str, model: str, result: str):
+        """Store a result, evicting least recently used entries past the size limit"""
+        values = {'model': model, 'result': result, 'size': len(result), 'last_used_at': timezone.now()}
+        old_size = AnalysisCacheEntry.objects.filter(key=key).values_list('size', flat=True).first()
+        # Not update_or_create: its read-then-write transaction cannot wait for another SQLite
+        # writer and fails at once with "database is locked" when requests store concurrently
+        if old_size is not None and AnalysisCacheEntry.objects.filter(key=key).update(**values):
+            added = len(result) - old_size
+        else:
+            try:
+                with transaction.atomic():
+                    AnalysisCacheEntry.objects.create(key=key, **values)
+                added = len(result)
+            except IntegrityError:
+                added = 0  # Stored by a concurrent request in the meantime
+
+        max_bytes = getattr(settings, 'ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        if cls._add_bytes(added) > max_bytes:
+            cls.evict(max_bytes)
+
+    @staticmethod
+    def _add_bytes(added: int) -> int:
+        """Adjust the running size total and return it"""
+        usage = AnalysisCacheUsage.objects.filter(pk=1)
+        if not usage.update(total_bytes=F('total_bytes') + added):
+            # First put since the table was created: start from what is already stored
+            try:
+                with transaction.atomic():
+                    AnalysisCacheUsage.objects.create(
+                        pk=1, total_bytes=AnalysisCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+                    )
+            except IntegrityError:
+                usage.update(total_bytes=F('total_bytes') + added)
+        return usage.values_list('total_bytes', flat=True).first() or 0
+
+    @staticmethod
+    def evict(max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used entries until the cache fits in max_bytes
+
+        Only called once the running total passes the limit; the table is summed here, not on every put,
+        and the running total is corrected by whatever it had drifted.
+        """
+        max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        usage = AnalysisCacheUsage.objects.filter(pk=1)
+        counted = usage.values_list('total_bytes', flat=True).first() or 0
+        total = AnalysisCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+
+        doomed = []
+        if total > max_bytes:
+            low_water = int(max_bytes * EVICTION_LOW_WATER)
+            for entry_id, size in AnalysisCacheEntry.objects.order_by('last_used_at').values_list('id', 'size').iterator():
+                if total <= low_water:
+                    break
+                doomed.append(entry_id)
+                total -= size
+
+        for start in range(0, len(doomed), 500):
+            AnalysisCacheEntry.objects.filter(id__in=doomed[start:start + 500]).delete()
+        # Relative to the stored value, so puts that landed meanwhile are kept
+        usage.update(total_bytes=F('total_bytes') + (total - counted))
+        return len(doomed)
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """Hit/miss counters for this process plus the cache's current footprint"""
+        totals = AnalysisCacheEntry.objects.aggregate(bytes=Sum('size'), lifetime_hits=Sum('hit_count'))
+        return {
+            'hits': cls.hits,
+            'misses': cls.misses,
+            'entries': AnalysisCacheEntry.objects.count(),
+            'bytes': totals['bytes'] or 0,
+            'lifetime_hits': totals['lifetime_hits'] or 0,
+            'max_bytes': getattr(settings, 'ANALYSIS_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        }
@@ -0,0 +1,138 @@
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Set, Tuple
+
+from .dependency_service import language_of
+
+# Lines that open a definition, outermost level first; a piece that is still too large
+# after splitting on one level is split on the next
+BOUNDARY_PATTERNS: Dict[str, List[Pattern]] = {
+    'python': [
+        re.compile(r'(?:@|(?:async[ \t]+)?def[ \t]|class[ \t])'),
+        re.compile(r'[ \t]+(?:@|(?:async[ \t]+)?def[ \t])'),
+    ],
+    'javascript': [
+        re.compile(
+            r'(?:export[ \t]+)?(?:default[ \t]+)?(?:async[ \t]+)?'
+            r'(?:function\b|class\b|(?:interface|type|enum)[ \t]+\w|'
+            r'(?:const|let|var)[ \t]+[\w$]+[ \t]*=[ \t]*(?:async[ \t]*)?(?:function\b|\(|[\w$]+[ \t]*=>))'
+        ),
+        re.compile(
+            r'[ \t]+(?!(?:if|for|while|switch|catch|return|function)\b)'
+            r'(?:(?:static|async|get|set|public|private|protected|readonly)[ \t]+)*[\w$]+[ \t]*\([^)]*\)[ \t]*(?::[^{]*)?\{'
+        ),
+    ],
+    'go': [
+        re.compile(r'(?:func|type)[ \t]'),
+    ],
+    'java': [
+        re.compile(r'(?:(?:public|protected|private|abstract|final|sealed)[ \t]+)*(?:class|interface|enum|record)[ \t]'),
+        re.compile(
+            r'[ \t]+(?:@\w+|(?:(?:public|protected|private|static|final|abstract|synchronized|default)[ \t]+)+'
+            r'[\w<>\[\],.? ]+[ \t]+\w+[ \t]*\()'
+        ),
+    ],
+}
+BLANK_LINE_RE = re.compile(r'[ \t]*$')
+HEADER_PREFIXES = ('@', '#', '//', '/*', '*')
+
+MAX_DEFINITIONS = 20
+
+
+def _boundaries(lines: List[str], start: int, end: int, is_boundary: Callable[[int], bool]) -> List[int]:
+    """Line numbers in (start, end) where a piece may begin, pulling decorators and comments along"""
+    found = set()
+    for i in range(start + 1, end):
+        if not is_boundary(i):
+            continue
+        while i - 1 > start and lines[i - 1].strip().startswith(HEADER_PREFIXES):
+            i -= 1
+        found.add(i)
+    return sorted(found)
+
+
+def _split(lines: List[str], start: int, end: int, levels: List[Callable[[int], bool]],
+           max_chars: int) -> List[Tuple[int, int]]:
+    """Line ranges no larger than max_chars (unless a single line is), cut at the outermost boundaries possible"""
+    if sum(len(line) for line in lines[start:end]) <= max_chars:
+        return [(start, end)]
+
+    for level, is_boundary in enumerate(levels):
+        bounds = _boundaries(lines, start, end, is_boundary)
+        if bounds:
+            edges = [start] + bounds + [end]
+            pieces = []
+            for a, b in zip(edges, edges[1:]):
+                pieces.extend(_split(lines, a, b, levels[level + 1:], max_chars))
+            return pieces
+
+    # No syntactic boundary left: cut as late as possible, at a line
+    pieces = []
+    piece_start, size = start, 0
+    for i in range(start, end):
+        if i > piece_start and size + len(lines[i]) > max_chars:
+            pieces.append((piece_start, i))
+            piece_start, size = i, 0
+        size += len(lines[i])
+    pieces.append((piece_start, end))
+    return pieces
+
+
+def _symbol_levels(symbols: List[Dict]) -> List[Set[int]]:
+    """0-based start lines of outermost definitions, then of those nested in them"""
+    outer, inner = set(), set()
+    outer_end = 0
+    for symbol in sorted(symbols, key=lambda symbol: (symbol['start_line'], -symbol['end_line'])):
+        if symbol['start_line'] > outer_end:
+            outer.add(symbol['start_line'] - 1)
+            outer_end = symbol['end_line']
+        else:
+            inner.add(symbol['start_line'] - 1)
+    return [outer, inner]
+
+
+def split_into_chunks(file_path: str, content: str, max_chars: int, symbols: Optional[List[Dict]] = None) -> List[Dict]:
+    """Split a file into chunks of at most max_chars, on function/class boundaries where the language is known
+
+    symbols, the file's entries from the symbol table, give exact boundaries and definitions;
+    without them definitions are recognized line by line.
+    Each chunk is {'name', 'start_line', 'end_line' (1-based, inclusive), 'text', 'definitions'}.
+    """
+    lines = content.splitlines(keepends=True)
+    patterns = BOUNDARY_PATTERNS.get(language_of(file_path), [])
+    if symbols:
+        levels = [level.__contains__ for level in _symbol_levels(symbols)]
+    else:
+        levels = [lambda i, pattern=pattern: bool(pattern.match(lines[i])) for pattern in patterns]
+    levels.append(lambda i: bool(BLANK_LINE_RE.match(lines[i])))
+    pieces = _split(lines, 0, len(lines), levels, max_chars)
+
+    # Pack neighbouring small pieces back together so chunks are few and nearly full
+    ranges = []
+    for a, b in pieces:
+        size = sum(len(line) for line in lines[a:b])
+        if ranges and ranges[-1][2] + size <= max_chars:
+            ranges[-1] = (ranges[-1][0], b, ranges[-1][2] + size)
+        else:
+            ranges.append((a, b, size))
+
+    chunks = []
+    for a, b, _ in ranges:
+        if symbols:
+            inside = [symbol for symbol in symbols if a < symbol['start_line'] <= b]
+            names = [symbol['signature'][:120] for symbol in inside]
+            definitions = [
+                f"{name} (lines {symbol['start_line']}-{symbol['end_line']})" for name, symbol in zip(names, inside)
+            ]
+        else:
+            definitions = names = [
+                lines[i].strip()[:120] for i in range(a, b)
+                if any(pattern.match(lines[i]) for pattern in patterns) and not lines[i].lstrip().startswith('@')
+            ]
+        chunks.append({
+            'name': names[0] if names else f'lines {a + 1}-{b}',
+            'start_line': a + 1,
+            'end_line': b,
+            'text': ''.join(lines[a:b]),
+            'definitions': definitions[:MAX_DEFINITIONS],
+        })
+    return chunks
@@ -0,0 +1,245 @@
+import posixpath
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+
+from ..models import FileBlob, FileDependency, Repository, RepositoryFile
+from .persistence_service import BulkWriter
+
+PY_IMPORT_RE = re.compile(r'^[ \t]*import[ \t]+([\w.]+(?:[ \t]*,[ \t]*[\w.]+)*)', re.MULTILINE)
+PY_FROM_RE = re.compile(
+    r'^[ \t]*from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+(?:\(([\w, \t\n]+)\)|([\w*, \t]+))', re.MULTILINE
+)
+JS_IMPORT_RE = re.compile(
+    r'''(?:\bimport\s+(?:[\w*{}\s,$]+?\s+from\s+)?|\bexport\s+[\w*{}\s,$]+?\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"]+)['"]'''
+)
+GO_IMPORT_BLOCK_RE = re.compile(r'^import\s*\(([^)]*)\)', re.MULTILINE)
+GO_IMPORT_LINE_RE = re.compile(r'^import\s+(?:[\w.]+\s+)?"([^"]+)"', re.MULTILINE)
+GO_QUOTED_RE = re.compile(r'"([^"]+)"')
+JAVA_IMPORT_RE = re.compile(r'^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;', re.MULTILINE)
+
+JS_EXTENSIONS = ['.js', '.ts', '.jsx', '.tsx', '.mjs', '.cjs', '.vue', '.svelte']
+LANGUAGES = {
+    'py': 'python',
+    'js': 'javascript', 'jsx': 'javascript', 'ts': 'javascript', 'tsx': 'javascript',
+    'mjs': 'javascript', 'cjs': 'javascript', 'vue': 'javascript', 'svelte': 'javascript',
+    'go': 'go',
+    'java': 'java',
+}
+
+
+def language_of(file_path: str) -> Optional[str]:
+    ext = file_path.rsplit('.', 1)[-1].lower() if '.' in file_path else ''
+    return LANGUAGES.get(ext)
+
+
+def extract_imports(file_path: str, content: str) -> List[str]:
+    """Import specifiers as written in a Python, JS/TS, Go or Java source file"""
+    language = language_of(file_path)
+
+    if language == 'python':
+        specifiers = []
+        for match in PY_IMPORT_RE.finditer(content):
+            specifiers.extend(name.strip() for name in match.group(1).split(','))
+        for match in PY_FROM_RE.finditer(content):
+            module = match.group(1)
+            # "from pkg import mod" may name a submodule, so keep both candidates
+            names = match.group(2) or match.group(3)
+            for name in names.replace('\n', ' ').split(','):
+                name = name.strip().split(' ')[0]
+                if name and name != '*':
+                    specifiers.append(f'{module}.{name}' if not module.endswith('.') else f'{module}{name}')
+            specifiers.append(module)
+        return specifiers
+
+    if language == 'javascript':
+        return JS_IMPORT_RE.findall(content)
+
+    if language == 'go':
+        specifiers = GO_IMPORT_LINE_RE.findall(content)
+        for block in GO_IMPORT_BLOCK_RE.findall(content):
+            specifiers.extend(GO_QUOTED_RE.findall(block))
+        return specifiers
+
+    if language == 'java':
+        return JAVA_IMPORT_RE.findall(content)
+
+    return []
+
+
+class PathResolver:
+    """Resolve import specifiers to file paths of one repository"""
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths: Set[str] = set(paths)
+        # Every trailing slice of every path, so Java classes resolve regardless of source roots (src/main/java ...)
+        self.by_suffix: Dict[str, List[str]] = defaultdict(list)
+        self.dir_files: Dict[str, List[str]] = defaultdict(list)
+        for path in self.paths:
+            parts = path.split('/')
+            for i in range(len(parts)):
+                self.by_suffix['/'.join(parts[i:])].append(path)
+            self.dir_files[posixpath.dirname(path)].append(path)
+        self.dirs_by_suffix: Dict[str, List[str]] = defaultdict(list)
+        for directory in self.dir_files:
+            parts = directory.split('/') if directory else []
+            for i in range(len(parts)):
+                self.dirs_by_suffix['/'.join(parts[i:])].append(directory)
+        # Where absolute Python imports start: the repository root and the directory above every
+        # top-level package (src/ in a src layout), as sys.path would hold them
+        self.python_roots: Set[str] = {''}
+        for path in self.paths:
+            if posixpath.basename(path) != '__init__.py':
+                continue
+            package = posixpath.dirname(path)
+            while package and posixpath.join(posixpath.dirname(package), '__init__.py') in self.paths:
+                package = posixpath.dirname(package)
+            self.python_roots.add(posixpath.dirname(package))
+
+    def _by_suffix(self, candidate: str, source_path: str) -> Optional[str]:
+        matches = self.by_suffix.get(candidate)
+        if not matches:
+            return None
+        if len(matches) == 1:
+            return matches[0]
+        # Prefer the match sharing the longest directory prefix with the importing file
+        return max(matches, key=lambda path: (len(posixpath.commonprefix([path, source_path])), -len(path)))
+
+    def _python_absolute(self, specifier: str, source_path: str) -> Optional[str]:
+        """A module imported by its absolute name, looked up from the package roots only"""
+        roots = self.python_roots
+        source_dir = posixpath.dirname(source_path)
+        if posixpath.join(source_dir, '__init__.py') not in self.paths:
+            # A script outside any package imports its neighbours, its directory being on sys.path
+            roots = roots | {source_dir}
+        stem = specifier.replace('.', '/')
+        for name in (f'{stem}.py', f'{stem}/__init__.py'):
+            matches = [posixpath.join(root, name) for root in roots if posixpath.join(root, name) in self.paths]
+            if matches:
+                return max(matches, key=lambda path: (len(posixpath.commonprefix([path, source_path])), -len(path)))
+        return None
+
+    def resolve(self, specifier: str, source_path: str) -> List[str]:
+        language = language_of(source_path)
+        source_dir = posixpath.dirname(source_path)
+
+        if language == 'python':
+            if specifier.startswith('.'):
+                level = len(specifier) - len(specifier.lstrip('.'))
+                base = source_dir
+                for _ in range(level - 1):
+                    base = posixpath.dirname(base)
+                module = specifier[level:].replace('.', '/')
+                stem = posixpath.join(base, module) if module else base
+                for candidate in (f'{stem}.py', f'{stem}/__init__.py'):
+                    if candidate in self.paths:
+                        return [candidate]
+                return []
+            found = self._python_absolute(specifier, source_path)
+            return [found] if found else []
+
+        if language == 'javascript':
+            if specifier.startswith('.'):
+                stem = posixpath.normpath(posixpath.join(source_dir, specifier))
+            elif specifier.startswith(('@/', '~/')):
+                stem = posixpath.join('src', specifier[2:])
+            else:
+                return []  # Package import
+            candidates = [stem] + [stem + ext for ext in JS_EXTENSIONS] + [f'{stem}/index{ext}' for ext in JS_EXTENSIONS]
+            for candidate in candidates:
+                if candidate in self.paths:
+                    return [candidate]
+            return []
+
+        if language == 'go':
+            # Longest trailing slice of the import path that is a directory of this repo
+            parts = specifier.split('/')
+            for i in range(len(parts)):
+                directories = self.dirs_by_suffix.get('/'.join(parts[i:]))
+                if directories:
+                    return [
+                        path for path in self.dir_files[directories[0]]
+                        if path.endswith('.go') and not path.endswith('_test.go')
+                    ]
+            return []
+
+        if language == 'java':
+            if specifier.endswith('.*'):
+                directories = self.dirs_by_suffix.get(specifier[:-2].replace('.', '/'))
+                if not directories:
+                    return []
+                return [path for path in self.dir_files[directories[0]] if path.endswith('.java')]
+            found = self._by_suffix(specifier.replace('.', '/') + '.java', source_path)
+            return [found] if found else []
+
+        return []
+
+
+class DependencyGraph:
+    @staticmethod
+    def _edges(resolver: PathResolver, file_path: str, content: str) -> Dict[str, str]:
+        """target path -> specifier for one source file"""
+        edges = {}
+        for specifier in extract_imports(file_path, content):
+            for target in resolver.resolve(specifier, file_path):
+                if target != file_path:
+                    edges.setdefault(target, specifier[:300])
+        return edges
+
+    @staticmethod
+    def rebuild(repository: Repository, source_ids: Optional[Iterable[int]] = None):
+        """Recompute import edges, for every file or only for the given source files"""
+        id_by_path = dict(
+            RepositoryFile.objects.filter(repository=repository).values_list('file_path', 'id')
+        )
+        resolver = PathResolver(id_by_path)
+
+        sources = RepositoryFile.objects.filter(repository=repository)
+        existing = FileDependency.objects.filter(repository=repository)
+        if source_ids is not None:
+            source_ids = list(source_ids)
+            sources = sources.filter(id__in=source_ids)
+            existing = existing.filter(source_id__in=source_ids)
+
+        with transaction.atomic():
+            existing.delete()
+            with BulkWriter(FileDependency) as writer:
+                rows = sources.filter(blob__isnull=False).values_list('id', 'file_path', 'blob__data')
+                for file_id, file_path, data in rows.iterator():
+                    if not language_of(file_path):
+                        continue
+                    content = FileBlob.decompress(data)
+                    for target, specifier in DependencyGraph._edges(resolver, file_path, content).items():
+                        writer.create(FileDependency(
+                            repository=repository,
+                            source_id=file_id,
+                            target_id=id_by_path[target],
+                            specifier=specifier
+                        ))
+
+    @staticmethod
+    def neighbors(repository: Repository, file_id: int, depth: int = 1) -> Dict[int, Tuple[int, str]]:
+        """file_id -> (distance, relationship) for files reachable over import edges, both directions"""
+        found: Dict[int, Tuple[int, str]] = {}
+        frontier = {file_id}
+        seen = {file_id}
+
+        for distance in range(1, depth + 1):
+            next_frontier = set()
+            edges = FileDependency.objects.filter(repository=repository)
+            for source_id, target_id in edges.filter(source_id__in=frontier).values_list('source_id', 'target_id'):
+                if target_id not in seen:
+                    found[target_id] = (distance, 'imports')
+                    next_frontier.add(target_id)
+            for source_id, target_id in edges.filter(target_id__in=frontier).values_list('source_id', 'target_id'):
+                if source_id not in seen:
+                    found.setdefault(source_id, (distance, 'imported_by'))
+                    next_frontier.add(source_id)
+            seen |= next_frontier
+            frontier = next_frontier
+            if not frontier:
+                break
+
+        return found
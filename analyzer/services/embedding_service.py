@@ -0,0 +1,314 @@
+import hashlib
+import os
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from ..models import EmbeddingChunk, FileBlob, Job, Repository, RepositoryEmbeddings, RepositoryFile
+from .chunking_service import split_into_chunks
+from .llm_service import AsyncOllamaLLMService, OllamaLLMService, get_llm_service
+from .persistence_service import BulkWriter
+
+EMBED_BATCH_SIZE = 32  # Texts per /api/embed request
+EMBED_CHECKPOINT_BATCHES = 50  # Requests between partial writes of a long update
+
+
+class EmbeddingIndex:
+    """Per-repository chunk embeddings in a memory-mapped .npy matrix, for semantic retrieval
+
+    Row i of the matrix is the unit-length embedding of the EmbeddingChunk with row=i, for the
+    first chunk_count rows, so cosine similarity against every chunk is one matrix-vector product.
+    """
+
+    def __init__(self, llm: Optional[OllamaLLMService] = None):
+        self.llm = llm or get_llm_service()
+        self.model = getattr(settings, 'OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+
+    @staticmethod
+    def matrix_path(repository_id: int, generation: str) -> Path:
+        directory = Path(getattr(settings, 'EMBEDDINGS_DIR', Path(settings.BASE_DIR) / 'embeddings'))
+        return directory / f'repo_{repository_id}_{generation}.npy'
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-length float32 embeddings, one row per text"""
+        rows = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors = self.llm.embed(texts[start:start + EMBED_BATCH_SIZE], self.model)
+            if vectors is None:
+                return None
+            rows.append(np.asarray(vectors, dtype=np.float32))
+        return self.normalize(np.vstack(rows))
+
+    @staticmethod
+    def normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def schedule(self, repository: Repository, changed: bool = True) -> Dict:
+        """Queue an update of the repository's index for the job worker, unless one is already waiting
+
+        Embedding a large repository takes thousands of /api/embed calls, too many for an HTTP request.
+        """
+        if not changed and RepositoryEmbeddings.objects.filter(
+            repository=repository, model=self.model, complete=True
+        ).exists():
+            return {'status': 'unchanged'}
+        job = Job.objects.filter(
+            kind=Job.KIND_EMBED_REPOSITORY, repository=repository, status=Job.STATUS_PENDING
+        ).first()
+        if job is None:
+            job = Job.objects.create(
+                kind=Job.KIND_EMBED_REPOSITORY, payload={'repository_id': repository.id}, repository=repository
+            )
+        return {'status': 'queued', 'job_id': job.id}
+
+    def update(self, repository: Repository, progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Bring the repository's matrix in line with its files, embedding only chunks not seen before
+
+        Vectors are written out every EMBED_CHECKPOINT_BATCHES requests and when a request fails, so an
+        interrupted update leaves a partial index that the next one completes instead of starting over.
+        progress counts chunks to embed in files_total / files_analyzed.
+        """
+        progress = progress or (lambda **counters: None)
+        if not self.llm.is_available() or not self.llm.has_model(self.model):
+            return {'status': 'skipped', 'reason': f'embedding model {self.model} is not available'}
+
+        state = RepositoryEmbeddings.objects.filter(repository=repository).first()
+        old_matrix = None
+        old_chunks: Dict[tuple, List[Dict]] = defaultdict(list)
+        old_rows: Dict[str, int] = {}
+        if state and state.model == self.model and self.matrix_path(repository.id, state.generation).exists():
+            old_matrix = np.load(self.matrix_path(repository.id, state.generation), mmap_mode='r')
+            for chunk in EmbeddingChunk.objects.filter(repository=repository).values(
+                'file_id', 'blob_hash', 'text_hash', 'start_line', 'end_line', 'row'
+            ):
+                old_chunks[(chunk['file_id'], chunk['blob_hash'])].append(chunk)
+                old_rows[chunk['text_hash']] = chunk['row']
+        # A partial index may hold only some chunks of a file, so every file is cut again;
+        # the chunks already embedded are found by their text hash
+        complete_before = old_matrix is not None and state.complete
+
+        # Each new row takes its vector from the old matrix ('source_row') or from a fresh embedding ('new_row')
+        chunks: List[Dict] = []
+        pending_texts: List[str] = []
+        pending_rows: Dict[str, int] = {}
+        changed_ids = []
+        files = RepositoryFile.objects.filter(repository=repository, blob__isnull=False)
+        for file_id, blob_hash in files.values_list('id', 'blob_id'):
+            kept = old_chunks.get((file_id, blob_hash)) if complete_before else None
+            if kept:
+                chunks.extend(dict(chunk, source_row=chunk['row']) for chunk in kept)
+            else:
+                changed_ids.append(file_id)
+
+        if complete_before and not changed_ids and len(chunks) == state.chunk_count:
+            return {'status': 'unchanged', 'chunks': len(chunks), 'embedded': 0, 'reused': len(chunks)}
+
+        chunk_chars = getattr(settings, 'EMBEDDING_CHUNK_CHARS', 800)
+        for start in range(0, len(changed_ids), 200):
+            rows = files.filter(id__in=changed_ids[start:start + 200])
+            for file_id, file_path, blob_hash, data in rows.values_list('id', 'file_path', 'blob_id', 'blob__data'):
+                for piece in split_into_chunks(file_path, FileBlob.decompress(data), chunk_chars):
+                    if not piece['text'].strip():
+                        continue
+                    # The path gives the model context the chunk itself may lack, so it is part of what is embedded
+                    text = f"{file_path}\n{piece['text']}"
+                    text_hash = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+                    chunk = {
+                        'file_id': file_id, 'blob_hash': blob_hash, 'text_hash': text_hash,
+                        'start_line': piece['start_line'], 'end_line': piece['end_line'],
+                    }
+                    if text_hash in old_rows:
+                        chunk['source_row'] = old_rows[text_hash]
+                    else:
+                        if text_hash not in pending_rows:
+                            pending_rows[text_hash] = len(pending_texts)
+                            pending_texts.append(text)
+                        chunk['new_row'] = pending_rows[text_hash]
+                    chunks.append(chunk)
+
+        # Final row order: reused vectors first, then new ones in embedding order, so the rows with a
+        # vector are always a prefix of the matrix and each checkpoint only appends chunk rows
+        reused = [chunk for chunk in chunks if 'source_row' in chunk]
+        fresh = sorted((chunk for chunk in chunks if 'new_row' in chunk), key=lambda chunk: chunk['new_row'])
+        ordered = reused + fresh
+        fresh_rows = [chunk['new_row'] for chunk in fresh]
+        targets: Dict[int, List[int]] = defaultdict(list)
+        for row, chunk in enumerate(ordered):
+            chunk['row'] = row
+            if 'new_row' in chunk:
+                targets[chunk['new_row']].append(row)
+
+        generation = uuid.uuid4().hex[:12]
+        path = self.matrix_path(repository.id, generation)
+        matrix = None
+        if old_matrix is not None:
+            matrix = self._open(path, len(ordered), old_matrix.shape[1])
+            for chunk in reused:
+                matrix[chunk['row']] = old_matrix[chunk['source_row']]
+
+        progress(files_total=len(pending_texts))
+        embedded = 0
+        stored = None  # Chunk rows written so far; None until this update's matrix is current
+        for number, start in enumerate(range(0, len(pending_texts), EMBED_BATCH_SIZE), 1):
+            vectors = self.llm.embed(pending_texts[start:start + EMBED_BATCH_SIZE], self.model)
+            if vectors is None:
+                break
+            vectors = self.normalize(np.asarray(vectors, dtype=np.float32))
+            if matrix is None:
+                matrix = self._open(path, len(ordered), vectors.shape[1])
+            for offset, vector in enumerate(vectors):
+                matrix[targets[start + offset]] = vector
+            embedded += len(vectors)
+            progress(files_analyzed=embedded)
+            if number % EMBED_CHECKPOINT_BATCHES == 0 and embedded < len(pending_texts):
+                ready = len(reused) + bisect_left(fresh_rows, embedded)
+                stored = self._write(repository, matrix, ordered, stored, ready, generation)
+
+        complete = embedded == len(pending_texts)
+        if not complete and not embedded:
+            if matrix is not None:
+                del matrix
+                path.unlink(missing_ok=True)
+            return {'status': 'failed', 'reason': 'embedding request failed', 'embedded': 0}
+        if matrix is None:
+            matrix = self._open(path, len(ordered), 0)  # Nothing to embed and no earlier matrix
+        ready = len(reused) + bisect_left(fresh_rows, embedded)
+        self._write(repository, matrix, ordered, stored, ready, generation, complete)
+        del matrix
+
+        if state and state.generation != generation:
+            # Readers that already mapped the old file keep their view of it until they finish
+            try:
+                os.remove(self.matrix_path(repository.id, state.generation))
+            except FileNotFoundError:
+                pass
+
+        return {
+            'status': 'updated' if complete else 'partial',
+            'chunks': ready,
+            'embedded': embedded,
+            'reused': len(reused),
+            **({} if complete else {'reason': 'embedding request failed', 'missing': len(pending_texts) - embedded}),
+        }
+
+    @staticmethod
+    def _open(path: Path, rows: int, dimensions: int) -> np.ndarray:
+        """A new matrix file at its final size; rows are filled in as their vectors arrive"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(rows, dimensions))
+
+    def _write(self, repository: Repository, matrix: np.ndarray, chunks: List[Dict], stored: Optional[int],
+               ready: int, generation: str, complete: bool = False) -> int:
+        """Make the first ready rows of matrix current, adding only the chunk rows not stored yet
+
+        stored is what the previous call returned, or None when the rows of the earlier index are
+        still the current ones and have to be replaced. Returns ready.
+        """
+        matrix.flush()
+        with transaction.atomic():
+            if stored is None:
+                EmbeddingChunk.objects.filter(repository=repository).delete()
+                stored = 0
+            with BulkWriter(EmbeddingChunk) as writer:
+                for chunk in chunks[stored:ready]:
+                    writer.create(EmbeddingChunk(
+                        repository=repository,
+                        file_id=chunk['file_id'],
+                        blob_hash=chunk['blob_hash'],
+                        text_hash=chunk['text_hash'],
+                        start_line=chunk['start_line'],
+                        end_line=chunk['end_line'],
+                        row=chunk['row']
+                    ))
+            RepositoryEmbeddings.objects.update_or_create(
+                repository=repository,
+                defaults={
+                    'model': self.model, 'dimensions': matrix.shape[1], 'chunk_count': ready,
+                    'generation': generation, 'complete': complete
+                }
+            )
+        return ready
+
+    def search(self, repository: Repository, query: str, k: Optional[int] = None) -> Optional[List[Dict]]:
+        """Top-k chunks by cosine similarity to the query, or None when there is no usable index
+
+        Each result is {'file_id', 'file_path', 'start_line', 'end_line', 'score', 'text'}.
+        """
+        if not self.is_ready(repository) or not self.llm.is_available():
+            return None
+        query_vector = self._embed([query])
+        if query_vector is None:
+            return None
+        return self.search_by_vector(repository, query_vector[0], k)
+
+    async def asearch(self, repository: Repository, query: str, k: Optional[int] = None) -> Optional[List[Dict]]:
+        """search for async views: the query embedding request is awaited"""
+        allm = AsyncOllamaLLMService(self.llm)
+        if not await sync_to_async(self.is_ready)(repository) or not await allm.is_available():
+            return None
+        vectors = await allm.embed([query], self.model)
+        if vectors is None:
+            return None
+        query_vector = self.normalize(np.asarray(vectors, dtype=np.float32))[0]
+        return await sync_to_async(self.search_by_vector)(repository, query_vector, k)
+
+    def is_ready(self, repository: Repository) -> bool:
+        """Whether the repository has an index built with the current embedding model"""
+        return RepositoryEmbeddings.objects.filter(repository=repository, model=self.model).exists()
+
+    def search_by_vector(self, repository: Repository, query_vector: np.ndarray,
+                         k: Optional[int] = None) -> Optional[List[Dict]]:
+        """Top-k chunks for a unit-length query embedding"""
+        k = k or getattr(settings, 'SEARCH_TOP_K', 5)
+        state = RepositoryEmbeddings.objects.filter(repository=repository, model=self.model).first()
+        if state is None:
+            return None
+        try:
+            matrix = np.load(self.matrix_path(repository.id, state.generation), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        # The file is allocated at its final size; rows past chunk_count have no vector yet
+        matrix = matrix[:state.chunk_count]
+        if matrix.shape[0] == 0:
+            return []
+        if query_vector.shape[0] != matrix.shape[1]:
+            return None
+
+        scores = np.asarray(matrix @ query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        chunks = {
+            chunk['row']: chunk
+            for chunk in EmbeddingChunk.objects.filter(repository=repository, row__in=top.tolist()).values(
+                'row', 'file_id', 'file__file_path', 'file__blob_id', 'blob_hash', 'start_line', 'end_line'
+            )
+        }
+        blobs = FileBlob.objects.in_bulk({chunk['file__blob_id'] for chunk in chunks.values()})
+
+        results = []
+        for row in top.tolist():
+            chunk = chunks.get(row)
+            if chunk is None or chunk['file__blob_id'] != chunk['blob_hash']:
+                continue  # File changed since the index was built
+            lines = blobs[chunk['blob_hash']].read_lines(
+                chunk['start_line'] - 1, chunk['end_line'] - chunk['start_line'] + 1
+            )
+            results.append({
+                'file_id': chunk['file_id'],
+                'file_path': chunk['file__file_path'],
+                'start_line': chunk['start_line'],
+                'end_line': chunk['end_line'],
+                'score': round(float(scores[row]), 4),
+                'text': '\n'.join(lines),
+            })
+        return results
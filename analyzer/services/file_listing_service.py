@@ -0,0 +1,118 @@
+import base64
+import binascii
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, QuerySet
+
+from ..models import Repository, RepositoryFile
+
+# Fields a listing may select; each is a plain column or computed in SQL, never the file body or analysis
+FILE_LIST_FIELDS = ('id', 'file_path', 'file_type', 'file_size', 'analyzed', 'analyzed_at', 'sha')
+FILE_LIST_DEFAULT_FIELDS = ('id', 'file_path', 'file_type', 'file_size', 'analyzed')
+
+
+class CursorError(ValueError):
+    """A pagination cursor that was not issued by this API"""
+
+
+def encode_cursor(file_path: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'after': file_path}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        after = data['after']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise CursorError('Invalid cursor')
+    if not isinstance(after, str):
+        raise CursorError('Invalid cursor')
+    return after
+
+
+def under_prefix(files: QuerySet, prefix: str, field: str = 'file_path') -> QuerySet:
+    """Files whose path (or other indexed field) starts with prefix, as a range on the index"""
+    if not prefix:
+        return files
+    # Every string starting with prefix sorts before prefix + U+10FFFF, the largest code point
+    return files.filter(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
+
+
+class FileListing:
+    """Repository file listings that read only the selected columns, never file bodies"""
+
+    @staticmethod
+    def _rows(files: QuerySet, fields: Sequence[str]) -> List[Dict]:
+        if 'analyzed' in fields:
+            files = files.annotate(analyzed=ExpressionWrapper(~Q(analysis=''), output_field=BooleanField()))
+        rows = list(files.values(*fields))
+        for row in rows:
+            if 'analyzed' in row:
+                row['analyzed'] = bool(row['analyzed'])
+            if row.get('analyzed_at') is not None:
+                row['analyzed_at'] = row['analyzed_at'].isoformat()
+        return rows
+
+    @staticmethod
+    def all(repository: Repository, fields: Sequence[str] = FILE_LIST_DEFAULT_FIELDS) -> List[Dict]:
+        """Every file of a repository in path order"""
+        return FileListing._rows(RepositoryFile.objects.filter(repository=repository).order_by('file_path'), fields)
+
+    @staticmethod
+    def page(repository: Repository, fields: Sequence[str] = FILE_LIST_DEFAULT_FIELDS,
+             file_types: Optional[Sequence[str]] = None, prefix: str = '', cursor: Optional[str] = None,
+             limit: int = 500) -> Tuple[List[Dict], Optional[str]]:
+        """One page of files in path order, and the cursor of the next page (None on the last)
+
+        Keyset pagination on file_path: a page costs the same however deep into the listing it is,
+        and files added or removed meanwhile do not shift later pages.
+        """
+        files = under_prefix(RepositoryFile.objects.filter(repository=repository), prefix)
+        if file_types:
+            files = files.filter(file_type__in=file_types)
+        if cursor:
+            files = files.filter(file_path__gt=decode_cursor(cursor))
+
+        # file_path is needed for the next cursor even when it is not selected
+        selected = list(fields) if 'file_path' in fields else list(fields) + ['file_path']
+        rows = FileListing._rows(files.order_by('file_path')[:limit + 1], selected)
+        next_cursor = encode_cursor(rows[limit - 1]['file_path']) if len(rows) > limit else None
+        rows = rows[:limit]
+        if 'file_path' not in fields:
+            for row in rows:
+                del row['file_path']
+        return rows, next_cursor
+
+    @staticmethod
+    def count(repository: Repository, file_types: Optional[Sequence[str]] = None, prefix: str = '') -> int:
+        files = under_prefix(RepositoryFile.objects.filter(repository=repository), prefix)
+        if file_types:
+            files = files.filter(file_type__in=file_types)
+        return files.count()
+
+    @staticmethod
+    def tree_level(repository: Repository, path: str = '',
+                   fields: Sequence[str] = FILE_LIST_DEFAULT_FIELDS) -> Dict:
+        """The directories and files directly inside path ('' for the root)
+
+        Directories come with the number of files below them, so a client can expand one level per request.
+        """
+        prefix = f'{path}/' if path else ''
+        files = RepositoryFile.objects.filter(repository=repository)
+
+        # One row per directory below path, counted on the (repository, directory) index
+        below = under_prefix(files, prefix, 'directory') if prefix else files.filter(directory__gt='')
+        directories: Dict[str, int] = {}
+        for directory, count in below.values('directory').annotate(count=Count('id')).values_list('directory', 'count'):
+            name = directory[len(prefix):].split('/', 1)[0]
+            directories[name] = directories.get(name, 0) + count
+
+        return {
+            'path': path,
+            'directories': [
+                {'name': name, 'path': prefix + name, 'file_count': count}
+                for name, count in sorted(directories.items())
+            ],
+            'files': FileListing._rows(files.filter(directory=path).order_by('file_path'), fields),
+        }
@@ -0,0 +1,300 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import GitHubCacheEntry
+from . import metrics
+from .http_client import get_async_client
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GitHubError(Exception):
+    """Raised when GitHub keeps failing after every retry"""
+
+
+class GitHubRateLimitError(GitHubError):
+    """Raised when the request budget is spent and resets later than we are willing to wait"""
+
+
+class RateLimiter:
+    """Token bucket holding the requests left in GitHub's current rate-limit window
+
+    The bucket is refilled from the X-RateLimit headers of every response. Above the
+    reserve (a fraction of the limit) tokens are spent as fast as callers ask; below it
+    the remaining ones are spread evenly until X-RateLimit-Reset, and an empty bucket
+    makes callers wait for the reset.
+    """
+
+    def __init__(self, reserve_fraction: float = 0.1):
+        self._lock = threading.Lock()
+        self.reserve_fraction = reserve_fraction
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0  # Epoch seconds, as GitHub reports it
+        self.next_slot = 0.0  # Monotonic time the next paced request may start
+
+    def update(self, headers) -> None:
+        """Resync with the budget reported on a response"""
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_at = float(headers['X-RateLimit-Reset'])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            if reset_at == self.reset_at and self.remaining is not None:
+                # Concurrent responses arrive out of order and requests still in flight are not counted yet
+                remaining = min(remaining, self.remaining)
+            self.limit, self.remaining, self.reset_at = limit, remaining, reset_at
+
+    def reserve(self) -> float:
+        """Take a token for one request and return the seconds to wait before sending it"""
+        with self._lock:
+            now = time.time()
+            if self.remaining is None or now >= self.reset_at:
+                # Budget not reported yet, or a new window has started
+                self.remaining = None
+                return 0.0
+            if self.remaining <= 0:
+                return self.reset_at - now + 1
+
+            self.remaining -= 1
+            if self.remaining >= self.limit * self.reserve_fraction:
+                return 0.0
+
+            clock = time.monotonic()
+            start = max(clock, self.next_slot)
+            # Spread what is left evenly over the part of the window after this request's slot
+            self.next_slot = start + max(0.0, self.reset_at - now - (start - clock)) / (self.remaining + 1)
+            return start - clock
+
+    def reset_time(self) -> str:
+        return time.strftime('%H:%M:%S', time.localtime(self.reset_at))
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def shared_limiter(token: Optional[str]) -> RateLimiter:
+    """The process-wide limiter for a set of credentials (GitHub budgets are per token, or per IP without one)"""
+    identity = hashlib.sha256((token or '').encode()).hexdigest()
+    with _limiters_lock:
+        if identity not in _limiters:
+            _limiters[identity] = RateLimiter(getattr(settings, 'GITHUB_RATE_LIMIT_RESERVE', 0.1))
+        return _limiters[identity]
+
+
+class GitHubClient:
+    """GitHub REST calls with rate-limit pacing, retries and an ETag/Last-Modified cache
+
+    Cached URLs are requested with If-None-Match/If-Modified-Since; a 304 replays the
+    stored body and, for authenticated requests, does not count against the rate limit.
+    """
+
+    backoff = 1.0  # Seconds before the first retry of a failed request, doubled on each further one
+
+    def __init__(self, headers: Dict[str, str], token: Optional[str] = None):
+        self.headers = headers
+        self.token = token
+        self.limiter = shared_limiter(token)
+        self.max_retries = getattr(settings, 'GITHUB_MAX_RETRIES', 3)
+        self.max_wait = getattr(settings, 'GITHUB_RATE_LIMIT_MAX_WAIT', 300)
+        self.hooks = {'response': [metrics.response_hook('github')]} if metrics.enabled() else None
+
+    def request(self, url: str, stream: bool = False, timeout: float = 30,
+                extra_headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET url, waiting for the rate limiter and retrying rate-limit and server errors"""
+        headers = {**self.headers, **(extra_headers or {})}
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._pacing_delay())
+            try:
+                response = requests.get(url, headers=headers, stream=stream, timeout=timeout, hooks=self.hooks)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self.limiter.update(response.headers)
+            try:
+                delay = self._retry_delay(url, attempt, response.status_code, response.headers)
+            except GitHubError:
+                response.close()
+                raise
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+
+    def get_json(self, url: str, cached: bool = False) -> Optional[Any]:
+        """Decoded JSON body of a 200 (or, when cached, a 304) response; None for other statuses"""
+        entry = self._cache_entry(url) if cached else None
+        response = self.request(url, extra_headers=self._conditional_headers(entry))
+
+        if response.status_code == 304 and entry is not None:
+            self._cache_hit(entry)
+            return json.loads(zlib.decompress(entry.body))
+        if response.status_code != 200:
+            return None
+
+        if cached:
+            self._cache_store(url, response.headers, response.content)
+        return response.json()
+
+    @contextlib.contextmanager
+    def stream(self, url: str, timeout: float = 60) -> Iterator[requests.Response]:
+        """Streaming GET for large downloads, with the same pacing and retries"""
+        response = self.request(url, stream=True, timeout=timeout)
+        try:
+            yield response
+        finally:
+            response.close()
+
+    async def arequest(self, url: str, stream: bool = False, timeout: float = 30,
+                       extra_headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """request for async callers, over the pooled httpx client of the running loop"""
+        client = get_async_client()
+        headers = {**self.headers, **(extra_headers or {})}
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self._pacing_delay())
+            try:
+                response = await client.send(
+                    client.build_request('GET', url, headers=headers, timeout=timeout),
+                    stream=stream, follow_redirects=True
+                )
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            self.limiter.update(response.headers)
+            try:
+                delay = self._retry_delay(url, attempt, response.status_code, response.headers)
+            except GitHubError:
+                await response.aclose()
+                raise
+            if delay is None:
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def aget_json(self, url: str, cached: bool = False) -> Optional[Any]:
+        entry = await sync_to_async(self._cache_entry)(url) if cached else None
+        response = await self.arequest(url, extra_headers=self._conditional_headers(entry))
+
+        if response.status_code == 304 and entry is not None:
+            await sync_to_async(self._cache_hit)(entry)
+            return json.loads(zlib.decompress(entry.body))
+        if response.status_code != 200:
+            return None
+
+        if cached:
+            await sync_to_async(self._cache_store)(url, response.headers, response.content)
+        return response.json()
+
+    @contextlib.asynccontextmanager
+    async def astream(self, url: str, timeout: float = 60) -> AsyncIterator[httpx.Response]:
+        response = await self.arequest(url, stream=True, timeout=timeout)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    def _pacing_delay(self) -> float:
+        delay = self.limiter.reserve()
+        if delay > self.max_wait:
+            raise GitHubRateLimitError(
+                f'GitHub API rate limit exhausted; it resets at {self.limiter.reset_time()}'
+            )
+        if delay > 1:
+            logger.info('Pacing GitHub requests: waiting %.1fs (%s left)', delay, self.limiter.remaining)
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, so clients that failed together do not retry together
+        return random.uniform(0.5, 1.0) * self.backoff * 2 ** attempt
+
+    def _retry_delay(self, url: str, attempt: int, status: int, headers) -> Optional[float]:
+        """Seconds to wait before retrying a response, or None to hand it to the caller
+
+        Raises once a retryable failure is out of attempts or would need too long a wait.
+        """
+        retry_after = headers.get('Retry-After')
+        budget_spent = headers.get('X-RateLimit-Remaining') == '0'
+        # A 403 is also what GitHub sends for permission errors, which retrying does not fix
+        rate_limited = status == 429 or (status == 403 and (retry_after is not None or budget_spent))
+        if status not in RETRY_STATUSES and not rate_limited:
+            return None
+
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        elif budget_spent:
+            delay = self.limiter.reset_at - time.time() + 1
+        else:
+            delay = self._backoff(attempt)
+
+        if rate_limited and (attempt == self.max_retries or delay > self.max_wait):
+            raise GitHubRateLimitError(
+                f'GitHub API rate limit exceeded (HTTP {status}); it resets at {self.limiter.reset_time()}'
+            )
+        if attempt == self.max_retries:
+            raise GitHubError(f'GitHub returned HTTP {status} for {url} after {attempt + 1} attempts')
+
+        logger.warning('GitHub returned HTTP %s for %s; retrying in %.1fs', status, url, delay)
+        return max(0.0, delay)
+
+    def _cache_key(self, url: str) -> str:
+        # Responses can differ per token (private repositories), so the credentials are part of the key
+        return hashlib.sha256(f'{self.token or ""}\0{url}'.encode()).hexdigest()
+
+    def _cache_entry(self, url: str) -> Optional[GitHubCacheEntry]:
+        return GitHubCacheEntry.objects.filter(key=self._cache_key(url)).first()
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[GitHubCacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    @staticmethod
+    def _cache_hit(entry: GitHubCacheEntry) -> None:
+        GitHubCacheEntry.objects.filter(id=entry.id).update(hit_count=F('hit_count') + 1)
+
+    def _cache_store(self, url: str, headers, body: bytes) -> None:
+        etag = headers.get('ETag', '')
+        last_modified = headers.get('Last-Modified', '')
+        if not etag and not last_modified:
+            return
+        key = self._cache_key(url)
+        values = {'url': url, 'etag': etag, 'last_modified': last_modified, 'body': zlib.compress(body)}
+        # Update first, as AnalysisCache.put does, so concurrent ingestions do not trip SQLite's lock upgrade
+        if not GitHubCacheEntry.objects.filter(key=key).update(**values):
+            try:
+                with transaction.atomic():
+                    GitHubCacheEntry.objects.create(key=key, **values)
+            except IntegrityError:
+                pass
@@ -1,14 +1,28 @@
+import asyncio
 import requests
 import base64
+import hashlib
 import re
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from typing import Tuple, Optional, List, Dict
+from typing import Tuple, Optional, List, Dict, Iterable, Iterator, BinaryIO, Callable
+
+from .github_client import GitHubClient, GitHubError
+
+MAX_FILE_SIZE = 1_000_000  # 1MB limit
 
 class GitHubService:
     def __init__(self):
         self.token = getattr(settings, 'GITHUB_TOKEN', None)
         self.headers = {'Authorization': f'token {self.token}'} if self.token else {}
-        self.base_url = 'https://api.github.com'
+        self.base_url = getattr(settings, 'GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+        self.fetch_concurrency = getattr(settings, 'GITHUB_FETCH_CONCURRENCY', 8)
+        self.client = GitHubClient(self.headers, self.token)
     
     def parse_repo_url(self, url: str) -> Tuple[Optional[str], Optional[str]]:
         """Extract owner and repo name from GitHub URL"""
@@ -30,32 +44,28 @@ class GitHubService:
     
     def get_repo_info(self, owner: str, repo: str) -> Dict:
         """Get repository information"""
-        url = f'{self.base_url}/repos/{owner}/{repo}'
-        response = requests.get(url, headers=self.headers)
-        
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'description': data.get('description', ''),
-                'language': data.get('language', ''),
-                'stars': data.get('stargazers_count', 0),
-                'forks': data.get('forks_count', 0),
-            }
-        return {}
-    
-    def get_repo_files(self, owner: str, repo: str, branch: str = 'main') -> List[Dict]:
-        """Get all files in repository"""
-        url = f'{self.base_url}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1'
-        response = requests.get(url, headers=self.headers)
-        
-        if response.status_code == 200:
-            return response.json().get('tree', [])
-        
-        # Try 'master' if 'main' fails
-        if branch == 'main':
-            return self.get_repo_files(owner, repo, 'master')
-        
-        return []
+        data = self.client.get_json(f'{self.base_url}/repos/{owner}/{repo}', cached=True)
+        return self.repo_info_from(data) if data else {}
+    
+    @staticmethod
+    def repo_info_from(data: Dict) -> Dict:
+        """The repository fields we keep from a /repos/{owner}/{repo} response"""
+        return {
+            'description': data.get('description', ''),
+            'language': data.get('language', ''),
+            'stars': data.get('stargazers_count', 0),
+            'forks': data.get('forks_count', 0),
+            'default_branch': data.get('default_branch') or '',
+        }
+    
+    def get_repo_files(self, owner: str, repo: str, branch: Optional[str] = None) -> List[Dict]:
+        """Get all files in repository, from its default branch unless one is given"""
+        branch = branch or self.get_repo_info(owner, repo).get('default_branch') or 'HEAD'
+        data = self.client.get_json(self.tree_url(owner, repo, branch), cached=True)
+        return data.get('tree', []) if data else []
+    
+    def tree_url(self, owner: str, repo: str, branch: str) -> str:
+        return f'{self.base_url}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1'
     
     def is_text_file(self, file_path: str) -> bool:
         """Enhanced text file detection"""
@@ -107,36 +117,200 @@ class GitHubService:
         if not self.is_text_file(file_path):
             return None
         
-        url = f'{self.base_url}/repos/{owner}/{repo}/contents/{file_path}'
-        response = requests.get(url, headers=self.headers)
+        # Not conditional: ingestion only asks for files whose blob SHA changed since the last fetch
+        response = self.client.request(f'{self.base_url}/repos/{owner}/{repo}/contents/{file_path}')
         
         if response.status_code == 200:
-            data = response.json()
-            
-            # Check if file is too large
-            if data.get('size', 0) > 1_000_000:  # 1MB limit
-                return "File too large for analysis"
+            return self.content_from(response.json())
+        
+        return None
+    
+    def content_from(self, data: Dict) -> Optional[str]:
+        """File text from a /contents response"""
+        # Check if file is too large
+        if data.get('size', 0) > MAX_FILE_SIZE:
+            return "File too large for analysis"
+        
+        content = data.get('content', '')
+        if not content:
+            return None
+        
+        try:
+            # Decode base64 content
+            return self.decode_bytes(base64.b64decode(content))
+        except Exception as e:
+            return f"Error reading file: {str(e)}"
+    
+    def decode_bytes(self, raw: bytes) -> str:
+        """Decode raw file bytes trying common encodings"""
+        encodings = ['utf-8', 'utf-16', 'latin1', 'cp1252', 'iso-8859-1']
+        for encoding in encodings:
+            try:
+                return raw.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        
+        # If all fail, return error message
+        return "Unable to decode file content"
+    
+    def get_files_content(self, owner: str, repo: str, file_paths: Iterable[str],
+                          max_workers: Optional[int] = None,
+                          progress: Optional[Callable[[int], None]] = None) -> List[Dict]:
+        """Fetch many files concurrently, preserving input order"""
+        file_paths = list(file_paths)
+        workers = max(1, min(max_workers or self.fetch_concurrency, len(file_paths) or 1))
+        
+        # executor.map yields results in submission order regardless of completion order
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(lambda file_path: self.fetch_file(owner, repo, file_path), file_paths):
+                results.append(result)
+                if progress:
+                    progress(len(results))
+        return results
+
+    def fetch_file(self, owner: str, repo: str, file_path: str) -> Dict:
+        """Result entry for one file, with request failures recorded instead of raised"""
+        try:
+            content = self.get_file_content(owner, repo, file_path)
+        except (requests.RequestException, GitHubError) as e:
+            return {'path': file_path, 'content': None, 'error': str(e)}
+        return self.fetch_result(file_path, content)
+
+    @staticmethod
+    def fetch_result(file_path: str, content: Optional[str]) -> Dict:
+        """Result entry for one fetched file, turning decode failures into errors"""
+        if content and content.startswith(('Error reading file', 'Unable to decode')):
+            return {'path': file_path, 'content': None, 'error': content}
+        return {'path': file_path, 'content': content, 'error': None}
+
+    def get_archive_files(self, owner: str, repo: str, ref: Optional[str] = None,
+                          archive_format: str = 'tarball') -> List[Dict]:
+        """Download the repository archive in one request and extract text files"""
+        url = f'{self.base_url}/repos/{owner}/{repo}/{archive_format}'
+        if ref:
+            url += f'/{ref}'
+        
+        with self.client.stream(url) as response:
+            if response.status_code != 200:
+                return []
+            response.raw.decode_content = True
             
-            content = data.get('content', '')
-            if not content:
-                return None
+            if archive_format == 'zipball':
+                # Zip central directories live at the end, so spool the archive (not its members)
+                with tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024) as spool:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        spool.write(chunk)
+                    spool.seek(0)
+                    return list(self.iter_archive_files(spool, archive_format))
             
-            try:
-                # Decode base64 content
-                decoded_bytes = base64.b64decode(content)
-                
-                # Try different encodings
-                encodings = ['utf-8', 'utf-16', 'latin1', 'cp1252', 'iso-8859-1']
-                for encoding in encodings:
-                    try:
-                        return decoded_bytes.decode(encoding)
-                    except UnicodeDecodeError:
+            return list(self.iter_archive_files(response.raw, archive_format))
+    
+    def iter_archive_files(self, fileobj: BinaryIO, archive_format: str = 'tarball') -> Iterator[Dict]:
+        """Stream text files out of a GitHub tarball/zipball file object"""
+        if archive_format == 'zipball':
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
                         continue
-                
-                # If all fail, return error message
-                return "Unable to decode file content"
-                
-            except Exception as e:
-                return f"Error reading file: {str(e)}"
+                    yield from self._archive_entry(
+                        info.filename, info.file_size, lambda: archive.read(info)
+                    )
+            return
+        
+        # 'r|gz' reads the stream sequentially without seeking or unpacking to disk
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                yield from self._archive_entry(
+                    member.name, member.size, lambda: archive.extractfile(member).read()
+                )
+    
+    def _archive_entry(self, name: str, size: int, read) -> Iterator[Dict]:
+        """Apply the text and size filters to a single archive member"""
+        # GitHub archives wrap everything in an '<owner>-<repo>-<sha>/' directory
+        file_path = name.split('/', 1)[1] if '/' in name else name
+        if not file_path or not self.is_text_file(file_path):
+            return
+        
+        if size > MAX_FILE_SIZE:
+            yield {'path': file_path, 'sha': '', 'content': "File too large for analysis", 'error': None}
+            return
+        
+        try:
+            raw = read()
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            yield {'path': file_path, 'sha': '', 'content': None, 'error': f"Error reading file: {str(e)}"}
+            return
+        
+        sha = self.blob_sha(raw)
+        content = self.decode_bytes(raw)
+        if content == "Unable to decode file content":
+            yield {'path': file_path, 'sha': sha, 'content': None, 'error': content}
+        else:
+            yield {'path': file_path, 'sha': sha, 'content': content, 'error': None}
+    
+    @staticmethod
+    def blob_sha(raw: bytes) -> str:
+        """Compute the git blob SHA-1 so archive entries match tree entries"""
+        header = f'blob {len(raw)}\0'.encode()
+        return hashlib.sha1(header + raw).hexdigest()
+
+
+class AsyncGitHubService(GitHubService):
+    """GitHubService with awaitable fetches over a pooled httpx client, for async views"""
+    
+    async def aget_repo_info(self, owner: str, repo: str) -> Dict:
+        data = await self.client.aget_json(f'{self.base_url}/repos/{owner}/{repo}', cached=True)
+        return self.repo_info_from(data) if data else {}
+    
+    async def aget_repo_files(self, owner: str, repo: str, branch: Optional[str] = None) -> List[Dict]:
+        branch = branch or (await self.aget_repo_info(owner, repo)).get('default_branch') or 'HEAD'
+        data = await self.client.aget_json(self.tree_url(owner, repo, branch), cached=True)
+        return data.get('tree', []) if data else []
+    
+    async def aget_file_content(self, owner: str, repo: str, file_path: str) -> Optional[str]:
+        if not self.is_text_file(file_path):
+            return None
         
+        response = await self.client.arequest(f'{self.base_url}/repos/{owner}/{repo}/contents/{file_path}')
+        if response.status_code == 200:
+            return self.content_from(response.json())
         return None
+    
+    async def aget_files_content(self, owner: str, repo: str, file_paths: Iterable[str],
+                                 max_concurrency: Optional[int] = None) -> List[Dict]:
+        """Fetch many files concurrently on the event loop, preserving input order"""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.fetch_concurrency))
+        
+        async def fetch(file_path: str) -> Dict:
+            async with semaphore:
+                try:
+                    content = await self.aget_file_content(owner, repo, file_path)
+                except (httpx.HTTPError, GitHubError) as e:
+                    return {'path': file_path, 'content': None, 'error': str(e)}
+            return self.fetch_result(file_path, content)
+        
+        return list(await asyncio.gather(*(fetch(file_path) for file_path in file_paths)))
+    
+    async def aget_archive_files(self, owner: str, repo: str, ref: Optional[str] = None,
+                                 archive_format: str = 'tarball') -> List[Dict]:
+        """Download the archive without blocking the loop, then extract it in a worker thread"""
+        url = f'{self.base_url}/repos/{owner}/{repo}/{archive_format}'
+        if ref:
+            url += f'/{ref}'
+        
+        spool = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+        try:
+            async with self.client.astream(url) as response:
+                if response.status_code != 200:
+                    return []
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    spool.write(chunk)
+            spool.seek(0)
+            return await sync_to_async(
+                lambda: list(self.iter_archive_files(spool, archive_format)), thread_sensitive=False
+            )()
+        finally:
+            spool.close()
@@ -0,0 +1,30 @@
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+from . import metrics
+
+# httpx.AsyncClient connections belong to the event loop that opened them, so there is one client per loop
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client shared by every coroutine running on the current event loop
+
+    Under an ASGI server that is the whole worker process; under WSGI each async view runs
+    in a short-lived loop and the pool only lives as long as that request.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        max_connections = getattr(settings, 'ASYNC_HTTP_MAX_CONNECTIONS', 100)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        options = {}
+        if metrics.enabled():
+            # A transport given to the client replaces the one it would build, so it carries the limits
+            options['transport'] = metrics.InstrumentedTransport(httpx.AsyncHTTPTransport(limits=limits))
+        client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30, connect=5), **options)
+        _clients[loop] = client
+    return client
@@ -0,0 +1,502 @@
+import contextlib
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
+from ..models import FileBlob, Repository, RepositoryFile
+from .blob_store import BlobStore
+from .dependency_service import DependencyGraph, language_of
+from .embedding_service import EmbeddingIndex
+from .github_client import GitHubError
+from .github_service import AsyncGitHubService, GitHubService
+from .persistence_service import BulkWriter
+from .search_index import SearchIndex
+from .symbol_index import SymbolIndex
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+INGEST_MODES = ('api', 'tarball', 'zipball')
+
+
+class IngestionError(Exception):
+    """Raised when a repository cannot be ingested"""
+
+
+class IngestionService:
+    def __init__(self, github_service: Optional[GitHubService] = None):
+        self.github = github_service or GitHubService()
+
+    def ingest(self, github_url: str, ingest_mode: str = 'api',
+               progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Sync a repository into the database, only touching blobs whose SHA changed
+
+        progress, when given, is called with keyword counters (repository,
+        files_total, files_fetched) as ingestion advances.
+        """
+        progress = progress or (lambda **counters: None)
+        owner, repo_name = self._parse(github_url, ingest_mode)
+
+        with self._github_errors():
+            # Get repository info
+            repo_info = self.github.get_repo_info(owner, repo_name)
+            repository, existing = self._open_repository(github_url, owner, repo_name, repo_info)
+
+            if ingest_mode == 'api':
+                tree = self.github.get_repo_files(owner, repo_name, repo_info.get('default_branch'))
+                remote, to_fetch = self._plan_tree(tree, existing)
+                progress(repository=repository, files_total=len(to_fetch))
+                fetched = self.github.get_files_content(
+                    owner, repo_name, to_fetch, progress=lambda done: progress(files_fetched=done)
+                )
+                for result in fetched:
+                    result['sha'] = remote[result['path']]
+            else:
+                # One archive download instead of a contents request per file
+                remote, fetched = self._plan_archive(
+                    self.github.get_archive_files(owner, repo_name, archive_format=ingest_mode), existing
+                )
+                progress(repository=repository, files_total=len(fetched), files_fetched=len(fetched))
+
+        return self._store(repository, existing, remote, fetched)
+
+    async def aingest(self, github_url: str, ingest_mode: str = 'api') -> Dict:
+        """ingest for async views: GitHub requests are awaited, database work runs through sync_to_async"""
+        owner, repo_name = self._parse(github_url, ingest_mode)
+        github = self.github if isinstance(self.github, AsyncGitHubService) else AsyncGitHubService()
+
+        with self._github_errors():
+            repo_info = await github.aget_repo_info(owner, repo_name)
+            repository, existing = await sync_to_async(self._open_repository)(
+                github_url, owner, repo_name, repo_info
+            )
+
+            if ingest_mode == 'api':
+                tree = await github.aget_repo_files(owner, repo_name, repo_info.get('default_branch'))
+                remote, to_fetch = self._plan_tree(tree, existing)
+                fetched = await github.aget_files_content(owner, repo_name, to_fetch)
+                for result in fetched:
+                    result['sha'] = remote[result['path']]
+            else:
+                remote, fetched = self._plan_archive(
+                    await github.aget_archive_files(owner, repo_name, archive_format=ingest_mode), existing
+                )
+
+        return await sync_to_async(self._store)(repository, existing, remote, fetched)
+
+    def ingest_many(self, github_urls: Iterable[str], ingest_mode: str = 'api',
+                    concurrency: Optional[int] = None,
+                    progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Ingest several repositories in one run that shares a single pool of GitHub requests
+
+        Returns a summary per repository (changes and timings, or the error) plus totals.
+        progress, when given, is called with files_total and files_fetched counters.
+        """
+        if ingest_mode not in INGEST_MODES:
+            raise IngestionError("ingest_mode must be 'api', 'tarball' or 'zipball'")
+        return BatchIngestion(self, ingest_mode, concurrency, progress).run(github_urls)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _github_errors():
+        """Report rate limiting and persistent GitHub failures as ingestion errors, not as an empty repository"""
+        try:
+            yield
+        except (GitHubError, requests.RequestException, httpx.HTTPError) as e:
+            raise IngestionError(str(e)) from e
+
+    def _parse(self, github_url: str, ingest_mode: str):
+        if ingest_mode not in INGEST_MODES:
+            raise IngestionError("ingest_mode must be 'api', 'tarball' or 'zipball'")
+
+        owner, repo_name = self.github.parse_repo_url(github_url)
+        if not owner or not repo_name:
+            raise IngestionError('Invalid GitHub URL format')
+        return owner, repo_name
+
+    @staticmethod
+    def _open_repository(github_url: str, owner: str, repo_name: str, repo_info: Dict):
+        """The repository row plus path -> (id, sha, blob hash) of what is already stored"""
+        # Create or get repository
+        repository, _ = Repository.objects.get_or_create(
+            github_url=github_url,
+            defaults={
+                'owner': owner,
+                'repo_name': repo_name,
+                'description': repo_info.get('description', ''),
+                'language': repo_info.get('language', '')
+            }
+        )
+
+        existing = {
+            row['file_path']: (row['id'], row['sha'], row['blob_id'])
+            for row in RepositoryFile.objects.filter(repository=repository).values('id', 'file_path', 'sha', 'blob_id')
+        }
+        return repository, existing
+
+    def _plan_tree(self, tree: List[Dict], existing: Dict):
+        """(path -> sha of every remote text file, paths whose blob must be fetched)"""
+        if not tree:
+            raise IngestionError('Unable to fetch repository files. Check if the repository exists and is public.')
+
+        remote = {
+            entry['path']: entry.get('sha', '')
+            for entry in tree
+            if entry['type'] == 'blob' and self.github.is_text_file(entry['path'])
+        }
+        stored_sha = {path: sha for path, (_, sha, _) in existing.items()}
+        to_fetch = [path for path, sha in remote.items() if not sha or stored_sha.get(path) != sha]
+        return remote, to_fetch
+
+    @staticmethod
+    def _plan_archive(fetched: List[Dict], existing: Dict):
+        """(path -> sha of every archive file, the entries that changed)"""
+        if not fetched:
+            raise IngestionError('Unable to fetch repository archive. Check if the repository exists and is public.')
+
+        stored_sha = {path: sha for path, (_, sha, _) in existing.items()}
+        remote = {result['path']: result['sha'] for result in fetched}
+        changed = [
+            result for result in fetched
+            if not result['sha'] or stored_sha.get(result['path']) != result['sha']
+        ]
+        return remote, changed
+
+    @staticmethod
+    def _store(repository: Repository, existing: Dict, remote: Dict, fetched: List[Dict]) -> Dict:
+        """Write fetched files, drop vanished ones and refresh the derived indexes"""
+        stats = {'added': 0, 'updated': 0, 'unchanged': len(remote) - len(fetched), 'removed': 0}
+        failed_files = []
+        stale_ids = [file_id for path, (file_id, _, _) in existing.items() if path not in remote]
+
+        accepted = []
+        for result in fetched:
+            file_path = result['path']
+            content = result['content']
+
+            if result['error']:
+                # Keep the previously stored version rather than losing the file
+                failed_files.append({'file_path': file_path, 'error': result['error']})
+                continue
+
+            if not content or len(content.strip()) == 0:
+                # A file that became empty is dropped, exactly as a fresh ingestion would
+                if content is not None and file_path in existing:
+                    stale_ids.append(existing[file_path][0])
+                continue
+
+            accepted.append(result)
+
+        writer = BulkWriter(
+            RepositoryFile,
+            update_fields=['file_type', 'file_size', 'sha', 'blob', 'content_preview', 'analysis', 'analyzed_at']
+        )
+        written = {}
+        # One transaction from the blob inserts to the release of old blobs: another ingestion's
+        # release() cannot delete a blob this one stored until the files referring to it are written
+        with transaction.atomic():
+            # Bodies go to the shared blob store first; file rows only reference them by hash
+            blob_hashes = BlobStore.put_many(result['content'] for result in accepted)
+
+            with writer:
+                for result, blob_hash in zip(accepted, blob_hashes):
+                    file_path = result['path']
+                    file_ext = file_path.split('.')[-1] if '.' in file_path else ''
+                    repo_file = RepositoryFile(
+                        repository=repository,
+                        file_path=file_path,
+                        directory=posixpath.dirname(file_path),
+                        file_type=file_ext,
+                        file_size=len(result['content']),
+                        sha=result['sha'],
+                        blob_id=blob_hash
+                    )
+
+                    if file_path in existing:
+                        # Content changed, so any stored analysis or preview is out of date
+                        repo_file.id = existing[file_path][0]
+                        writer.update(repo_file)
+                    else:
+                        writer.create(repo_file)
+                    written[file_path] = result['content']
+
+            if stale_ids:
+                RepositoryFile.objects.filter(id__in=stale_ids).delete()
+                stats['removed'] = len(stale_ids)
+
+            # Old versions of changed or removed files, unless another file (of any repository) still shares them
+            removed_ids = set(stale_ids)
+            BlobStore.release(
+                blob for path, (file_id, _, blob) in existing.items() if path in written or file_id in removed_ids
+            )
+
+        stats['added'] = writer.created
+        stats['updated'] = writer.updated
+
+        written_ids = IngestionService._written_ids(repository, list(written))
+        SearchIndex.index_files(repository, [(written_ids[path], content) for path, content in written.items()])
+        SymbolIndex.index_files(repository, [
+            (written_ids[path], path, content) for path, content in written.items() if language_of(path)
+        ])
+
+        if stats['added'] or stats['removed']:
+            # New or vanished paths can change how any import resolves
+            DependencyGraph.rebuild(repository)
+        elif written_ids:
+            DependencyGraph.rebuild(repository, source_ids=written_ids.values())
+
+        # Embedding is left to the job worker; until it finishes, search falls back to keyword candidates
+        embeddings = EmbeddingIndex().schedule(repository, changed=bool(written or stale_ids))
+
+        return {
+            'repository': repository,
+            'total_files': RepositoryFile.objects.filter(repository=repository).count(),
+            'failed_files': failed_files,
+            'stats': stats,
+            'embeddings': embeddings,
+        }
+
+    @staticmethod
+    def _written_ids(repository: Repository, paths: List[str]) -> Dict[str, int]:
+        """Primary keys of freshly written files (bulk_create does not hand them back on every backend)"""
+        ids = {}
+        for start in range(0, len(paths), 500):
+            ids.update(RepositoryFile.objects.filter(
+                repository=repository, file_path__in=paths[start:start + 500]
+            ).values_list('file_path', 'id'))
+        return ids
+
+
+class BatchIngestion:
+    """One IngestionService.ingest_many run
+
+    Every repository's info, tree (or archive) and file requests go through the same
+    pool of workers, and through the process-wide GitHub rate limiter, so throughput is
+    bounded by the network and the API budget rather than by repositories taking turns.
+    A file whose blob SHA is already stored, or already being downloaded for another
+    repository, is not fetched again. Each repository is handed to a single writer thread
+    as soon as its last file arrives, so the dispatch loop keeps submitting the other
+    repositories' fetches while it is stored and indexed.
+    """
+
+    def __init__(self, service: IngestionService, ingest_mode: str, concurrency: Optional[int] = None,
+                 progress: Optional[Callable[..., None]] = None):
+        self.service = service
+        self.github = service.github
+        self.ingest_mode = ingest_mode
+        self.concurrency = max(1, concurrency or self.github.fetch_concurrency)
+        self.progress = progress or (lambda **counters: None)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending: Dict[Future, Tuple[str, object]] = {}  # Future -> ('listing', entry) or ('file', blob key)
+        self.waiters: Dict[str, List[Tuple[Dict, str]]] = {}  # Blob key -> (entry, path) of every file waiting for it
+        self.writer: Optional[ThreadPoolExecutor] = None
+        self.writes: Dict[Future, Dict] = {}  # Future of a repository being stored -> its entry
+        self.unstored: Dict[str, List] = {}  # SHA -> [content, entries waiting for the writer with it]
+        self.files_total = 0
+        self.files_fetched = 0
+
+    def run(self, github_urls: Iterable[str]) -> Dict:
+        started = time.monotonic()
+        entries = [self._entry(github_url) for github_url in dict.fromkeys(github_urls)]
+
+        # One writer: SQLite takes one write transaction at a time anyway
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-writer') as writer:
+            self.executor, self.writer = executor, writer
+            for entry in entries:
+                if 'error' not in entry:
+                    self._submit(('listing', entry), self._fetch_listing, entry['owner'], entry['repo_name'])
+
+            while self.pending or self.writes:
+                done, _ = wait([*self.pending, *self.writes], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in self.writes:
+                        self._written(self.writes.pop(future), future)
+                        continue
+                    kind, target = self.pending.pop(future)
+                    if kind == 'listing':
+                        self._listing_done(target, future)
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Every repository waiting for the file records it as failed instead of stalling
+                        result = {'content': None, 'error': str(e)}
+                    self._file_done(target, result)
+                self.progress(files_fetched=self.files_fetched)
+
+        summaries = [self._summary(entry) for entry in entries]
+        succeeded = sum(1 for summary in summaries if summary['status'] == 'completed')
+        return {
+            'repositories': summaries,
+            'succeeded': succeeded,
+            'failed': len(summaries) - succeeded,
+            'files_fetched': sum(summary['files_fetched'] for summary in summaries),
+            'files_reused': sum(summary['files_reused'] for summary in summaries),
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
+
+    def _entry(self, github_url: str) -> Dict:
+        entry = {
+            'github_url': github_url, 'started': time.monotonic(), 'timings': {},
+            'results': [], 'waiting': 0, 'files_fetched': 0, 'files_reused': 0,
+        }
+        try:
+            entry['owner'], entry['repo_name'] = self.service._parse(github_url, self.ingest_mode)
+        except IngestionError as e:
+            entry['error'] = str(e)
+        return entry
+
+    def _submit(self, what: Tuple[str, object], func: Callable, *args):
+        self.pending[self.executor.submit(func, *args)] = what
+
+    def _fetch_listing(self, owner: str, repo_name: str):
+        """Repository info plus its tree or archive contents; runs on a pool thread"""
+        started = time.monotonic()
+        try:
+            with IngestionService._github_errors():
+                repo_info = self.github.get_repo_info(owner, repo_name)
+                if self.ingest_mode == 'api':
+                    listing = self.github.get_repo_files(owner, repo_name, repo_info.get('default_branch'))
+                else:
+                    listing = self.github.get_archive_files(owner, repo_name, archive_format=self.ingest_mode)
+        finally:
+            # The GitHub response cache opened a connection for this pool thread
+            connections.close_all()
+        return repo_info, listing, time.monotonic() - started
+
+    def _listing_done(self, entry: Dict, future: Future):
+        try:
+            repo_info, listing, entry['timings']['listing_seconds'] = future.result()
+            entry['repository'], entry['existing'] = self.service._open_repository(
+                entry['github_url'], entry['owner'], entry['repo_name'], repo_info
+            )
+            if self.ingest_mode == 'api':
+                entry['remote'], to_fetch = self.service._plan_tree(listing, entry['existing'])
+            else:
+                entry['remote'], entry['results'] = self.service._plan_archive(listing, entry['existing'])
+                to_fetch = []
+        except Exception as e:
+            # A malformed listing or a database error fails this repository, not the whole batch
+            entry['error'] = str(e)
+            return
+
+        entry['fetch_started'] = time.monotonic()
+        self.files_total += len(to_fetch)
+        self.progress(files_total=self.files_total)
+
+        remote = entry['remote']
+        # Files of repositories still queued for the writer are not in the database yet
+        stored = {sha: unstored[0] for sha, unstored in self.unstored.items()}
+        stored.update(self._stored_contents(
+            {remote[path] for path in to_fetch if remote[path]} - set(self.waiters) - set(stored)
+        ))
+        for path in to_fetch:
+            sha = remote[path]
+            if sha in stored:
+                entry['results'].append({'path': path, 'sha': sha, 'content': stored[sha], 'error': None})
+                entry['files_reused'] += 1
+                self.files_fetched += 1
+                continue
+
+            # Files without a SHA cannot be matched with anything else
+            key = sha or f"{entry['github_url']}\0{path}"
+            entry['waiting'] += 1
+            if key in self.waiters:
+                self.waiters[key].append((entry, path))
+                entry['files_reused'] += 1
+            else:
+                self.waiters[key] = [(entry, path)]
+                entry['files_fetched'] += 1
+                self._submit(('file', key), self.github.fetch_file, entry['owner'], entry['repo_name'], path)
+
+        if not entry['waiting']:
+            self._store(entry)
+
+    def _file_done(self, key: str, result: Dict):
+        for entry, path in self.waiters.pop(key):
+            entry['results'].append(dict(result, path=path, sha=entry['remote'][path]))
+            entry['waiting'] -= 1
+            self.files_fetched += 1
+            if not entry['waiting']:
+                self._store(entry)
+
+    def _store(self, entry: Dict):
+        """Queue a repository whose files have all arrived for the writer thread"""
+        entry['timings']['fetch_seconds'] = time.monotonic() - entry['fetch_started']
+        entry['unstored'] = set()
+        for result in entry['results']:
+            if result['sha'] and result['content'] and not result['error']:
+                unstored = self.unstored.setdefault(result['sha'], [result['content'], 0])
+                if result['sha'] not in entry['unstored']:
+                    entry['unstored'].add(result['sha'])
+                    unstored[1] += 1
+        self.writes[self.writer.submit(self._write, entry)] = entry
+
+    def _write(self, entry: Dict):
+        """Store one repository; runs on the writer thread"""
+        store_started = time.monotonic()
+        try:
+            entry['result'] = self.service._store(
+                entry['repository'], entry['existing'], entry['remote'], entry['results']
+            )
+        finally:
+            connections.close_all()
+        finished = time.monotonic()
+        entry['timings']['store_seconds'] = finished - store_started
+        entry['timings']['total_seconds'] = finished - entry['started']
+
+    def _written(self, entry: Dict, future: Future):
+        try:
+            future.result()
+        except Exception as e:
+            entry['error'] = str(e)
+        finally:
+            entry['results'] = None  # Let the file contents go before the other repositories finish
+            for sha in entry.pop('unstored'):
+                self.unstored[sha][1] -= 1
+                if not self.unstored[sha][1]:
+                    del self.unstored[sha]
+
+    @staticmethod
+    def _stored_contents(shas: Iterable[str]) -> Dict[str, str]:
+        """Text already in the blob store for these git blob SHAs, from files of any repository"""
+        shas = list(shas)
+        blob_by_sha = {}
+        for start in range(0, len(shas), 500):
+            blob_by_sha.update(RepositoryFile.objects.filter(
+                sha__in=shas[start:start + 500], blob__isnull=False
+            ).values_list('sha', 'blob_id'))
+
+        hashes = list(set(blob_by_sha.values()))
+        texts = {}
+        for start in range(0, len(hashes), 500):
+            for digest, data in FileBlob.objects.filter(hash__in=hashes[start:start + 500]).values_list('hash', 'data'):
+                texts[digest] = FileBlob.decompress(data)
+        return {sha: texts[digest] for sha, digest in blob_by_sha.items() if digest in texts}
+
+    @staticmethod
+    def _summary(entry: Dict) -> Dict:
+        result = entry.get('result')
+        summary = {
+            'github_url': entry['github_url'],
+            'status': 'completed' if result else 'failed',
+            'repository_id': entry['repository'].id if entry.get('repository') else None,
+        }
+        if result:
+            summary.update({
+                'total_files': result['total_files'],
+                'changes': result['stats'],
+                'failed_files': result['failed_files'],
+                'embeddings': result['embeddings'],
+            })
+        else:
+            summary['error'] = entry.get('error', '')
+        summary.update({
+            'files_fetched': entry['files_fetched'],
+            'files_reused': entry['files_reused'],
+            'timings': {name: round(seconds, 2) for name, seconds in entry['timings'].items()},
+        })
+        return summary
@@ -0,0 +1,172 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import Job, Repository, RepositoryFile
+from .batch_analysis_service import BatchAnalyzer
+from .embedding_service import EmbeddingIndex
+from .ingestion_service import IngestionService
+from .llm_service import FileAnalyzer
+from .memory_service import MemoryService
+from .summary_service import RepositorySummarizer
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """Database-backed job queue; workers claim rows with a conditional UPDATE, no broker needed"""
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.handlers = {
+            Job.KIND_INGEST_REPOSITORY: self._run_ingest_repository,
+            Job.KIND_ANALYZE_FILE: self._run_analyze_file,
+            Job.KIND_ANALYZE_REPOSITORY: self._run_analyze_repository,
+            Job.KIND_INGEST_REPOSITORIES: self._run_ingest_repositories,
+            Job.KIND_SUMMARIZE_REPOSITORY: self._run_summarize_repository,
+            Job.KIND_EMBED_REPOSITORY: self._run_embed_repository,
+        }
+
+    @staticmethod
+    def enqueue(kind: str, payload: Dict, repository=None) -> Job:
+        """Queue a job for the worker"""
+        return Job.objects.create(kind=kind, payload=payload, repository=repository)
+
+    def claim_next(self) -> Optional[Job]:
+        """Atomically take the oldest pending job, or return None when the queue is empty"""
+        while True:
+            job_id = Job.objects.filter(status=Job.STATUS_PENDING).order_by('created_at', 'id').values_list(
+                'id', flat=True
+            ).first()
+            if job_id is None:
+                return None
+
+            # Only one worker can flip a given row from pending to running
+            claimed = Job.objects.filter(id=job_id, status=Job.STATUS_PENDING).update(
+                status=Job.STATUS_RUNNING,
+                worker=self.worker_id,
+                attempts=F('attempts') + 1,
+                started_at=timezone.now(),
+                updated_at=timezone.now()
+            )
+            if claimed:
+                return Job.objects.get(id=job_id)
+
+    def requeue_stale(self) -> int:
+        """Return running jobs whose worker stopped heartbeating to the queue"""
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 600))
+        return Job.objects.filter(status=Job.STATUS_RUNNING, updated_at__lt=cutoff).update(
+            status=Job.STATUS_PENDING, worker=''
+        )
+
+    def run(self, job: Job):
+        """Execute a claimed job and record its outcome"""
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f'Unknown job kind: {job.kind}')
+            result = handler(job)
+        except Exception as e:
+            logger.exception('Job %s failed', job.id)
+            job.refresh_from_db()
+            job.status = Job.STATUS_FAILED
+            job.errors = job.errors + [{'error': str(e)}]
+        else:
+            job.refresh_from_db()
+            job.status = Job.STATUS_COMPLETED
+            job.result = result
+        job.finished_at = timezone.now()
+        job.save()
+
+    def _progress_reporter(self, job: Job, min_interval: float = 1.0):
+        """Build a throttled callback that writes progress counters to the job row"""
+        last_write = [0.0]
+
+        def report(**counters):
+            repository = counters.pop('repository', None)
+            if repository is not None:
+                Job.objects.filter(id=job.id).update(repository=repository, updated_at=timezone.now())
+            now = time.monotonic()
+            # Counter totals are always written; per-file ticks at most once per interval
+            if 'files_total' in counters or now - last_write[0] >= min_interval:
+                last_write[0] = now
+                Job.objects.filter(id=job.id).update(updated_at=timezone.now(), **counters)
+
+        return report
+
+    def _run_ingest_repository(self, job: Job) -> Dict:
+        result = IngestionService().ingest(
+            job.payload['github_url'],
+            job.payload.get('ingest_mode', 'api'),
+            progress=self._progress_reporter(job)
+        )
+        # The throttled reporter may have skipped the last per-file tick
+        Job.objects.filter(id=job.id).update(files_fetched=F('files_total'), errors=result['failed_files'])
+        return {
+            'repository_id': result['repository'].id,
+            'total_files': result['total_files'],
+            'changes': result['stats'],
+            'embeddings': result['embeddings'],
+        }
+
+    def _run_ingest_repositories(self, job: Job) -> Dict:
+        result = IngestionService().ingest_many(
+            job.payload['github_urls'],
+            job.payload.get('ingest_mode', 'api'),
+            progress=self._progress_reporter(job)
+        )
+        Job.objects.filter(id=job.id).update(files_fetched=F('files_total'), errors=[
+            {'github_url': summary['github_url'], 'error': summary['error']}
+            for summary in result['repositories'] if summary['status'] == 'failed'
+        ])
+        return result
+
+    def _run_analyze_file(self, job: Job) -> Dict:
+        repo_file = RepositoryFile.objects.select_related('blob').get(id=job.payload['file_id'])
+        Job.objects.filter(id=job.id).update(repository_id=repo_file.repository_id, files_total=1)
+
+        analysis = FileAnalyzer().analyze_file(repo_file.content, repo_file.file_path)
+        MemoryService.store_analysis(repo_file, analysis)
+
+        Job.objects.filter(id=job.id).update(files_analyzed=1)
+        return {
+            'file_id': repo_file.id,
+            'file_path': repo_file.file_path,
+            'analyzed_at': repo_file.analyzed_at.isoformat(),
+        }
+
+    def _run_analyze_repository(self, job: Job) -> Dict:
+        repository = Repository.objects.get(id=job.payload['repository_id'])
+        result = BatchAnalyzer(
+            concurrency=job.payload.get('concurrency'),
+            time_budget=job.payload.get('time_budget')
+        ).run(repository, progress=self._progress_reporter(job))
+
+        Job.objects.filter(id=job.id).update(files_analyzed=result['files_analyzed'], errors=result['errors'])
+        return result
+
+    def _run_summarize_repository(self, job: Job) -> Dict:
+        repository = Repository.objects.get(id=job.payload['repository_id'])
+        result = RepositorySummarizer(concurrency=job.payload.get('concurrency')).run(
+            repository, progress=self._progress_reporter(job)
+        )
+
+        Job.objects.filter(id=job.id).update(files_analyzed=result['nodes_generated'], errors=result['errors'])
+        return result
+
+    def _run_embed_repository(self, job: Job) -> Dict:
+        repository = Repository.objects.get(id=job.payload['repository_id'])
+        result = EmbeddingIndex().update(repository, progress=self._progress_reporter(job))
+
+        Job.objects.filter(id=job.id).update(files_analyzed=result.get('embedded', 0))
+        if result['status'] in ('failed', 'partial'):
+            # The vectors already written are kept; running the job again embeds only what is missing
+            raise RuntimeError(f"{result['reason']} after {result.get('embedded', 0)} chunks")
+        return result
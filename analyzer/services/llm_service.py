@@ -1,85 +1,41 @@
 import requests
+import httpx
 import json
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, NamedTuple, Optional, Iterable, Iterator, Callable, Tuple
 
-class OllamaLLMService:
-    def __init__(self, host="http://localhost:11434"):
-        self.host = host
-        self.models = {
-            'code': 'codellama:7b',
-            'general': 'llama3:8b', 
-            'fallback': 'deepseek-coder:6.7b'
-        }
-    
-    def is_available(self) -> bool:
-        """Check if Ollama is running"""
-        try:
-            response = requests.get(f"{self.host}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
-    
-    def get_available_models(self) -> list:
-        """Get list of available models"""
-        try:
-            response = requests.get(f"{self.host}/api/tags")
-            if response.status_code == 200:
-                return [model['name'] for model in response.json().get('models', [])]
-        except:
-            pass
-        return []
-    
-    def generate(self, prompt: str, model: str = None, max_tokens: int = 2000) -> str:
-        """Generate response using Ollama"""
-        if not model:
-            model = self.models['code']
-        
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": 0.1,
-                "top_p": 0.9
-            }
-        }
-        
-        try:
-            response = requests.post(
-                f"{self.host}/api/generate", 
-                json=payload,
-                timeout=120  # Increased timeout for analysis
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('response', 'No response generated')
-            else:
-                return f"Error: {response.status_code} - {response.text}"
-        except Exception as e:
-            return f"LLM Error: {str(e)}"
+from ..models import FileBlob
+from . import metrics
+from .cache_service import AnalysisCache
+from .chunking_service import split_into_chunks
+from .http_client import get_async_client
+from .dependency_service import extract_imports, language_of
+from .search_index import text_search_engine
+from .symbol_index import SymbolIndex
+from .text_search import SearchQueryError, render_results
+from .token_budget import TokenCounter, TokenUsage, fit_text, reduce_texts, usable
 
-class FileAnalyzer:
-    def __init__(self):
-        self.llm = OllamaLLMService()
-    
-    def create_analysis_prompt(self, file_content: str, file_path: str) -> str:
-        """Create comprehensive analysis prompt"""
-        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
-        file_name = file_path.split('/')[-1]
-        
-        prompt = f"""As an expert code analyst, provide a comprehensive analysis of this {file_ext} file.
+# Bump whenever create_analysis_prompt changes so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = 'analysis-v2'
+ANALYSIS_MODELS = ['code', 'general', 'fallback']
+ANALYSIS_MAX_TOKENS = 3000
+# Files whose prompt would not fit the model's context window are analyzed chunk by chunk and the notes merged
+ANALYSIS_CHUNK_PROMPT_VERSION = 'analysis-chunk-v1'
+ANALYSIS_CHUNKED_PROMPT_VERSION = 'analysis-chunked-v2'
+ANALYSIS_CHUNK_TOKENS = 400
+SEARCH_MODELS = ['general', 'code']
+SEARCH_MAX_TOKENS = 2000
+SEARCH_FILE_HEAD_TOKENS = 300  # Most of one file's head a search prompt without snippets carries
 
-FILE INFORMATION:
-- Path: {file_path}
-- Name: {file_name}
-- Type: {file_ext}
-- Size: {len(file_content)} characters
-
-FILE CONTENT:
-{file_content[:4000]}
+STRUCTURE_TITLES = {'python': 'Python', 'javascript': 'JavaScript/TypeScript', 'go': 'Go', 'java': 'Java'}
+STRUCTURE_LISTED = 10  # Entries listed per section of a fallback structure analysis
 
-ANALYSIS REQUIREMENTS:
+ANALYSIS_REQUIREMENTS = """ANALYSIS REQUIREMENTS:
 Provide a detailed analysis covering:
 
 1. **PRIMARY PURPOSE & FUNCTIONALITY**
@@ -135,48 +91,859 @@ Provide a detailed analysis covering:
 Be technical, detailed, and specific. Use code examples where helpful.
 Format your response clearly with proper headings and sections.
 """
+
+class LLMStreamError(Exception):
+    """Raised when a streaming generation fails"""
+
+class LLMStreamInterrupted(LLMStreamError):
+    """Raised when a stream fails after part of the answer was yielded; that part must not be kept"""
+
+class AnalysisResult(NamedTuple):
+    """An LLM analysis plus the per-chunk notes produced on the way, for the caller to cache"""
+    model: str
+    analysis: str
+    complete: bool = True  # False when some chunks were only outlined; such results are not cached
+    chunk_results: Tuple[Tuple[str, str], ...] = ()  # (chunk cache key, notes)
+
+class CircuitBreaker:
+    """Stops calls to a failing host until a background probe sees it recover"""
+    
+    def __init__(self, probe: Callable[[], bool], failure_threshold: int = 3, reprobe_interval: float = 10.0):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reprobe_interval = reprobe_interval
+        self.failures = 0
+        self.is_open = False
+        self._lock = threading.Lock()
+        self._reprobe_thread = None
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.is_open = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures < self.failure_threshold or self.is_open:
+                return
+            self.is_open = True
+            # A single daemon thread re-probes while the breaker is open; requests never wait on it
+            if self._reprobe_thread is None or not self._reprobe_thread.is_alive():
+                self._reprobe_thread = threading.Thread(target=self._reprobe, name='ollama-reprobe', daemon=True)
+                self._reprobe_thread.start()
+    
+    def _reprobe(self):
+        while self.is_open:
+            time.sleep(self.reprobe_interval)
+            if self.probe():
+                self.record_success()
+
+class OllamaLLMService:
+    def __init__(self, host: Optional[str] = None):
+        self.host = (host or getattr(settings, 'OLLAMA_HOST', 'http://localhost:11434')).rstrip('/')
+        self.models = {
+            'code': 'codellama:7b',
+            'general': 'llama3:8b', 
+            'fallback': 'deepseek-coder:6.7b'
+        }
+        self.options = {
+            "temperature": 0.1,
+            "top_p": 0.9
+        }
+        
+        # Keep-alive connections shared by every request thread in this process
+        pool_size = getattr(settings, 'OLLAMA_POOL_SIZE', 10)
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        if metrics.enabled():
+            self.session.hooks['response'].append(metrics.response_hook('ollama'))
+        
+        # /api/tags answers both "is it up" and "which models", so one cached probe serves both
+        self.health_ttl = getattr(settings, 'OLLAMA_HEALTH_TTL', 30)
+        self._models: list = []
+        self._checked_at: Optional[float] = None
+        self._tags_lock = threading.Lock()
+        self._probe_lock = threading.Lock()  # Held by the one request re-probing an expired answer
+        self.breaker = CircuitBreaker(
+            self._probe,
+            failure_threshold=getattr(settings, 'OLLAMA_BREAKER_THRESHOLD', 3),
+            reprobe_interval=getattr(settings, 'OLLAMA_REPROBE_INTERVAL', 10)
+        )
+        
+        # model -> (context length from /api/show or None if the lookup failed, when it was looked up)
+        self._context_lengths: Dict[str, Tuple[Optional[int], float]] = {}
+        self.tokens = TokenCounter()
+        self.usage = TokenUsage()
+    
+    def generation_options(self, max_tokens: int) -> Dict[str, Any]:
+        """Ollama sampling options for a request"""
+        return {"num_predict": max_tokens, **self.options}
+    
+    def context_window(self, model: str) -> int:
+        """Context tokens to request for a model: its trained length, capped by OLLAMA_NUM_CTX"""
+        if self.context_lookup_due(model):
+            self.remember_context_length(model, self._fetch_context_length(model))
+        
+        cap = getattr(settings, 'OLLAMA_NUM_CTX', 8192)
+        length = self._context_lengths.get(model, (None, 0))[0]
+        return min(cap, length or cap)
+    
+    def known_context_windows(self) -> Dict[str, int]:
+        """Context window per model whose trained length has been looked up"""
+        cap = getattr(settings, 'OLLAMA_NUM_CTX', 8192)
+        return {model: min(cap, length) for model, (length, _) in self._context_lengths.items() if length}
+    
+    def context_lookup_due(self, model: str) -> bool:
+        """Whether to ask /api/show; lengths are kept for good, failed lookups retried after OLLAMA_HEALTH_TTL"""
+        if self.breaker.is_open:
+            return False
+        known = self._context_lengths.get(model)
+        return known is None or (known[0] is None and time.monotonic() - known[1] >= self.health_ttl)
+    
+    def remember_context_length(self, model: str, length: Optional[int]):
+        self._context_lengths[model] = (length, time.monotonic())
+    
+    def _fetch_context_length(self, model: str) -> Optional[int]:
+        try:
+            response = self.session.post(f"{self.host}/api/show", json={"model": model}, timeout=5)
+            if response.status_code != 200:
+                return None
+            return self.context_length_from(response.json())
+        except (requests.RequestException, ValueError):
+            return None
+    
+    @staticmethod
+    def context_length_from(data: Dict) -> Optional[int]:
+        """The trained context length in an /api/show response (model_info['<architecture>.context_length'])"""
+        for key, value in (data.get('model_info') or {}).items():
+            if key.endswith('.context_length') and isinstance(value, int):
+                return value
+        return None
+    
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Estimated tokens of text, calibrated for the model when it has answered before"""
+        return self.tokens.count(text, model)
+    
+    def prompt_budget(self, model: str, max_tokens: int) -> int:
+        """Tokens a prompt may take so that max_tokens of answer (at most half the window) still fit"""
+        window = self.context_window(model)
+        return usable(window - min(max_tokens, window // 2))
+    
+    def record_usage(self, model: str, prompt: str, data: Dict, usage: Optional[TokenUsage] = None):
+        """Count the tokens Ollama reports for a finished generation and calibrate estimates on them"""
+        prompt_tokens, completion_tokens = data.get('prompt_eval_count'), data.get('eval_count')
+        self.usage.record(prompt_tokens, completion_tokens)
+        if usage is not None:
+            usage.record(prompt_tokens, completion_tokens)
+        self.tokens.calibrate(model, prompt, prompt_tokens)
+        if metrics.enabled():
+            metrics.record_generation(model, data)
+    
+    def _probe(self) -> bool:
+        """Fetch /api/tags and refresh the cached model list; returns whether Ollama answered"""
+        try:
+            response = self.session.get(f"{self.host}/api/tags", timeout=5)
+            if response.status_code != 200:
+                return False
+            models = [model['name'] for model in response.json().get('models', [])]
+        except (requests.RequestException, ValueError):
+            return False
+        
+        self.remember_models(models)
+        return True
+    
+    def remember_models(self, models: list):
+        """Cache the model list of a successful /api/tags probe (made by this or the async client)"""
+        with self._tags_lock:
+            self._models = models
+            self._checked_at = time.monotonic()
+    
+    def probe_due(self) -> bool:
+        """Whether the cached /api/tags answer has expired; never while the breaker is open"""
+        if self.breaker.is_open:
+            return False
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.health_ttl
+    
+    def _refresh_if_stale(self):
+        if not self.probe_due():
+            return
+        
+        # One thread probes when the TTL expires and the others keep the last answer meanwhile;
+        # only before the first answer is there nothing to keep, so then they wait for it
+        if not self._probe_lock.acquire(blocking=self._checked_at is None):
+            return
+        try:
+            if not self.probe_due():
+                return
+            if self._probe():
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        finally:
+            self._probe_lock.release()
+    
+    def last_known_available(self) -> bool:
+        """Availability as of the last probe, without probing"""
+        return not self.breaker.is_open and self._checked_at is not None
+    
+    def last_known_models(self) -> list:
+        return [] if self.breaker.is_open else list(self._models)
+    
+    def is_available(self) -> bool:
+        """Check if Ollama is running"""
+        self._refresh_if_stale()
+        return self.last_known_available()
+    
+    def get_available_models(self) -> list:
+        """Get list of available models"""
+        self._refresh_if_stale()
+        return self.last_known_models()
+    
+    def has_model(self, model: str) -> bool:
+        """Whether a model is installed, accepting names with or without the :latest tag"""
+        available_models = self.get_available_models()
+        return model in available_models or f"{model}:latest" in available_models
+    
+    def _payload(self, prompt: str, model: str, max_tokens: int, stream: bool) -> Dict[str, Any]:
+        """Build the /api/generate request body"""
+        model = model or self.models['code']
+        window = self.context_window(model)
+        # An explicit num_ctx, because Ollama's default window silently drops the start of
+        # longer prompts; the answer gets whatever the prompt leaves of it
+        options = self.generation_options(max(1, min(max_tokens, window - self.count_tokens(prompt, model))))
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {**options, "num_ctx": window}
+        }
+    
+    def generate(self, prompt: str, model: str = None, max_tokens: int = 2000,
+                 usage: Optional[TokenUsage] = None) -> str:
+        """Generate response using Ollama
+
+        usage, when given, also counts this generation's tokens (self.usage always does).
+        """
+        payload = self._payload(prompt, model, max_tokens, stream=False)
+        
+        try:
+            response = self.session.post(
+                f"{self.host}/api/generate", 
+                json=payload,
+                timeout=120  # Increased timeout for analysis
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                self.record_usage(payload['model'], prompt, data, usage)
+                self.breaker.record_success()
+                return data.get('response', 'No response generated')
+            else:
+                return f"Error: {response.status_code} - {response.text}"
+        except requests.ConnectionError as e:
+            # Only a host that cannot be reached (ConnectTimeout included) counts against the breaker;
+            # a read timeout is one slow generation, not Ollama being down
+            self.breaker.record_failure()
+            return f"LLM Error: {str(e)}"
+        except Exception as e:
+            return f"LLM Error: {str(e)}"
+    
+    def generate_stream(self, prompt: str, model: str = None, max_tokens: int = 2000,
+                        usage: Optional[TokenUsage] = None) -> Iterator[str]:
+        """Yield response fragments as Ollama produces them
+
+        Raises LLMStreamError if the request fails before or during streaming.
+        """
+        payload = self._payload(prompt, model, max_tokens, stream=True)
+        
+        try:
+            # The read timeout applies between NDJSON lines, not to the whole generation
+            with self.session.post(f"{self.host}/api/generate", json=payload, stream=True, timeout=(5, 120)) as response:
+                if response.status_code != 200:
+                    raise LLMStreamError(f"Error: {response.status_code} - {response.text}")
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise LLMStreamError(f"Error: {chunk['error']}")
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        self.record_usage(payload['model'], prompt, chunk, usage)
+                        self.breaker.record_success()
+                        return
+                # A dropped connection can end the body cleanly; without done the answer is truncated
+                raise LLMStreamError("LLM Error: stream ended before completion")
+        except requests.ConnectionError as e:
+            self.breaker.record_failure()
+            raise LLMStreamError(f"LLM Error: {str(e)}") from e
+        except (requests.RequestException, ValueError) as e:
+            raise LLMStreamError(f"LLM Error: {str(e)}") from e
+
+    def embed(self, texts: List[str], model: str) -> Optional[List[List[float]]]:
+        """Embedding vectors for texts from /api/embed, or None if the request failed"""
+        try:
+            response = self.session.post(
+                f"{self.host}/api/embed", json={"model": model, "input": texts}, timeout=120
+            )
+            if response.status_code != 200:
+                return None
+            embeddings = response.json().get('embeddings')
+        except requests.ConnectionError:
+            self.breaker.record_failure()
+            return None
+        except (requests.RequestException, ValueError):
+            return None
+        
+        if not embeddings or len(embeddings) != len(texts):
+            return None
+        return embeddings
+
+class AsyncOllamaLLMService:
+    """Awaitable Ollama calls over a pooled httpx client, for async views
+
+    Shares the model list, health cache and circuit breaker of the process-wide
+    OllamaLLMService, so sync and async requests agree on whether Ollama is up.
+    """
+    
+    def __init__(self, service: Optional[OllamaLLMService] = None):
+        self.service = service or get_llm_service()
+        self.host = self.service.host
+        self.models = self.service.models
+        self.breaker = self.service.breaker
+    
+    async def _refresh_if_stale(self):
+        if not self.service.probe_due():
+            return
+        
+        # The same one-prober rule as OllamaLLMService._refresh_if_stale, without blocking the loop
+        if not self.service._probe_lock.acquire(blocking=False):
+            if self.service._checked_at is None:
+                await sync_to_async(self.service._refresh_if_stale, thread_sensitive=False)()
+            return
+        try:
+            if not self.service.probe_due():
+                return
+            response = await get_async_client().get(f"{self.host}/api/tags", timeout=5)
+            if response.status_code != 200:
+                raise ValueError(response.status_code)
+            models = [model['name'] for model in response.json().get('models', [])]
+        except (httpx.HTTPError, ValueError):
+            self.breaker.record_failure()
+            return
+        finally:
+            self.service._probe_lock.release()
+        
+        self.service.remember_models(models)
+        self.breaker.record_success()
+    
+    async def is_available(self) -> bool:
+        await self._refresh_if_stale()
+        return self.service.last_known_available()
+    
+    async def get_available_models(self) -> list:
+        await self._refresh_if_stale()
+        return self.service.last_known_models()
+    
+    async def context_window(self, model: str) -> int:
+        """OllamaLLMService.context_window with the /api/show lookup awaited"""
+        if self.service.context_lookup_due(model):
+            try:
+                response = await get_async_client().post(f"{self.host}/api/show", json={"model": model}, timeout=5)
+                length = self.service.context_length_from(response.json()) if response.status_code == 200 else None
+            except (httpx.HTTPError, ValueError):
+                length = None
+            self.service.remember_context_length(model, length)
+        return self.service.context_window(model)
+    
+    async def generate(self, prompt: str, model: str = None, max_tokens: int = 2000,
+                       usage: Optional[TokenUsage] = None) -> str:
+        """Same contract as OllamaLLMService.generate; the event loop is free while Ollama works"""
+        # Looked up here so that building the payload finds the window known and does not block
+        await self.context_window(model or self.models['code'])
+        payload = self.service._payload(prompt, model, max_tokens, stream=False)
+        
+        try:
+            response = await get_async_client().post(f"{self.host}/api/generate", json=payload, timeout=120)
+            if response.status_code == 200:
+                data = response.json()
+                self.service.record_usage(payload['model'], prompt, data, usage)
+                self.breaker.record_success()
+                return data.get('response', 'No response generated')
+            return f"Error: {response.status_code} - {response.text}"
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self.breaker.record_failure()
+            return f"LLM Error: {str(e)}"
+        except (httpx.HTTPError, ValueError) as e:
+            return f"LLM Error: {str(e)}"
+    
+    async def embed(self, texts: List[str], model: str) -> Optional[List[List[float]]]:
+        try:
+            response = await get_async_client().post(
+                f"{self.host}/api/embed", json={"model": model, "input": texts}, timeout=120
+            )
+            if response.status_code != 200:
+                return None
+            embeddings = response.json().get('embeddings')
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            self.breaker.record_failure()
+            return None
+        except (httpx.HTTPError, ValueError):
+            return None
+        
+        if not embeddings or len(embeddings) != len(texts):
+            return None
+        return embeddings
+
+_services: Dict[str, OllamaLLMService] = {}
+_services_lock = threading.Lock()
+
+def get_llm_service(host: Optional[str] = None) -> OllamaLLMService:
+    """Process-wide OllamaLLMService per host, so health state and connections are shared"""
+    host = (host or getattr(settings, 'OLLAMA_HOST', 'http://localhost:11434')).rstrip('/')
+    with _services_lock:
+        if host not in _services:
+            _services[host] = OllamaLLMService(host)
+        return _services[host]
+
+class FileAnalyzer:
+    def __init__(self, llm: Optional[OllamaLLMService] = None, chunk_concurrency: Optional[int] = None):
+        self.llm = llm or get_llm_service()
+        self.chunk_concurrency = max(1, chunk_concurrency or getattr(settings, 'OLLAMA_PARALLEL', 2))
+        self.usage = TokenUsage()  # Tokens spent by this analyzer's generations
+        self._symbols: Dict[Tuple[str, str], List[Dict]] = {}
+    
+    def is_chunked(self, file_content: str, file_path: str) -> bool:
+        """Whether a file is too long for one analysis prompt in the analysis model's context window"""
+        model_name = self.planning_model(ANALYSIS_MODELS)
+        return self.llm.count_tokens(file_content, model_name) > self.analysis_content_budget(file_path, model_name)
+    
+    def planning_model(self, model_keys) -> str:
+        """Model to size prompts for: the first of model_keys last seen installed, else the first of them"""
+        available_models = self.llm.last_known_models()
+        for model_key in model_keys:
+            if self.llm.models[model_key] in available_models:
+                return self.llm.models[model_key]
+        return self.llm.models[model_keys[0]]
+    
+    def analysis_content_budget(self, file_path: str, model_name: str) -> int:
+        """Tokens of file content an analysis prompt can carry"""
+        overhead = self.llm.count_tokens(self._analysis_prompt('', file_path, 0), model_name)
+        return self.llm.prompt_budget(model_name, ANALYSIS_MAX_TOKENS) - overhead
+    
+    def create_analysis_prompt(self, file_content: str, file_path: str, model_name: Optional[str] = None) -> str:
+        """Create comprehensive analysis prompt"""
+        model_name = model_name or self.planning_model(ANALYSIS_MODELS)
+        budget = self.analysis_content_budget(file_path, model_name)
+        content = fit_text(file_content, budget, lambda text: self.llm.count_tokens(text, model_name))
+        return self._analysis_prompt(content, file_path, len(file_content))
+    
+    @staticmethod
+    def _analysis_prompt(file_content: str, file_path: str, file_size: int) -> str:
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
+        file_name = file_path.split('/')[-1]
+        
+        prompt = f"""As an expert code analyst, provide a comprehensive analysis of this {file_ext} file.
+
+FILE INFORMATION:
+- Path: {file_path}
+- Name: {file_name}
+- Type: {file_ext}
+- Size: {file_size} characters
+
+FILE CONTENT:
+{file_content}
+
+{ANALYSIS_REQUIREMENTS}"""
         return prompt
     
+    def analysis_cache_keys(self, file_content: str, file_path: str) -> Dict[str, str]:
+        """Cache keys for an analysis, per model name, in model priority order
+
+        Keys depend only on the content, extension, model and prompt versions, never on Ollama's
+        state: whether a file is chunked follows the live context window, so it is decided after
+        the lookup and both prompt versions are part of every key.
+        """
+        # The prompt only depends on the path through its extension, so forks and copies share entries
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
+        options = self.llm.generation_options(ANALYSIS_MAX_TOKENS)
+        version = f'{ANALYSIS_PROMPT_VERSION}+{ANALYSIS_CHUNKED_PROMPT_VERSION}'
+        keys = {}
+        for model_key in ANALYSIS_MODELS:
+            model_name = self.llm.models[model_key]
+            keys[model_name] = AnalysisCache.make_key(f'{file_ext}\0{file_content}', model_name, version, options)
+        return keys
+    
+    def chunk_cache_key(self, chunk_text: str, file_ext: str, model_name: str) -> str:
+        # Line numbers stay out of the key so a chunk keeps its notes when code above it moves
+        options = self.llm.generation_options(ANALYSIS_CHUNK_TOKENS)
+        return AnalysisCache.make_key(f'{file_ext}\0{chunk_text}', model_name, ANALYSIS_CHUNK_PROMPT_VERSION, options)
+    
+    def analysis_model(self) -> Optional[str]:
+        """First installed model in analysis priority order"""
+        available_models = self.llm.get_available_models()
+        for model_key in ANALYSIS_MODELS:
+            if self.llm.models[model_key] in available_models:
+                return self.llm.models[model_key]
+        return None
+    
+    def symbols(self, file_content: str, file_path: str) -> List[Dict]:
+        """Definitions in a file, read from the symbol table built at ingestion"""
+        key = (file_path, FileBlob.hash_text(file_content))
+        if key not in self._symbols:
+            self._symbols[key] = SymbolIndex.for_content(file_path, file_content)
+        return self._symbols[key]
+    
+    def forget_symbols(self, file_content: str, file_path: str):
+        """Drop a file's definitions from symbols()'s cache once its analysis is done"""
+        self._symbols.pop((file_path, FileBlob.hash_text(file_content)), None)
+    
+    def chunks(self, file_content: str, file_path: str) -> List[Dict]:
+        return split_into_chunks(
+            file_path, file_content, getattr(settings, 'ANALYSIS_CHUNK_CHARS', 3500),
+            self.symbols(file_content, file_path)
+        )
+    
+    def cached_chunks(self, file_content: str, file_path: str) -> Dict[str, str]:
+        """Chunk notes already in the cache for a large file, to hand to generate_analysis"""
+        if not self.is_chunked(file_content, file_path):
+            return {}
+        model_name = self.analysis_model()
+        if model_name is None:
+            return {}
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
+        return AnalysisCache.get_many([
+            self.chunk_cache_key(chunk['text'], file_ext, model_name) for chunk in self.chunks(file_content, file_path)
+        ])
+    
+    def store_result(self, cache_keys: Dict[str, str], result: AnalysisResult):
+        """Cache new chunk notes and, when it covers the whole file, the analysis itself"""
+        for key, notes in result.chunk_results:
+            AnalysisCache.put(key, result.model, notes)
+        if result.complete:
+            AnalysisCache.put(cache_keys[result.model], result.model, result.analysis)
+    
     def analyze_file(self, file_content: str, file_path: str) -> str:
         """Perform comprehensive file analysis"""
+        cache_keys = self.analysis_cache_keys(file_content, file_path)
+        cached = AnalysisCache.get(*cache_keys.values())
+        if cached is not None:
+            return cached
+        
+        result = self.generate_analysis(file_content, file_path, self.cached_chunks(file_content, file_path))
+        if result:
+            self.store_result(cache_keys, result)
+            return result.analysis
+        
+        # If no models work, use fallback
+        return self._fallback_analysis(file_content, file_path)
+    
+    def generate_analysis(self, file_content: str, file_path: str,
+                          cached_chunks: Optional[Dict[str, str]] = None) -> Optional[AnalysisResult]:
+        """Run the LLM analysis without touching the cache; returns None if no model produced one
+
+        cached_chunks maps chunk cache keys to notes already known (see cached_chunks).
+        """
         if not self.llm.is_available():
-            return self._fallback_analysis(file_content, file_path)
+            return None
         
-        prompt = self.create_analysis_prompt(file_content, file_path)
+        if self.is_chunked(file_content, file_path):
+            return self._generate_chunked_analysis(file_content, file_path, cached_chunks or {})
         
         # Try code-specific model first
         available_models = self.llm.get_available_models()
         
-        for model_key in ['code', 'general', 'fallback']:
+        for model_key in ANALYSIS_MODELS:
             model_name = self.llm.models[model_key]
             if model_name in available_models:
-                analysis = self.llm.generate(prompt, model_name, max_tokens=3000)
+                prompt = self.create_analysis_prompt(file_content, file_path, model_name)
+                analysis = self.llm.generate(prompt, model_name, max_tokens=ANALYSIS_MAX_TOKENS, usage=self.usage)
                 
                 if "Error:" not in analysis and len(analysis) > 100:
-                    return analysis
+                    return AnalysisResult(model_name, analysis)
         
-        # If no models work, use fallback
-        return self._fallback_analysis(file_content, file_path)
+        return None
+    
+    def _generate_chunked_analysis(self, file_content: str, file_path: str,
+                                   cached_chunks: Dict[str, str]) -> Optional[AnalysisResult]:
+        """Map: notes per chunk, concurrently. Reduce: merge the notes into the file report"""
+        model_name = self.analysis_model()
+        if model_name is None:
+            return None
+        
+        notes, chunk_results, complete = self._map_chunks(file_content, file_path, model_name, cached_chunks)
+        if not any(note['summary'] for note in notes):
+            return None
+        
+        prompt = self._reduce_to_prompt(notes, file_content, file_path, model_name)
+        analysis = self.llm.generate(prompt, model_name, max_tokens=ANALYSIS_MAX_TOKENS, usage=self.usage)
+        if "Error:" in analysis or len(analysis) <= 100:
+            # The section notes are still the best analysis there is; keep the chunk notes, not this
+            analysis = f"# Section notes: {file_path}\n\n" + "\n\n".join(self._format_note(note) for note in notes)
+            complete = False
+        return AnalysisResult(model_name, analysis, complete, tuple(chunk_results.items()))
+    
+    def _map_chunks(self, file_content: str, file_path: str, model_name: str,
+                    cached_chunks: Dict[str, str]) -> Tuple[List[Dict], Dict[str, str], bool]:
+        """Notes for every chunk, from the cache or the LLM, within ANALYSIS_CHUNK_BUDGET seconds
+
+        Returns (notes in file order, newly generated {chunk key: notes}, whether every chunk has notes).
+        Chunks still running when the budget runs out are described by their definitions only.
+        """
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
+        chunks = self.chunks(file_content, file_path)
+        keys = [self.chunk_cache_key(chunk['text'], file_ext, model_name) for chunk in chunks]
+        notes = [dict(chunk, summary=cached_chunks.get(key)) for chunk, key in zip(chunks, keys)]
+        generated = {}
+        
+        executor = ThreadPoolExecutor(max_workers=self.chunk_concurrency)
+        futures = {
+            executor.submit(
+                self.llm.generate, self.create_chunk_prompt(note, file_ext, model_name), model_name,
+                ANALYSIS_CHUNK_TOKENS, usage=self.usage
+            ): index
+            for index, note in enumerate(notes) if note['summary'] is None
+        }
+        try:
+            for future in as_completed(futures, timeout=getattr(settings, 'ANALYSIS_CHUNK_BUDGET', 90)):
+                index = futures[future]
+                summary = future.result()
+                if "Error:" not in summary and summary.strip():
+                    notes[index]['summary'] = summary
+                    generated[keys[index]] = summary
+        except FuturesTimeoutError:
+            pass
+        finally:
+            # Queued chunks are dropped; requests already sent finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return notes, generated, all(note['summary'] for note in notes)
+    
+    def _reduce_to_prompt(self, notes: List[Dict], file_content: str, file_path: str, model_name: str) -> str:
+        """Merge neighbouring notes until they fit one prompt, then build the file report prompt"""
+        sections = [self._format_note(note) for note in notes]
+        count = lambda text: self.llm.count_tokens(text, model_name)
+        # What the report prompt leaves for the notes, less a little for the file information lines
+        budget = self.llm.prompt_budget(model_name, ANALYSIS_MAX_TOKENS) - count(ANALYSIS_REQUIREMENTS) - 150
+        sections = reduce_texts(
+            sections, budget, count, lambda joined: self._merge_sections(joined, file_path, model_name),
+            self.chunk_concurrency
+        )
+        
+        file_ext = file_path.split('.')[-1].lower() if '.' in file_path else 'unknown'
+        notes_text = "\n\n".join(sections)
+        summarized = sum(1 for note in notes if note['summary'])
+        coverage = f"{summarized} of {len(notes)} sections summarized"
+        if summarized < len(notes):
+            coverage += "; the others are outlined by their definitions only"
+        
+        return f"""As an expert code analyst, provide a comprehensive analysis of this {file_ext} file.
+The file was too long to read at once, so it is described by notes on each of its sections.
+
+FILE INFORMATION:
+- Path: {file_path}
+- Name: {file_path.split('/')[-1]}
+- Type: {file_ext}
+- Size: {len(file_content)} characters, {len(file_content.splitlines())} lines
+- Coverage: {coverage}
+
+SECTION NOTES (in file order):
+{notes_text}
+
+{ANALYSIS_REQUIREMENTS}"""
+    
+    def _merge_sections(self, joined: str, file_path: str, model_name: str) -> Optional[str]:
+        """One intermediate reduce step over consecutive section notes; None if the LLM failed"""
+        prompt = f"""Merge these notes on consecutive sections of {file_path} into one set of concise notes.
+Keep every class, function, dependency and concern they mention, with its line range; drop repetition.
+
+{joined}
+"""
+        merged = self.llm.generate(prompt, model_name, max_tokens=ANALYSIS_CHUNK_TOKENS, usage=self.usage)
+        if "Error:" in merged or not merged.strip():
+            return None
+        return merged
+    
+    @staticmethod
+    def _format_note(note: Dict) -> str:
+        header = f"### Lines {note['start_line']}-{note['end_line']}: {note['name']}"
+        if note['summary']:
+            return f"{header}\n{note['summary'].strip()}"
+        definitions = "\n".join(f"- {definition}" for definition in note['definitions']) or "- (no definitions)"
+        return f"{header}\n(Not summarized) Definitions:\n{definitions}"
+    
+    def create_chunk_prompt(self, chunk: Dict, file_ext: str, model_name: Optional[str] = None) -> str:
+        """Prompt for the notes on one section of a large file"""
+        model_name = model_name or self.planning_model(ANALYSIS_MODELS)
+        # Chunks are cut by characters; a small window can still be too short for one
+        section = fit_text(
+            chunk['text'], self.llm.prompt_budget(model_name, ANALYSIS_CHUNK_TOKENS) - 120,
+            lambda text: self.llm.count_tokens(text, model_name)
+        )
+        return f"""You are reading one section of a larger {file_ext} file ({chunk['name']}).
+
+SECTION:
+{section}
+
+Write concise notes on this section for a later file-level report:
+- Purpose of each class and function, and how they work together
+- Imports, external services, data structures and notable algorithms
+- Error handling, configuration, security or performance concerns
+Use short bullet points and do not repeat the code.
+"""
+    
+    def analyze_file_stream(self, file_content: str, file_path: str) -> Iterator[str]:
+        """Streaming variant of analyze_file; yields the analysis text as it is generated"""
+        cache_keys = self.analysis_cache_keys(file_content, file_path)
+        cached = AnalysisCache.get(*cache_keys.values())
+        if cached is not None:
+            yield cached
+            return
+        
+        if self.llm.is_available() and self.is_chunked(file_content, file_path):
+            model_name = self.analysis_model()
+            if model_name is not None:
+                # Chunk notes are generated up front; only the final report is streamed
+                notes, chunk_results, complete = self._map_chunks(
+                    file_content, file_path, model_name, self.cached_chunks(file_content, file_path)
+                )
+                for key, chunk_notes in chunk_results.items():
+                    AnalysisCache.put(key, model_name, chunk_notes)
+                if any(note['summary'] for note in notes):
+                    prompt = self._reduce_to_prompt(notes, file_content, file_path, model_name)
+                    model_key = next(key for key in ANALYSIS_MODELS if self.llm.models[key] == model_name)
+                    
+                    def cache_report(name, text):
+                        # A report built partly from outlines would hide the missing notes on the next request
+                        if complete:
+                            AnalysisCache.put(cache_keys[name], name, text)
+                    
+                    streamed = yield from self._stream_first_model(
+                        prompt, [model_key], max_tokens=ANALYSIS_MAX_TOKENS, on_complete=cache_report
+                    )
+                    if streamed:
+                        return
+        elif self.llm.is_available():
+            prompt = self.create_analysis_prompt(file_content, file_path, self.analysis_model())
+            streamed = yield from self._stream_first_model(
+                prompt, ANALYSIS_MODELS, max_tokens=ANALYSIS_MAX_TOKENS,
+                on_complete=lambda model_name, text: AnalysisCache.put(cache_keys[model_name], model_name, text)
+            )
+            if streamed:
+                return
+        
+        yield self._fallback_analysis(file_content, file_path)
     
-    def search_code(self, files_content: Dict[str, str], search_query: str) -> str:
-        """Search code with AI understanding"""
+    def _stream_first_model(self, prompt: str, model_keys, max_tokens: int,
+                            on_complete: Optional[Callable[[str, str], None]] = None) -> Iterator[str]:
+        """Stream from the first installed model that produces output; returns whether one did
+
+        on_complete(model_name, text) is called when a model finishes without error.
+        Raises LLMStreamInterrupted if a model fails after some of its output was yielded.
+        """
+        available_models = self.llm.get_available_models()
+        
+        for model_key in model_keys:
+            model_name = self.llm.models[model_key]
+            if model_name not in available_models:
+                continue
+            
+            fragments = []
+            try:
+                for fragment in self.llm.generate_stream(prompt, model_name, max_tokens=max_tokens, usage=self.usage):
+                    fragments.append(fragment)
+                    yield fragment
+            except LLMStreamError as e:
+                # Once text has reached the client we cannot switch models mid-answer
+                if fragments:
+                    raise LLMStreamInterrupted(str(e)) from e
+                continue
+            
+            if fragments:
+                if on_complete:
+                    on_complete(model_name, ''.join(fragments))
+                return True
+        
+        return False
+    
+    def search_code(self, files_content: Dict[str, str], search_query: str,
+                    candidate_lines: Optional[Dict[str, Iterable[int]]] = None,
+                    snippets: Optional[List[Dict]] = None, matches: Optional[Dict] = None) -> str:
+        """Search code with AI understanding
+
+        candidate_lines optionally restricts the text fallback to the files it names.
+        snippets, when given, are the retrieved chunks the LLM sees instead of file heads.
+        matches are precomputed TextSearchEngine results for the text fallback.
+        """
         if not self.llm.is_available():
-            return self._fallback_search(files_content, search_query)
+            return self._fallback_search(files_content, search_query, candidate_lines, matches)
         
-        # Limit content for search
-        limited_content = {}
-        for path, content in files_content.items():
-            limited_content[path] = content[:1000]  # First 1000 chars per file
+        available_models = self.llm.get_available_models()
+        prompt = self.create_search_prompt(files_content, search_query, snippets, self.planning_model(SEARCH_MODELS))
         
-        content_summary = "\n\n".join([
-            f"=== {path} ===\n{content}" 
-            for path, content in limited_content.items()
-        ])
+        for model_key in SEARCH_MODELS:
+            model_name = self.llm.models[model_key]
+            if model_name in available_models:
+                result = self.llm.generate(prompt, model_name, max_tokens=SEARCH_MAX_TOKENS, usage=self.usage)
+                if "Error:" not in result and len(result) > 50:
+                    return result
+        
+        return self._fallback_search(files_content, search_query, candidate_lines, matches)
+    
+    def search_code_stream(self, files_content: Dict[str, str], search_query: str,
+                           candidate_lines: Optional[Dict[str, Iterable[int]]] = None,
+                           snippets: Optional[List[Dict]] = None,
+                           matches: Optional[Dict] = None) -> Iterator[str]:
+        """Streaming variant of search_code"""
+        if self.llm.is_available():
+            prompt = self.create_search_prompt(files_content, search_query, snippets, self.planning_model(SEARCH_MODELS))
+            if (yield from self._stream_first_model(prompt, SEARCH_MODELS, max_tokens=SEARCH_MAX_TOKENS)):
+                return
         
+        yield self._fallback_search(files_content, search_query, candidate_lines, matches)
+    
+    def create_search_prompt(self, files_content: Dict[str, str], search_query: str,
+                             snippets: Optional[List[Dict]] = None, model_name: Optional[str] = None) -> str:
+        """Create the codebase search prompt, filling the model's context window with code"""
+        model_name = model_name or self.planning_model(SEARCH_MODELS)
+        count = lambda text: self.llm.count_tokens(text, model_name)
+        budget = self.llm.prompt_budget(model_name, SEARCH_MAX_TOKENS) - count(self._search_prompt(search_query, ''))
+        
+        sections = []
+        if snippets:
+            # Most relevant chunks first, with line numbers the answer can cite; one that
+            # does not fit is skipped so that smaller, less relevant ones still can
+            for snippet in snippets:
+                section = f"=== {snippet['file_path']} (lines {snippet['start_line']}-{snippet['end_line']}) ===\n" + "\n".join(
+                    f"{snippet['start_line'] + i:4d}: {line}" for i, line in enumerate(snippet['text'].splitlines())
+                )
+                tokens = count(section) + 1
+                if tokens <= budget:
+                    sections.append(section)
+                    budget -= tokens
+        else:
+            # The head of each file, in the order given, until the budget is spent
+            for path, content in files_content.items():
+                header = f"=== {path} ==="
+                head_budget = min(SEARCH_FILE_HEAD_TOKENS, budget) - count(header) - 1
+                if head_budget < SEARCH_FILE_HEAD_TOKENS // 4:
+                    break
+                section = f"{header}\n{fit_text(content, head_budget, count)}"
+                sections.append(section)
+                budget -= count(section) + 1
+        
+        return self._search_prompt(search_query, "\n\n".join(sections))
+    
+    @staticmethod
+    def _search_prompt(search_query: str, content_summary: str) -> str:
         prompt = f"""Search through this codebase for: "{search_query}"
 
 CODEBASE CONTENT:
-{content_summary[:5000]}
+{content_summary}
 
 SEARCH REQUIREMENTS:
 1. **EXACT MATCHES**: Find exact occurrences of "{search_query}"
@@ -201,16 +968,7 @@ FORMAT YOUR RESPONSE AS:
 ## Summary
 [Overall summary of findings and relationships]
 """
-        
-        available_models = self.llm.get_available_models()
-        for model_key in ['general', 'code']:
-            model_name = self.llm.models[model_key]
-            if model_name in available_models:
-                result = self.llm.generate(prompt, model_name, max_tokens=2000)
-                if "Error:" not in result and len(result) > 50:
-                    return result
-        
-        return self._fallback_search(files_content, search_query)
+        return prompt
     
     def _fallback_analysis(self, file_content: str, file_path: str) -> str:
         """Fallback analysis when LLM is not available"""
@@ -228,10 +986,9 @@ FORMAT YOUR RESPONSE AS:
 ## Basic Structure Analysis
 """
         
-        if file_ext == 'py':
-            analysis += self._analyze_python_structure(lines)
-        elif file_ext in ['js', 'ts', 'jsx', 'tsx']:
-            analysis += self._analyze_javascript_structure(lines)
+        language = language_of(file_path)
+        if language in STRUCTURE_TITLES:
+            analysis += self._analyze_code_structure(language, file_content, file_path)
         elif file_ext in ['html', 'htm']:
             analysis += self._analyze_html_structure(lines)
         else:
@@ -246,39 +1003,40 @@ FORMAT YOUR RESPONSE AS:
 """
         return analysis
     
-    def _analyze_python_structure(self, lines):
-        imports = [line.strip() for line in lines if line.strip().startswith(('import ', 'from '))]
-        classes = [line.strip() for line in lines if line.strip().startswith('class ')]
-        functions = [line.strip() for line in lines if line.strip().startswith('def ')]
+    def _analyze_code_structure(self, language: str, file_content: str, file_path: str) -> str:
+        """Imports and definitions from the symbol table, with line spans"""
+        specifiers = dict.fromkeys(extract_imports(file_path, file_content))
+        # "from pkg import name" yields both pkg.name and pkg; list the module once
+        imports = [specifier for specifier in specifiers if specifier.rsplit('.', 1)[0] not in specifiers]
+        symbols = self.symbols(file_content, file_path)
+        classes = [symbol for symbol in symbols if symbol['kind'] in ('class', 'type')]
+        functions = [symbol for symbol in symbols if symbol['kind'] == 'function' and '.' not in symbol['qualified_name']]
+        methods = [symbol for symbol in symbols if symbol['kind'] == 'method']
         
-        return f"""
-### Python Structure
+        def listing(entries):
+            return chr(10).join(
+                f"  - `{symbol['signature']}` (lines {symbol['start_line']}-{symbol['end_line']})"
+                for symbol in entries[:STRUCTURE_LISTED]
+            )
+        
+        structure = f"""
+### {STRUCTURE_TITLES[language]} Structure
 - **Imports**: {len(imports)} dependencies
-{chr(10).join([f'  - {imp}' for imp in imports[:10]])}
+{chr(10).join(f'  - {specifier}' for specifier in imports[:STRUCTURE_LISTED])}
 
-- **Classes**: {len(classes)} defined
-{chr(10).join([f'  - {cls}' for cls in classes[:10]])}
+- **Classes and types**: {len(classes)} defined
+{listing(classes)}
 
 - **Functions**: {len(functions)} defined
-{chr(10).join([f'  - {func}' for func in functions[:10]])}
-"""
-    
-    def _analyze_javascript_structure(self, lines):
-        functions = []
-        variables = []
-        for line in lines:
-            line = line.strip()
-            if 'function ' in line or '=>' in line:
-                functions.append(line[:100])
-            if line.startswith(('const ', 'let ', 'var ')):
-                variables.append(line[:100])
-        
-        return f"""
-### JavaScript/TypeScript Structure
-- **Functions**: {len(functions)} found
-- **Variables**: {len(variables)} declared
-- **Framework**: {"React" if any("react" in line.lower() for line in lines) else "Vanilla JS"}
+{listing(functions)}
+
+- **Methods**: {len(methods)} defined
+{listing(methods)}
 """
+        if language == 'javascript':
+            react = any(specifier == 'react' or specifier.startswith('react/') for specifier in imports)
+            structure += f"- **Framework**: {'React' if react else 'Vanilla JS'}\n"
+        return structure
     
     def _analyze_html_structure(self, lines):
         content = ' '.join(lines).lower()
@@ -296,22 +1054,77 @@ FORMAT YOUR RESPONSE AS:
 - **Lines**: {len(lines)}
 """
     
-    def _fallback_search(self, files_content: Dict[str, str], search_query: str) -> str:
-        """Basic text search fallback"""
-        results = []
+    @metrics.timed('fallback_search')
+    def _fallback_search(self, files_content: Dict[str, str], search_query: str,
+                         candidate_lines: Optional[Dict[str, Iterable[int]]] = None,
+                         matches: Optional[Dict] = None) -> str:
+        """Ranked text matches with context, used when no LLM answer is available
+
+        matches are TextSearchEngine results already computed by the caller; otherwise
+        the query is searched here, in the files of candidate_lines when given.
+        """
+        if matches is None:
+            if candidate_lines is not None:
+                files_content = {path: content for path, content in files_content.items() if path in candidate_lines}
+            try:
+                matches = text_search_engine().search(files_content, search_query)
+            except SearchQueryError:
+                return f"No matches found for '{search_query}'"
         
-        for file_path, content in files_content.items():
-            lines = content.splitlines()
-            matches = []
-            
-            for i, line in enumerate(lines):
-                if search_query.lower() in line.lower():
-                    start = max(0, i-2)
-                    end = min(len(lines), i+3)
-                    context = "\n".join([f"{j+1:4d}: {lines[j]}" for j in range(start, end)])
-                    matches.append(f"**Line {i+1}**:\n``````")
-            
-            if matches:
-                results.append(f"## {file_path}\nFound {len(matches)} matches:\n" + "\n\n".join(matches[:3]))
+        return render_results(matches) or f"No matches found for '{search_query}'"
+
+
+class AsyncFileAnalyzer(FileAnalyzer):
+    """FileAnalyzer whose LLM waits are awaited instead of holding a thread"""
+    
+    def __init__(self, llm: Optional[OllamaLLMService] = None, chunk_concurrency: Optional[int] = None):
+        super().__init__(llm, chunk_concurrency)
+        self.allm = AsyncOllamaLLMService(self.llm)
+    
+    async def analyze_file(self, file_content: str, file_path: str) -> str:
+        cache_keys = self.analysis_cache_keys(file_content, file_path)
+        cached = await sync_to_async(AnalysisCache.get)(*cache_keys.values())
+        if cached is not None:
+            return cached
+        
+        # Chunking follows the context window; look it up here so sizing does not block the loop
+        await self.allm.get_available_models()
+        await self.allm.context_window(self.planning_model(ANALYSIS_MODELS))
+        if self.is_chunked(file_content, file_path):
+            # The map step already fans chunks out over a thread pool; under ASGI each request
+            # has its own sync thread, so blocking there holds up nobody else
+            return await sync_to_async(super().analyze_file)(file_content, file_path)
+        
+        if await self.allm.is_available():
+            available_models = await self.allm.get_available_models()
+            for model_key in ANALYSIS_MODELS:
+                model_name = self.llm.models[model_key]
+                if model_name not in available_models:
+                    continue
+                await self.allm.context_window(model_name)
+                prompt = self.create_analysis_prompt(file_content, file_path, model_name)
+                analysis = await self.allm.generate(
+                    prompt, model_name, max_tokens=ANALYSIS_MAX_TOKENS, usage=self.usage
+                )
+                if "Error:" not in analysis and len(analysis) > 100:
+                    await sync_to_async(AnalysisCache.put)(cache_keys[model_name], model_name, analysis)
+                    return analysis
+        
+        # The structure comes from the symbol table in the database
+        return await sync_to_async(self._fallback_analysis)(file_content, file_path)
+    
+    async def search_code(self, files_content: Dict[str, str], search_query: str,
+                          snippets: Optional[List[Dict]] = None, matches: Optional[Dict] = None) -> str:
+        if await self.allm.is_available():
+            available_models = await self.allm.get_available_models()
+            prompt_model = self.planning_model(SEARCH_MODELS)
+            await self.allm.context_window(prompt_model)
+            prompt = self.create_search_prompt(files_content, search_query, snippets, prompt_model)
+            for model_key in SEARCH_MODELS:
+                model_name = self.llm.models[model_key]
+                if model_name in available_models:
+                    result = await self.allm.generate(prompt, model_name, max_tokens=SEARCH_MAX_TOKENS, usage=self.usage)
+                    if "Error:" not in result and len(result) > 50:
+                        return result
         
-        return "\n\n".join(results) if results else f"No matches found for '{search_query}'"
+        return self._fallback_search(files_content, search_query, matches=matches)
@@ -1,4 +1,6 @@
+from django.utils import timezone
 from ..models import RepositoryFile, Repository
+from .dependency_service import DependencyGraph
 from typing import Dict, List
 
 class MemoryService:
@@ -6,7 +8,8 @@ class MemoryService:
     def store_analysis(repo_file: RepositoryFile, analysis: str):
         """Store analysis result in database"""
         repo_file.analysis = analysis
-        repo_file.save()
+        repo_file.analyzed_at = timezone.now()
+        repo_file.save(update_fields=['analysis', 'analyzed_at'])
 
     @staticmethod
     def get_repo_context(repository: Repository) -> Dict[str, str]:
@@ -19,40 +22,56 @@ class MemoryService:
         return {f.file_path: f.analysis for f in files}
 
     @staticmethod
-    def get_file_relationships(repository: Repository, target_file_path: str) -> List[Dict]:
-        """Find files that might be related to target file"""
+    def get_file_relationships(repository: Repository, target_file_path: str,
+                               depth: int = 1, limit: int = 10) -> List[Dict]:
+        """Find files related to target file through the import graph"""
         target_file = RepositoryFile.objects.filter(
             repository=repository,
             file_path=target_file_path
-        ).first()
+        ).values('id', 'directory', 'file_type').first()
         
         if not target_file:
             return []
         
-        # Simple relationship detection based on imports/references
-        relationships = []
-        other_files = RepositoryFile.objects.filter(repository=repository).exclude(id=target_file.id)
+        # Import neighbours (direct and transitive) from the precomputed graph
+        neighbors = DependencyGraph.neighbors(repository, target_file['id'], depth)
+        
+        # Siblings in the same directory still count as weakly related; read off the (repository, directory) index
+        target_dir = target_file['directory']
+        sibling_ids = set(
+            RepositoryFile.objects.filter(repository=repository, directory=target_dir)
+            .exclude(id=target_file['id']).values_list('id', flat=True)
+        )
         
-        for file in other_files:
+        candidates = RepositoryFile.objects.filter(id__in=set(neighbors) | sibling_ids).values(
+            'id', 'file_path', 'directory', 'file_type'
+        )
+        
+        relationships = []
+        for file in candidates:
             score = 0
+            relationship = 'same_directory'
+            distance = None
             
-            # Check if target file is referenced in this file
-            if target_file_path in file.content:
-                score += 3
+            if file['id'] in neighbors:
+                distance, relationship = neighbors[file['id']]
+                # Direct imports weigh most, each further hop counts less
+                score += 3 / distance
             
             # Check common directory
-            if '/'.join(target_file_path.split('/')[:-1]) == '/'.join(file.file_path.split('/')[:-1]):
+            if file['directory'] == target_dir:
                 score += 1
             
             # Check similar file types
-            if target_file.file_type == file.file_type:
+            if target_file['file_type'] == file['file_type']:
                 score += 1
             
-            if score > 0:
-                relationships.append({
-                    'file_path': file.file_path,
-                    'relationship_score': score,
-                    'file_type': file.file_type
-                })
+            relationships.append({
+                'file_path': file['file_path'],
+                'relationship_score': round(score, 2),
+                'file_type': file['file_type'],
+                'relationship': relationship,
+                'depth': distance
+            })
         
-        return sorted(relationships, key=lambda x: x['relationship_score'], reverse=True)[:10]
+        return sorted(relationships, key=lambda x: (-x['relationship_score'], x['file_path']))[:limit]
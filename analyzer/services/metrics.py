@@ -0,0 +1,307 @@
+import bisect
+import contextlib
+import functools
+import math
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200)
+
+# name: (type, help, histogram buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    'reposcope_http_requests_total': ('counter', 'HTTP requests served', None),
+    'reposcope_http_request_duration_seconds': ('histogram', 'Wall time of HTTP requests', DURATION_BUCKETS),
+    'reposcope_http_request_db_queries': ('histogram', 'Database queries per HTTP request', QUERY_BUCKETS),
+    'reposcope_http_request_db_seconds': ('histogram', 'Database time per HTTP request', DURATION_BUCKETS),
+    'reposcope_upstream_requests_total': ('counter', 'Requests sent to GitHub and Ollama', None),
+    'reposcope_upstream_request_duration_seconds': (
+        'histogram', 'Time to the response headers of GitHub and Ollama requests', DURATION_BUCKETS
+    ),
+    'reposcope_upstream_response_bytes_total': ('counter', 'Response bytes received from GitHub and Ollama', None),
+    'reposcope_llm_prompt_tokens_total': ('counter', 'Prompt tokens Ollama evaluated', None),
+    'reposcope_llm_completion_tokens_total': ('counter', 'Tokens Ollama generated', None),
+    'reposcope_llm_prompt_eval_seconds_total': ('counter', 'Time Ollama spent evaluating prompts', None),
+    'reposcope_llm_eval_seconds_total': ('counter', 'Time Ollama spent generating tokens', None),
+    'reposcope_llm_tokens_per_second': ('histogram', 'Generation speed of each Ollama call', RATE_BUCKETS),
+    'reposcope_span_duration_seconds': ('histogram', 'Time spent in named sections of request handling', DURATION_BUCKETS),
+}
+
+GITHUB_REPO_PATH_RE = re.compile(r'^/repos/[^/]+/[^/]+(?:/([^/]+))?(?:/([^/]+))?')
+
+
+def enabled() -> bool:
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """Counters and histograms of this process, rendered in the Prometheus text format
+
+    Each process keeps its own; under a multi-process server every worker is scraped separately.
+    """
+
+    def __init__(self, metrics: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = METRICS):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {name: {} for name in metrics}
+        # Histogram series are [count per bucket..., count above the last bucket, sum, count]
+        self._histograms: Dict[str, Dict[Tuple, List[float]]] = {name: {} for name in metrics}
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        buckets = self.metrics[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [0.0] * (len(buckets) + 3)
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            for name in self.metrics:
+                self._counters[name].clear()
+                self._histograms[name].clear()
+
+    @staticmethod
+    def _labels(key: Iterable[Tuple[str, str]], extra: str = '') -> str:
+        parts = [f'{name}="{_escape(str(value))}"' for name, value in key]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, description, buckets) in self.metrics.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'counter':
+                    for key, value in sorted(self._counters[name].items()):
+                        lines.append(f'{name}{self._labels(key)} {_number(value)}')
+                    continue
+                for key, series in sorted(self._histograms[name].items()):
+                    cumulative = 0.0
+                    for bound, count in zip(buckets + (math.inf,), series[:-2]):
+                        cumulative += count
+                        le = f'le="{_number(bound)}"'
+                        lines.append(f'{name}_bucket{self._labels(key, le)} {_number(cumulative)}')
+                    lines.append(f'{name}_sum{self._labels(key)} {_number(series[-2])}')
+                    lines.append(f'{name}_count{self._labels(key)} {_number(series[-1])}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestTimings:
+    """What one HTTP request spent on the database, upstream calls and named spans"""
+
+    __slots__ = ('started', 'db_queries', 'db_seconds', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.spans: Dict[str, List[float]] = {}  # name: [seconds, calls]
+
+    def add(self, name: str, seconds: float):
+        span = self.spans.setdefault(name, [0.0, 0])
+        span[0] += seconds
+        span[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        queries = 'query' if self.db_queries == 1 else 'queries'
+        entries = [f'total;dur={total * 1000:.1f}',
+                   f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} {queries}"']
+        for name, (seconds, calls) in self.spans.items():
+            entries.append(f'{name};dur={seconds * 1000:.1f};desc="{calls} call{"" if calls == 1 else "s"}"')
+        return ', '.join(entries)
+
+
+# asgiref copies the context into sync_to_async threads, so ORM calls of async views are counted too
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('reposcope_request_timings', default=None)
+
+
+def start_request() -> Tuple[RequestTimings, object]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_request(method: str, route: str, status: int, timings: RequestTimings) -> float:
+    """Record a finished request; returns its wall time in seconds"""
+    elapsed = time.perf_counter() - timings.started
+    registry.inc('reposcope_http_requests_total', method=method, route=route, status=str(status))
+    registry.observe('reposcope_http_request_duration_seconds', elapsed, method=method, route=route)
+    registry.observe('reposcope_http_request_db_queries', timings.db_queries, route=route)
+    registry.observe('reposcope_http_request_db_seconds', timings.db_seconds, route=route)
+    return elapsed
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        # Job workers and other threads outside a request
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+def _instrument_connection(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_db_instrumentation():
+    """Time every query on every database connection, including ones opened later"""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_instrument_connection, dispatch_uid='reposcope_metrics')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection)
+
+
+@contextlib.contextmanager
+def _span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('reposcope_span_duration_seconds', elapsed, span=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def span(name: str):
+    """Context manager timing a section of work under name; a no-op while metrics are disabled"""
+    return _span(name) if enabled() else contextlib.nullcontext()
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with _span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _endpoint(service: str, path: str) -> str:
+    """A low-cardinality label for an upstream URL path"""
+    if service != 'github':
+        return path or '/'
+    match = GITHUB_REPO_PATH_RE.match(path)
+    if match is None:
+        return path.split('/', 2)[1] if path.count('/') else path
+    if match.group(1) == 'git' and match.group(2):
+        return f'git/{match.group(2)}'
+    return match.group(1) or 'repo'
+
+
+def record_upstream(service: str, method: str, url: str, status: int, seconds: float, size: int):
+    endpoint = _endpoint(service, urlsplit(url).path)
+    registry.inc('reposcope_upstream_requests_total', service=service, method=method, endpoint=endpoint,
+                 status=str(status))
+    registry.observe('reposcope_upstream_request_duration_seconds', seconds, service=service, endpoint=endpoint)
+    if size:
+        registry.inc('reposcope_upstream_response_bytes_total', size, service=service, endpoint=endpoint)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(service, seconds)
+
+
+def response_hook(service: str) -> Callable:
+    """requests response hook recording each response of service"""
+    def hook(response, *args, **kwargs):
+        size = response.headers.get('Content-Length')
+        if size is None and not kwargs.get('stream'):
+            size = len(response.content)
+        record_upstream(service, response.request.method, response.url, response.status_code,
+                        response.elapsed.total_seconds(), int(size or 0))
+        return response
+    return hook
+
+
+def service_of(url: httpx.URL) -> str:
+    """Which upstream an httpx request goes to, by the configured base URLs"""
+    origin = f'{url.scheme}://{url.netloc.decode("ascii")}'
+    if origin == getattr(settings, 'OLLAMA_HOST', 'http://localhost:11434').rstrip('/'):
+        return 'ollama'
+    if origin == getattr(settings, 'GITHUB_API_URL', 'https://api.github.com').rstrip('/'):
+        return 'github'
+    return url.host
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records every request an httpx.AsyncClient sends through the wrapped transport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        record_upstream(service_of(request.url), request.method, str(request.url), response.status_code,
+                        time.perf_counter() - started, int(response.headers.get('Content-Length') or 0))
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def record_generation(model: str, data: Dict):
+    """Token counts and speed of a finished Ollama generation or embedding"""
+    prompt_tokens, completion_tokens = data.get('prompt_eval_count'), data.get('eval_count')
+    if prompt_tokens:
+        registry.inc('reposcope_llm_prompt_tokens_total', prompt_tokens, model=model)
+    if completion_tokens:
+        registry.inc('reposcope_llm_completion_tokens_total', completion_tokens, model=model)
+    # Ollama reports durations in nanoseconds
+    if data.get('prompt_eval_duration'):
+        registry.inc('reposcope_llm_prompt_eval_seconds_total', data['prompt_eval_duration'] / 1e9, model=model)
+    if data.get('eval_duration'):
+        seconds = data['eval_duration'] / 1e9
+        registry.inc('reposcope_llm_eval_seconds_total', seconds, model=model)
+        if completion_tokens:
+            registry.observe('reposcope_llm_tokens_per_second', completion_tokens / seconds, model=model)
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import models, transaction
+from typing import List, Optional, Sequence, Type
+
+
+class BulkWriter:
+    """Buffer model rows and persist them with bulk_create/bulk_update in chunks
+
+    Each flush runs inside its own transaction, so SQLite commits (and fsyncs)
+    once per chunk instead of once per row.
+    """
+
+    def __init__(self, model: Type[models.Model], update_fields: Sequence[str] = (),
+                 batch_size: Optional[int] = None, ignore_conflicts: bool = False):
+        self.model = model
+        self.update_fields = list(update_fields)
+        self.ignore_conflicts = ignore_conflicts
+        self.batch_size = batch_size or getattr(settings, 'INGEST_BATCH_SIZE', 500)
+        self.pending_create: List[models.Model] = []
+        self.pending_update: List[models.Model] = []
+        self.created = 0
+        self.updated = 0
+
+    def create(self, obj: models.Model):
+        """Queue a new row for insertion"""
+        self.pending_create.append(obj)
+        if len(self.pending_create) >= self.batch_size:
+            self.flush()
+
+    def update(self, obj: models.Model):
+        """Queue an existing row (primary key set) for update of update_fields"""
+        self.pending_update.append(obj)
+        if len(self.pending_update) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far"""
+        if not self.pending_create and not self.pending_update:
+            return
+
+        with transaction.atomic():
+            if self.pending_create:
+                self.model.objects.bulk_create(
+                    self.pending_create, batch_size=self.batch_size, ignore_conflicts=self.ignore_conflicts
+                )
+                self.created += len(self.pending_create)
+            if self.pending_update:
+                self.model.objects.bulk_update(self.pending_update, self.update_fields, batch_size=self.batch_size)
+                self.updated += len(self.pending_update)
+
+        self.pending_create = []
+        self.pending_update = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
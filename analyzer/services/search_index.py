@@ -0,0 +1,233 @@
+import re
+import string
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import FileBlob, Repository, RepositoryFile, SearchPosting, SearchSignature
+from .persistence_service import BulkWriter
+from .text_search import TextSearchEngine
+
+WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+# Boundaries inside an identifier: snake_case separators and camelCase humps
+SUBWORD_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 100
+
+TRIGRAM_BITS = 4096
+# ASCII case folding, plus the non-ASCII letters re.IGNORECASE matches to ASCII ones; str.lower()
+# is avoided because it can change lengths and depends on context (final sigma)
+TRIGRAM_FOLD = str.maketrans({
+    **{letter: letter.lower() for letter in string.ascii_uppercase},
+    '\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k',
+})
+
+
+def index_terms(word: str) -> Set[str]:
+    """Terms stored for one identifier: the identifier plus every suffix starting at a word part
+
+    get_file_content -> get_file_content, file_content, content
+    parseRepoURL     -> parserepourl, repourl, url
+    Prefix lookups on these terms find any query that starts at a word-part boundary.
+    """
+    terms = set()
+    lowered = word.lower()
+    starts = {0}
+    for part in SUBWORD_RE.finditer(word):
+        starts.add(part.start())
+    for start in starts:
+        term = lowered[start:].lstrip('_')
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.add(term[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """Lowercased words of a search query that are long enough to look up"""
+    return [word.lower()[:MAX_TERM_LENGTH] for word in WORD_RE.findall(query) if len(word) >= MIN_TERM_LENGTH]
+
+
+def _trigram_bits(trigrams: Iterable[str]) -> int:
+    bits = 0
+    for trigram in trigrams:
+        bits |= 1 << (zlib.crc32(trigram.encode('utf-8', 'surrogatepass')) % TRIGRAM_BITS)
+    return bits
+
+
+def trigram_signature(content: str) -> bytes:
+    """Bit set of the folded trigrams of a file"""
+    folded = content.translate(TRIGRAM_FOLD)
+    bits = _trigram_bits({folded[i:i + 3] for i in range(len(folded) - 2)})
+    return bits.to_bytes(TRIGRAM_BITS // 8, 'little')
+
+
+def term_trigram_mask(term: str, case_sensitive: bool) -> int:
+    """Bits every file containing term has set in its signature; 0 when term has no usable trigram"""
+    folded = term.translate(TRIGRAM_FOLD)
+    trigrams = {folded[i:i + 3] for i in range(len(folded) - 2)}
+    if not case_sensitive:
+        # The fold covers every case variant of ASCII letters only
+        trigrams = {trigram for trigram in trigrams if trigram.isascii()}
+    return _trigram_bits(trigrams)
+
+
+def text_search_engine() -> TextSearchEngine:
+    """Exact-match search engine configured from settings"""
+    return TextSearchEngine(
+        workers=getattr(settings, 'SEARCH_WORKERS', None),
+        parallel_min_bytes=getattr(settings, 'SEARCH_PARALLEL_MIN_BYTES', 4 * 1024 * 1024)
+    )
+
+
+class SearchIndex:
+    @staticmethod
+    def index_files(repository: Repository, files: Iterable[Tuple[int, str]]):
+        """Rebuild postings for the given (file_id, content) pairs"""
+        files = list(files)
+        if not files:
+            return
+
+        with transaction.atomic():
+            SearchPosting.objects.filter(file_id__in=[file_id for file_id, _ in files]).delete()
+            SearchSignature.objects.filter(file_id__in=[file_id for file_id, _ in files]).delete()
+            with BulkWriter(SearchSignature) as writer:
+                for file_id, content in files:
+                    writer.create(SearchSignature(
+                        repository=repository, file_id=file_id, trigrams=trigram_signature(content)
+                    ))
+
+            with BulkWriter(SearchPosting) as writer:
+                for file_id, content in files:
+                    postings = defaultdict(list)
+                    for line_no, line in enumerate(content.splitlines()):
+                        terms = set()
+                        for word in WORD_RE.findall(line):
+                            terms.update(index_terms(word))
+                        for term in terms:
+                            postings[term].append(line_no)
+
+                    for term, line_numbers in postings.items():
+                        writer.create(SearchPosting(
+                            repository=repository,
+                            file_id=file_id,
+                            term=term,
+                            lines=' '.join(map(str, line_numbers))
+                        ))
+
+    @staticmethod
+    def rebuild(repository: Repository):
+        """Index every stored file of a repository"""
+        SearchPosting.objects.filter(repository=repository).delete()
+        SearchSignature.objects.filter(repository=repository).delete()
+        files = RepositoryFile.objects.filter(repository=repository, blob__isnull=False).values_list('id', 'blob__data')
+        batch = []
+        for file_id, data in files.iterator():
+            batch.append((file_id, FileBlob.decompress(data)))
+            if len(batch) >= 200:
+                SearchIndex.index_files(repository, batch)
+                batch = []
+        SearchIndex.index_files(repository, batch)
+
+    @staticmethod
+    def is_indexed(repository: Repository) -> bool:
+        return SearchPosting.objects.filter(repository=repository).exists()
+
+    @staticmethod
+    def _files_with_prefix(repository: Repository, term: str) -> Set[int]:
+        # Range scan instead of LIKE so SQLite can use the (repository, term) index
+        upper = term[:-1] + chr(ord(term[-1]) + 1)
+        return set(SearchPosting.objects.filter(
+            repository=repository, term__gte=term, term__lt=upper
+        ).values_list('file_id', flat=True))
+
+    @staticmethod
+    def candidate_files(repository: Repository, terms: List[str], require_all: bool = True) -> Optional[Set[int]]:
+        """Files that can contain the given whole-word search terms (every term, or any unless require_all)
+
+        Returns None when some term has no indexable word, in which case every file must be scanned.
+        """
+        per_term = []
+        for term in terms:
+            words = query_terms(term)
+            if not words:
+                return None
+            files: Optional[Set[int]] = None
+            for word in dict.fromkeys(words):
+                found = SearchIndex._files_with_prefix(repository, word)
+                files = found if files is None else files & found
+            per_term.append(files)
+        if not per_term:
+            return None
+        return set.intersection(*per_term) if require_all else set.union(*per_term)
+
+    @staticmethod
+    def substring_candidates(repository: Repository, terms: List[str], case_sensitive: bool = False,
+                             require_all: bool = True) -> Optional[Set[int]]:
+        """Files that can contain the given literal search terms, by their trigram signatures
+
+        Returns None when some term has no usable trigram, in which case every file must be scanned.
+        Files indexed before signatures existed are always candidates.
+        """
+        masks = [term_trigram_mask(term, case_sensitive) for term in terms]
+        if not masks or not all(masks):
+            return None
+        candidates = set()
+        signatures = RepositoryFile.objects.filter(repository=repository).values_list(
+            'id', 'search_signature__trigrams'
+        )
+        for file_id, trigrams in signatures.iterator():
+            if trigrams is None:
+                candidates.add(file_id)
+                continue
+            bits = int.from_bytes(trigrams, 'little')
+            found = (bits & mask == mask for mask in masks)
+            if all(found) if require_all else any(found):
+                candidates.add(file_id)
+        return candidates
+
+    @staticmethod
+    def lookup(repository: Repository, query: str) -> Optional[Dict]:
+        """Find candidate files and lines for a query without reading file contents
+
+        Returns None when the query has no indexable words, otherwise:
+        - 'lines': {file_id: set of 0-based line numbers containing every query word}
+        - 'ranked_files': file ids matching any query word, most query words first
+        """
+        terms = query_terms(query)
+        if not terms:
+            return None
+
+        per_term: List[Dict[int, Set[int]]] = []
+        for term in dict.fromkeys(terms):
+            # Range scan instead of LIKE so SQLite can use the (repository, term) index
+            upper = term[:-1] + chr(ord(term[-1]) + 1)
+            hits: Dict[int, Set[int]] = defaultdict(set)
+            postings = SearchPosting.objects.filter(
+                repository=repository, term__gte=term, term__lt=upper
+            ).values_list('file_id', 'lines')
+            for file_id, lines in postings:
+                hits[file_id].update(map(int, lines.split()))
+            per_term.append(hits)
+
+        # A substring match lives on a single line, so every word must share that line
+        lines: Dict[int, Set[int]] = {}
+        for file_id, first_lines in per_term[0].items():
+            common = set(first_lines)
+            for hits in per_term[1:]:
+                common &= hits.get(file_id, set())
+                if not common:
+                    break
+            if common:
+                lines[file_id] = common
+
+        word_counts: Dict[int, int] = defaultdict(int)
+        for hits in per_term:
+            for file_id in hits:
+                word_counts[file_id] += 1
+        ranked_files = sorted(word_counts, key=lambda file_id: (-word_counts[file_id], file_id))
+
+        return {'lines': lines, 'ranked_files': ranked_files}
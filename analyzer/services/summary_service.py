@@ -0,0 +1,280 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import CodeSymbol, Repository, RepositoryFile, SummaryNode
+from .llm_service import OllamaLLMService, get_llm_service
+from .token_budget import TokenUsage, fit_text, reduce_texts
+
+# Bump whenever the summary prompts change so stored summaries are rebuilt
+SUMMARY_PROMPT_VERSION = 'summary-v1'
+SUMMARY_MODELS = ['general', 'code', 'fallback']
+SUMMARY_MAX_TOKENS = 600
+SUMMARY_FILE_TOKENS = 400  # Most of one file's analysis a directory prompt carries
+SUMMARY_DEFINITIONS = 15  # Definitions listed for a file that has no analysis yet
+
+
+def node_depth(path: str) -> int:
+    return path.count('/') + 1 if path else 0
+
+
+class RepositorySummarizer:
+    """Repository summary built bottom-up: file analyses into directory summaries, those into the root's
+
+    Every directory is a SummaryNode keyed by a hash of its inputs (its files' analyses and its
+    subdirectories' hashes), so after a change only the directories on the path to the root are rebuilt.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, llm: Optional[OllamaLLMService] = None):
+        self.concurrency = max(1, concurrency or getattr(settings, 'OLLAMA_PARALLEL', 2))
+        self.llm = llm or get_llm_service()
+        self.usage = TokenUsage()
+        # Condensing a large directory fans out again; this keeps generations in flight at concurrency
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def summary_model(self) -> Optional[str]:
+        for model_key in SUMMARY_MODELS:
+            if self.llm.has_model(self.llm.models[model_key]):
+                return self.llm.models[model_key]
+        return None
+
+    def plan(self, repository: Repository, model: str) -> Dict[str, Dict]:
+        """Every directory holding files, directly or below, with its input hash; '' is the root"""
+        nodes: Dict[str, Dict] = {}
+
+        def node(path: str) -> Dict:
+            if path not in nodes:
+                nodes[path] = {'path': path, 'files': [], 'dirs': [], 'file_count': 0}
+                if path:
+                    node(path.rpartition('/')[0])['dirs'].append(path)
+            return nodes[path]
+
+        node('')
+        definitions: Dict[int, List[str]] = {}
+        symbols = CodeSymbol.objects.filter(repository=repository, file__analysis='').exclude(kind='method')
+        for file_id, signature in symbols.order_by('file_id', 'start_line').values_list('file_id', 'signature').iterator():
+            listed = definitions.setdefault(file_id, [])
+            if len(listed) < SUMMARY_DEFINITIONS:
+                listed.append(signature[:120])
+
+        files = RepositoryFile.objects.filter(repository=repository).values_list('id', 'file_path', 'analysis')
+        for file_id, file_path, analysis in files.iterator():
+            directory = node(file_path.rpartition('/')[0])
+            # Analyses are read again only for the directories that need rebuilding
+            digest = hashlib.sha256(analysis.encode('utf-8', 'surrogatepass')).hexdigest() if analysis else None
+            directory['files'].append({
+                'id': file_id,
+                'path': file_path,
+                'digest': digest,
+                'definitions': [] if analysis else definitions.get(file_id, []),
+            })
+            path = directory['path']
+            while True:
+                nodes[path]['file_count'] += 1
+                if not path:
+                    break
+                path = path.rpartition('/')[0]
+
+        for path in sorted(nodes, key=node_depth, reverse=True):
+            entry = nodes[path]
+            entry['files'].sort(key=lambda file: file['path'])
+            entry['dirs'].sort()
+            digest = hashlib.sha256(f'{SUMMARY_PROMPT_VERSION}\0{model}\0'.encode())
+            for file in entry['files']:
+                described = file['digest'] or '\n'.join(file['definitions'])
+                digest.update(f"F{file['path']}\0{described}\0".encode('utf-8', 'surrogatepass'))
+            for child in entry['dirs']:
+                digest.update(f"D{child}\0{nodes[child]['input_hash']}\0".encode('utf-8', 'surrogatepass'))
+            entry['input_hash'] = digest.hexdigest()
+        return nodes
+
+    def run(self, repository: Repository, progress: Optional[Callable[..., None]] = None) -> Dict:
+        """Rebuild the summaries whose inputs changed, deepest directories first
+
+        progress counts directories in files_total / files_analyzed.
+        """
+        progress = progress or (lambda **counters: None)
+        started = time.monotonic()
+
+        if not self.llm.is_available():
+            # A pattern-based stand-in stored here would be reused as if the LLM had written it
+            raise RuntimeError('Ollama is not available; repository summaries need a running LLM')
+        model = self.summary_model()
+        if model is None:
+            raise RuntimeError('None of the summary models is installed in Ollama')
+
+        nodes = self.plan(repository, model)
+        stored = {
+            path: (input_hash, summary)
+            for path, input_hash, summary in SummaryNode.objects.filter(repository=repository).values_list(
+                'path', 'input_hash', 'summary'
+            )
+        }
+        SummaryNode.objects.filter(repository=repository).exclude(path__in=list(nodes)).delete()
+
+        summaries = {path: stored[path][1] for path, entry in nodes.items()
+                     if path in stored and stored[path][0] == entry['input_hash']}
+        levels: Dict[int, List[str]] = {}
+        for path in nodes:
+            if path not in summaries:
+                levels.setdefault(node_depth(path), []).append(path)
+        stale = sum(len(paths) for paths in levels.values())
+        progress(files_total=stale)
+
+        generated = 0
+        failed = set()
+        errors = []
+        name = str(repository)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            # A level only needs the one below it, so each level is one concurrent batch
+            for depth in sorted(levels, reverse=True):
+                futures = {}
+                for path in sorted(levels[depth]):
+                    entry = nodes[path]
+                    if any(child in failed for child in entry['dirs']):
+                        failed.add(path)
+                        errors.append({'path': path, 'error': 'A subdirectory summary failed'})
+                        continue
+                    if path and not entry['files'] and len(entry['dirs']) == 1:
+                        # A directory that only wraps another says nothing of its own
+                        summaries[path] = summaries[entry['dirs'][0]]
+                        self._store(repository, entry, model, summaries[path])
+                        generated += 1
+                        progress(files_analyzed=generated)
+                        continue
+                    sections = self._sections(entry, nodes, summaries)
+                    futures[executor.submit(self._summarize, name, entry, sections, model)] = path
+
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        failed.add(path)
+                        errors.append({'path': path, 'error': str(e)})
+                        continue
+                    # Database access stays on this thread; workers only talk to Ollama
+                    summaries[path] = summary
+                    self._store(repository, nodes[path], model, summary)
+                    generated += 1
+                    progress(files_analyzed=generated)
+
+        return {
+            'repository_id': repository.id,
+            'model': model,
+            'summary': summaries.get(''),
+            'nodes_total': len(nodes),
+            'nodes_generated': generated,
+            'nodes_reused': len(nodes) - stale,
+            'errors': errors,
+            'token_usage': self.usage.as_dict(),
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
+
+    def _sections(self, entry: Dict, nodes: Dict[str, Dict], summaries: Dict[str, str]) -> List[str]:
+        """One text per file and subdirectory of a directory, in path order"""
+        analyses = dict(RepositoryFile.objects.filter(
+            id__in=[file['id'] for file in entry['files'] if file['digest']]
+        ).values_list('id', 'analysis'))
+
+        sections = []
+        for file in entry['files']:
+            name = file['path'].rpartition('/')[2]
+            if file['id'] in analyses:
+                analysis = fit_text(analyses[file['id']].strip(), SUMMARY_FILE_TOKENS, self.llm.count_tokens)
+                sections.append(f"### {name}\n{analysis}")
+            elif file['definitions']:
+                listed = "\n".join(f"- {definition}" for definition in file['definitions'])
+                sections.append(f"### {name} (not analyzed) Definitions:\n{listed}")
+            else:
+                sections.append(f"### {name} (not analyzed)")
+        for child in entry['dirs']:
+            header = f"### {child.rpartition('/')[2]}/ ({nodes[child]['file_count']} files)"
+            sections.append(f"{header}\n{summaries[child].strip()}")
+        return sections
+
+    def _summarize(self, repository_name: str, entry: Dict, sections: List[str], model: str) -> str:
+        """Summary of one directory, condensing its sections first if they overflow the prompt"""
+        count = lambda text: self.llm.count_tokens(text, model)
+        budget = self.llm.prompt_budget(model, SUMMARY_MAX_TOKENS) - count(self._prompt(repository_name, entry, ''))
+        sections = reduce_texts(
+            sections, budget, count, lambda joined: self._condense(repository_name, entry, joined, model),
+            self.concurrency
+        )
+        sections = [fit_text(section, budget, count) for section in sections]
+
+        summary = self._generate(self._prompt(repository_name, entry, "\n\n".join(sections)), model)
+        if "Error:" in summary or not summary.strip():
+            raise RuntimeError(summary.strip() or 'LLM returned an empty summary')
+        return summary.strip()
+
+    def _condense(self, repository_name: str, entry: Dict, joined: str, model: str) -> Optional[str]:
+        """One intermediate reduce step over part of a directory's sections; None if the LLM failed"""
+        prompt = f"""Condense these notes on part of {self._subject(repository_name, entry)} into one set of short notes.
+Keep every component, responsibility and dependency they mention, with the file or directory it belongs to; drop repetition.
+
+{joined}
+"""
+        condensed = self._generate(prompt, model)
+        if "Error:" in condensed or not condensed.strip():
+            return None
+        return condensed
+
+    def _generate(self, prompt: str, model: str) -> str:
+        with self._slots:
+            return self.llm.generate(prompt, model, max_tokens=SUMMARY_MAX_TOKENS, usage=self.usage)
+
+    @staticmethod
+    def _subject(repository_name: str, entry: Dict) -> str:
+        if entry['path']:
+            return f"the directory {entry['path']}/ of the {repository_name} repository ({entry['file_count']} files)"
+        return f"the {repository_name} repository ({entry['file_count']} files)"
+
+    @classmethod
+    def _prompt(cls, repository_name: str, entry: Dict, sections: str) -> str:
+        if entry['path']:
+            covering = "what the directory is for, its main components and how they work together, and what it depends on"
+        else:
+            covering = ("what the project does, its architecture and main modules, the technologies it uses, "
+                        "and where a newcomer should start reading")
+        return f"""You are summarizing {cls._subject(repository_name, entry)} for a developer new to the codebase.
+Below are notes on its files and summaries of its subdirectories.
+
+{sections}
+
+Write a concise summary (at most 250 words) covering {covering}.
+Mention risks or quality concerns the notes raise. Do not list every file."""
+
+    @staticmethod
+    def _store(repository: Repository, entry: Dict, model: str, summary: str):
+        fields = {
+            'input_hash': entry['input_hash'],
+            'model': model,
+            'summary': summary,
+            'file_count': entry['file_count'],
+        }
+        with transaction.atomic():
+            updated = SummaryNode.objects.filter(repository=repository, path=entry['path']).update(
+                updated_at=timezone.now(), **fields
+            )
+            if not updated:
+                SummaryNode.objects.create(repository=repository, path=entry['path'], **fields)
+
+    @staticmethod
+    def stored(repository: Repository, path: Optional[str] = None) -> List[Dict]:
+        """Stored summaries, the root first, optionally only of path and the directories below it"""
+        nodes = SummaryNode.objects.filter(repository=repository)
+        if path:
+            # Range on the (repository, path) index rather than a LIKE scan
+            nodes = nodes.filter(Q(path=path) | Q(path__gt=f'{path}/', path__lt=f'{path}0'))
+        return [
+            {**row, 'updated_at': row['updated_at'].isoformat()}
+            for row in nodes.order_by('path').values('path', 'summary', 'model', 'file_count', 'updated_at')
+        ]
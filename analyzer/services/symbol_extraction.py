@@ -0,0 +1,254 @@
+import ast
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .worker_pool import map_batched
+
+# Deliberately free of Django imports: worker processes import this module on their own
+
+SIGNATURE_CHARS = 300
+
+# Definitions per language: (kind, pattern with the name in group 'name'). Methods only
+# count inside a class; Go methods carry their receiver type in group 'receiver'.
+DEFINITION_PATTERNS: Dict[str, List[Tuple[str, re.Pattern]]] = {
+    'python': [
+        ('class', re.compile(r'^[ \t]*class[ \t]+(?P<name>\w+)', re.MULTILINE)),
+        ('function', re.compile(r'^[ \t]*(?:async[ \t]+)?def[ \t]+(?P<name>\w+)', re.MULTILINE)),
+    ],
+    'javascript': [
+        ('class', re.compile(
+            r'^[ \t]*(?:export[ \t]+)?(?:default[ \t]+)?(?:abstract[ \t]+)?class[ \t]+(?P<name>[\w$]+)', re.MULTILINE
+        )),
+        ('type', re.compile(
+            r'^[ \t]*(?:export[ \t]+)?(?:declare[ \t]+)?(?:interface|enum|type)[ \t]+(?P<name>[\w$]+)', re.MULTILINE
+        )),
+        ('function', re.compile(
+            r'^[ \t]*(?:export[ \t]+)?(?:default[ \t]+)?(?:async[ \t]+)?function[ \t]*\*?[ \t]*(?P<name>[\w$]+)',
+            re.MULTILINE
+        )),
+        ('function', re.compile(
+            r'^[ \t]*(?:export[ \t]+)?(?:const|let|var)[ \t]+(?P<name>[\w$]+)[ \t]*(?::[^=\n]+)?=[ \t]*'
+            r'(?:async[ \t]*)?(?:function\b|\([^)]*\)[ \t]*(?::[^=\n]+)?=>|[\w$]+[ \t]*=>)',
+            re.MULTILINE
+        )),
+        ('method', re.compile(
+            r'^[ \t]+(?!(?:if|for|while|switch|catch|return|function|new|else)\b)'
+            r'(?:(?:static|async|get|set|public|private|protected|readonly|override)[ \t]+)*\*?'
+            r'(?P<name>[\w$]+)[ \t]*(?:<[^>\n]*>)?\([^)]*\)[ \t]*(?::[^{\n]*)?\{',
+            re.MULTILINE
+        )),
+    ],
+    'go': [
+        ('type', re.compile(r'^type[ \t]+(?P<name>\w+)', re.MULTILINE)),
+        ('function', re.compile(
+            r'^func[ \t]*(?:\([ \t]*(?:\w+[ \t]+)?\*?(?P<receiver>\w+)[^)]*\)[ \t]*)?(?P<name>\w+)', re.MULTILINE
+        )),
+    ],
+    'java': [
+        ('class', re.compile(
+            r'^[ \t]*(?:@\w+[ \t]+)*(?:(?:public|protected|private|abstract|final|static|sealed)[ \t]+)*'
+            r'(?:class|interface|enum|record)[ \t]+(?P<name>\w+)',
+            re.MULTILINE
+        )),
+        ('method', re.compile(
+            r'^[ \t]+(?:(?:public|protected|private|static|final|abstract|synchronized|default|native)[ \t]+)*'
+            r'(?:<[^>\n]+>[ \t]+)?(?!(?:return|new|else|throw)\b)[\w<>\[\],.? ]+?[ \t]+(?P<name>\w+)[ \t]*\(',
+            re.MULTILINE
+        )),
+    ],
+}
+
+# What a brace-matching scan has to step over: strings, comments, braces, statement ends, line breaks
+TOKEN_RE = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`'
+    r'|//[^\n]*|/\*.*?\*/|[{};\n]',
+    re.DOTALL
+)
+NEWLINE_RE = re.compile(r'\n')
+NOT_NEWLINE_RE = re.compile(r'[^\n]')
+
+
+def extract_symbols(language: Optional[str], content: str) -> List[Dict]:
+    """Classes, functions and methods of a source file, in file order
+
+    Each symbol is {'name', 'qualified_name', 'kind', 'signature', 'start_line', 'end_line'}
+    with 1-based, inclusive lines; start_line includes decorators. Python is parsed with
+    ast (falling back to indentation for code ast rejects), other languages are scanned.
+    """
+    if language == 'python':
+        try:
+            return _python_symbols(content)
+        except (SyntaxError, ValueError, RecursionError):
+            return _indented_symbols(content)
+    if language in DEFINITION_PATTERNS:
+        return _braced_symbols(language, content)
+    return []
+
+
+def _python_symbols(content: str) -> List[Dict]:
+    symbols = []
+
+    def visit(node, parent: Optional[Tuple[str, str]]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if isinstance(child, ast.ClassDef):
+                    kind = 'class'
+                    bases = [ast.unparse(base) for base in child.bases]
+                    bases += [ast.unparse(keyword) for keyword in child.keywords]
+                    signature = f"class {child.name}({', '.join(bases)})" if bases else f"class {child.name}"
+                else:
+                    kind = 'method' if parent and parent[1] == 'class' else 'function'
+                    prefix = 'async def' if isinstance(child, ast.AsyncFunctionDef) else 'def'
+                    signature = f"{prefix} {child.name}({ast.unparse(child.args)})"
+                    if child.returns is not None:
+                        signature += f" -> {ast.unparse(child.returns)}"
+
+                qualified_name = f"{parent[0]}.{child.name}" if parent else child.name
+                symbols.append({
+                    'name': child.name,
+                    'qualified_name': qualified_name,
+                    'kind': kind,
+                    'signature': signature[:SIGNATURE_CHARS],
+                    'start_line': min([child.lineno] + [decorator.lineno for decorator in child.decorator_list]),
+                    'end_line': child.end_lineno,
+                })
+                visit(child, (qualified_name, kind))
+            else:
+                # Definitions nested in if/try/with blocks belong to the enclosing scope
+                visit(child, parent)
+
+    visit(ast.parse(content), None)
+    symbols.sort(key=lambda symbol: symbol['start_line'])
+    return symbols
+
+
+def _indented_symbols(content: str) -> List[Dict]:
+    """Python definitions found by regex, each spanning the lines indented deeper than it"""
+    lines = content.splitlines()
+    indents = [len(line) - len(line.lstrip()) if line.strip() else None for line in lines]
+    found = []
+    for kind, pattern in DEFINITION_PATTERNS['python']:
+        for match in pattern.finditer(content):
+            line = content.count('\n', 0, match.start())
+            end = line + 1
+            while end < len(lines) and (indents[end] is None or indents[end] > indents[line]):
+                end += 1
+            while end - 1 > line and indents[end - 1] is None:
+                end -= 1
+            found.append((line, end, kind, match.group('name'), lines[line].strip()))
+    return _nest(sorted(found))
+
+
+def _braced_symbols(language: str, content: str) -> List[Dict]:
+    """Definitions found by regex, each spanning to the brace that closes its body"""
+    line_starts = [0] + [match.end() for match in NEWLINE_RE.finditer(content)]
+    tokens = [(match.start(), match.group()) for match in TOKEN_RE.finditer(content) if match.group() in ('{', '}', ';')]
+    # Definitions inside strings and comments are not definitions; blanking them keeps offsets and lines
+    masked = TOKEN_RE.sub(
+        lambda match: NOT_NEWLINE_RE.sub(' ', match.group()) if len(match.group()) > 1 else match.group(), content
+    )
+
+    matches = []
+    for kind, pattern in DEFINITION_PATTERNS[language]:
+        for match in pattern.finditer(masked):
+            matches.append((match.start('name'), kind, match))
+    matches.sort(key=lambda item: item[0])
+
+    found = []
+    token_index = 0
+    for index, (position, kind, match) in enumerate(matches):
+        next_start = matches[index + 1][0] if index + 1 < len(matches) else len(content)
+        while token_index < len(tokens) and tokens[token_index][0] < position:
+            token_index += 1
+
+        # The body opens at the first brace before the next definition, unless a statement ends first
+        end_position = position
+        depth = 0
+        for token_position, token in tokens[token_index:]:
+            if depth == 0 and (token_position >= next_start or token == ';'):
+                break
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if depth <= 0:
+                    end_position = token_position
+                    break
+
+        start_line = _line_of(line_starts, match.start())
+        name = match.group('name')
+        receiver = match.groupdict().get('receiver')
+        if receiver:
+            kind, name = 'method', f'{receiver}.{name}'
+        line_end = content.find('\n', match.start())
+        signature = content[match.start():line_end if line_end >= 0 else len(content)].strip()
+        found.append((start_line, _line_of(line_starts, end_position) + 1, kind, name, signature.rstrip('{').strip()))
+    return _nest(found)
+
+
+def _line_of(line_starts: List[int], position: int) -> int:
+    """0-based line of a character offset"""
+    low, high = 0, len(line_starts)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if line_starts[middle] <= position:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def _nest(found: List[Tuple[int, int, str, str, str]]) -> List[Dict]:
+    """Symbols from (start line, end line, kind, name, signature), qualified by the definitions around them"""
+    symbols = []
+    enclosing: List[Dict] = []
+    for start, end, kind, name, signature in sorted(found, key=lambda item: (item[0], -item[1])):
+        if symbols and symbols[-1]['start_line'] == start + 1:
+            # Two patterns matched the same definition
+            continue
+        while enclosing and enclosing[-1]['end_line'] < start + 1:
+            enclosing.pop()
+        parent = enclosing[-1] if enclosing else None
+        if kind == 'method' and '.' not in name and (parent is None or parent['kind'] not in ('class', 'type')):
+            # A method-shaped line outside a class is a call or an object literal member
+            continue
+        if kind == 'function' and parent is not None and parent['kind'] in ('class', 'type'):
+            kind = 'method'
+        if '.' in name:
+            # Go methods are declared outside their type; the receiver already qualifies them
+            qualified_name, name = name, name.rsplit('.', 1)[1]
+        else:
+            qualified_name = f"{parent['qualified_name']}.{name}" if parent else name
+        symbol = {
+            'name': name,
+            'qualified_name': qualified_name,
+            'kind': kind,
+            'signature': signature[:SIGNATURE_CHARS],
+            'start_line': start + 1,
+            'end_line': max(end, start + 1),
+        }
+        symbols.append(symbol)
+        enclosing.append(symbol)
+    return symbols
+
+
+def _extract_batch(items: List[Tuple[Optional[str], str]]) -> List[List[Dict]]:
+    """Process pool entry point"""
+    return [extract_symbols(language, content) for language, content in items]
+
+
+class SymbolExtractor:
+    """extract_symbols over many files, in a process pool once there is enough source to parse"""
+
+    def __init__(self, workers: Optional[int] = None, parallel_min_bytes: int = 2 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_bytes = parallel_min_bytes
+
+    def extract_many(self, items: List[Tuple[Optional[str], str]]) -> List[List[Dict]]:
+        """Symbols for each (language, content) pair, in order"""
+        # Files in unknown languages are skipped without parsing, so they weigh nothing
+        sizes = [len(content) if language else 0 for language, content in items]
+        if self.workers < 2 or sum(sizes) < self.parallel_min_bytes:
+            return _extract_batch(items)
+        return map_batched(_extract_batch, items, sizes, self.workers)
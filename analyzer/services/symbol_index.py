@@ -0,0 +1,110 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import CodeSymbol, FileBlob, Repository, RepositoryFile
+from .dependency_service import language_of
+from .persistence_service import BulkWriter
+from .symbol_extraction import SymbolExtractor, extract_symbols
+
+SYMBOL_FIELDS = ('name', 'qualified_name', 'kind', 'signature', 'start_line', 'end_line')
+
+
+def symbol_extractor() -> SymbolExtractor:
+    return SymbolExtractor(
+        workers=getattr(settings, 'SYMBOL_WORKERS', None),
+        parallel_min_bytes=getattr(settings, 'SYMBOL_PARALLEL_MIN_BYTES', 2 * 1024 * 1024)
+    )
+
+
+class SymbolIndex:
+    @staticmethod
+    def index_files(repository: Repository, files: Iterable[Tuple[int, str, str]]):
+        """Re-extract the symbols of the given (file_id, file_path, content) triples"""
+        files = list(files)
+        if not files:
+            return
+
+        parsed = symbol_extractor().extract_many([(language_of(path), content) for _, path, content in files])
+        with transaction.atomic():
+            CodeSymbol.objects.filter(file_id__in=[file_id for file_id, _, _ in files]).delete()
+
+            with BulkWriter(CodeSymbol) as writer:
+                for (file_id, _, _), symbols in zip(files, parsed):
+                    for symbol in symbols:
+                        writer.create(CodeSymbol(
+                            repository=repository,
+                            file_id=file_id,
+                            name=symbol['name'][:200],
+                            qualified_name=symbol['qualified_name'][:500],
+                            kind=symbol['kind'],
+                            signature=symbol['signature'],
+                            start_line=symbol['start_line'],
+                            end_line=symbol['end_line']
+                        ))
+
+    @staticmethod
+    def rebuild(repository: Repository):
+        """Extract the symbols of every stored file of a repository"""
+        CodeSymbol.objects.filter(repository=repository).delete()
+        files = RepositoryFile.objects.filter(repository=repository, blob__isnull=False)
+        batch = []
+        for file_id, file_path, data in files.values_list('id', 'file_path', 'blob__data').iterator():
+            if language_of(file_path):
+                batch.append((file_id, file_path, FileBlob.decompress(data)))
+            # Large batches, so that the process pool has enough to share out
+            if len(batch) >= 1000:
+                SymbolIndex.index_files(repository, batch)
+                batch = []
+        SymbolIndex.index_files(repository, batch)
+
+    @staticmethod
+    def is_indexed(repository: Repository) -> bool:
+        return CodeSymbol.objects.filter(repository=repository).exists()
+
+    @staticmethod
+    def for_file(file_id: int) -> List[Dict]:
+        """Stored symbols of a file, in file order"""
+        return list(CodeSymbol.objects.filter(file_id=file_id).order_by('start_line', '-end_line').values(*SYMBOL_FIELDS))
+
+    @staticmethod
+    def for_content(file_path: str, content: str) -> List[Dict]:
+        """Symbols of a text, from any ingested file holding it, else extracted here"""
+        language = language_of(file_path)
+        if language is None:
+            return []
+        stored = RepositoryFile.objects.filter(blob_id=FileBlob.hash_text(content)).values_list(
+            'id', 'file_path', 'repository_id'
+        )
+        for file_id, path, repository_id in stored:
+            # Repositories ingested before the symbol table existed have no rows for any file
+            if language_of(path) == language and CodeSymbol.objects.filter(repository_id=repository_id).exists():
+                return SymbolIndex.for_file(file_id)
+        return extract_symbols(language, content)
+
+    @staticmethod
+    def lookup(repository: Repository, name: str, kind: Optional[str] = None, prefix: bool = False,
+               limit: int = 50) -> List[Dict]:
+        """Definitions named name (or, with a dot, with that qualified name), case-sensitively
+
+        With prefix, every definition whose name starts with name.
+        """
+        field = 'qualified_name' if '.' in name else 'name'
+        symbols = CodeSymbol.objects.filter(repository=repository)
+        if prefix:
+            # Range scan instead of LIKE so SQLite can use the (repository, name) index
+            upper = name[:-1] + chr(ord(name[-1]) + 1)
+            symbols = symbols.filter(**{f'{field}__gte': name, f'{field}__lt': upper})
+        else:
+            symbols = symbols.filter(**{field: name})
+        if kind:
+            symbols = symbols.filter(kind=kind)
+
+        rows = symbols.order_by('name', 'file__file_path', 'start_line').values(
+            'file_id', 'file__file_path', *SYMBOL_FIELDS
+        )[:limit]
+        return [
+            {'file_id': row.pop('file_id'), 'file_path': row.pop('file__file_path'), **row}
+            for row in rows
+        ]
@@ -0,0 +1,188 @@
+import math
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from .worker_pool import map_batched
+
+# Deliberately free of Django imports: worker processes import this module on their own
+
+SEARCH_MODES = ('substring', 'word', 'regex')
+TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+CONTEXT_LINES = 2
+CONTEXT_MATCHES = 3  # Matches per file that carry surrounding lines
+
+
+class SearchQueryError(ValueError):
+    """Raised for queries that cannot be compiled"""
+
+
+def parse_terms(query: str, mode: str) -> List[str]:
+    """Search terms: the whole query for regex mode, else whitespace separated words and "quoted phrases\""""
+    if mode == 'regex':
+        return [query] if query.strip() else []
+    return [quoted or bare for quoted, bare in TERM_RE.findall(query)]
+
+
+def compile_terms(terms: List[str], mode: str, case_sensitive: bool = False) -> List[Tuple[str, int]]:
+    """(pattern, flags) per term, validated here so bad regexes fail before any work is scheduled"""
+    if mode not in SEARCH_MODES:
+        raise SearchQueryError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+    flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+
+    specs = []
+    for term in terms:
+        if mode == 'regex':
+            pattern = term
+        elif mode == 'word':
+            pattern = rf'(?<!\w){re.escape(term)}(?!\w)'
+        else:
+            pattern = re.escape(term)
+        try:
+            compiled = re.compile(pattern, flags)
+        except re.error as e:
+            raise SearchQueryError(f'Invalid regular expression: {e}') from e
+        if compiled.match(''):
+            raise SearchQueryError(f'Pattern matches the empty string: {term}')
+        specs.append((pattern, flags))
+    return specs
+
+
+def scan_file(file_path: str, content: str, specs: List[Tuple[str, int]], max_matches: int) -> Optional[Dict]:
+    """Run every term's pattern over one whole file and map the hits back to lines
+
+    Returns None when no term matches, else per-term counts and the first max_matches matching lines.
+    """
+    patterns = [re.compile(pattern, flags) for pattern, flags in specs]  # re caches compiled patterns
+    term_counts = []
+    hit_offsets = set()
+    for pattern in patterns:
+        count = 0
+        for match in pattern.finditer(content):
+            count += 1
+            hit_offsets.add(match.start())
+        term_counts.append(count)
+    if not any(term_counts):
+        return None
+
+    # Line starts follow str.splitlines, so line numbers agree with previews and the search index
+    lines = content.splitlines(keepends=True)
+    starts = []
+    position = 0
+    for line in lines:
+        starts.append(position)
+        position += len(line)
+
+    hit_lines = sorted({bisect_right(starts, offset) - 1 for offset in hit_offsets})
+    matches = []
+    for i in hit_lines[:max_matches]:
+        match = {'line': i + 1, 'text': lines[i].rstrip('\r\n')[:500]}
+        if len(matches) < CONTEXT_MATCHES:
+            first, last = max(0, i - CONTEXT_LINES), min(len(lines), i + CONTEXT_LINES + 1)
+            match['context'] = "\n".join(f"{j + 1:4d}: {lines[j].rstrip(chr(13) + chr(10))}" for j in range(first, last))
+        matches.append(match)
+
+    return {
+        'file_path': file_path,
+        'term_counts': term_counts,
+        'match_count': sum(term_counts),
+        'matching_lines': len(hit_lines),
+        'matches': matches,
+    }
+
+
+def _scan_batch(specs: List[Tuple[str, int]], max_matches: int, items: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+    """Process pool entry point; None for files without a match"""
+    return [scan_file(path, content, specs, max_matches) for path, content in items]
+
+
+class TextSearchEngine:
+    """Literal, whole-word and regex search over file contents, ranked with BM25"""
+
+    def __init__(self, workers: Optional[int] = None, parallel_min_bytes: int = 4 * 1024 * 1024,
+                 max_matches_per_file: int = 50):
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_bytes = parallel_min_bytes
+        self.max_matches_per_file = max_matches_per_file
+
+    def search(self, files: Dict[str, str], query: str, mode: str = 'substring', case_sensitive: bool = False,
+               require_all: bool = True, page: int = 1, page_size: int = 20) -> Dict:
+        """Ranked, paginated matches; raises SearchQueryError for unusable queries
+
+        With several terms, require_all keeps only files containing every term.
+        """
+        terms = parse_terms(query, mode)
+        if not terms:
+            raise SearchQueryError('Search query is empty')
+        specs = compile_terms(terms, mode, case_sensitive)
+
+        scanned = self._scan(list(files.items()), specs)
+        if require_all:
+            scanned = [result for result in scanned if all(result['term_counts'])]
+
+        ranked = self._rank(scanned, files, len(terms))
+        start = (page - 1) * page_size
+        return {
+            'query': query,
+            'mode': mode,
+            'terms': terms,
+            'files_scanned': len(files),
+            'total_files': len(ranked),
+            'total_matches': sum(result['match_count'] for result in ranked),
+            'page': page,
+            'page_size': page_size,
+            'results': ranked[start:start + page_size],
+        }
+
+    def _scan(self, items: List[Tuple[str, str]], specs: List[Tuple[str, int]]) -> List[Dict]:
+        sizes = [len(content) for _, content in items]
+        if self.workers < 2 or sum(sizes) < self.parallel_min_bytes:
+            results = _scan_batch(specs, self.max_matches_per_file, items)
+        else:
+            results = map_batched(_scan_batch, items, sizes, self.workers, specs, self.max_matches_per_file)
+        return [result for result in results if result]
+
+    @staticmethod
+    def _rank(scanned: List[Dict], files: Dict[str, str], term_total: int) -> List[Dict]:
+        """Order results by BM25 over match counts, with file length in characters as document length"""
+        if not scanned:
+            return []
+        file_count = len(files)
+        average_length = (sum(len(content) for content in files.values()) / file_count) or 1
+
+        document_frequency = [0] * term_total
+        for result in scanned:
+            for i, count in enumerate(result['term_counts']):
+                if count:
+                    document_frequency[i] += 1
+        idf = [
+            math.log(1 + (file_count - frequency + 0.5) / (frequency + 0.5)) for frequency in document_frequency
+        ]
+
+        for result in scanned:
+            length_norm = 1 - BM25_B + BM25_B * len(files[result['file_path']]) / average_length
+            result['score'] = round(sum(
+                idf[i] * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+                for i, count in enumerate(result['term_counts']) if count
+            ), 4)
+        return sorted(scanned, key=lambda result: (-result['score'], result['file_path']))
+
+
+def render_results(results: Dict, limit_files: int = 10) -> str:
+    """Markdown summary of ranked results, as returned when no LLM is available"""
+    blocks = []
+    for result in results['results'][:limit_files]:
+        shown = [match for match in result['matches'] if 'context' in match]
+        block = [f"## {result['file_path']}",
+                 f"Found {result['match_count']} matches on {result['matching_lines']} lines:"]
+        for match in shown:
+            block.append(f"**Line {match['line']}**:\n```\n{match['context']}\n```")
+        if result['matching_lines'] > len(shown):
+            block.append(f"... and {result['matching_lines'] - len(shown)} more matching lines")
+        blocks.append("\n".join(block))
+    return "\n\n".join(blocks)
+
@@ -0,0 +1,155 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rough stand-ins for BPE tokens in code: words cut every 6 letters, numbers in groups of
+# three, a line break with its indentation, single punctuation marks; spaces merge into the
+# next token. That is about 3.2 characters per token on Python source, on the high side of
+# what BPE tokenizers produce, and per-model calibration corrects the rest.
+TOKEN_PIECE_RE = re.compile(r'[A-Za-z]{1,6}|\d{1,3}|\n[ \t]*|[^\sA-Za-z\d]')
+
+CALIBRATION_MIN_TOKENS = 200  # Prompts shorter than this are too noisy to calibrate on
+CALIBRATION_WEIGHT = 0.2  # Weight of a new sample in the moving average
+CALIBRATION_BOUNDS = (0.5, 1.5)
+SAFETY_MARGIN = 0.05  # Share of a budget kept free for estimation error
+
+
+def estimate_tokens(text: str) -> int:
+    """Uncalibrated token estimate"""
+    return len(TOKEN_PIECE_RE.findall(text))
+
+
+class TokenCounter:
+    """Token estimates calibrated per model against the prompt_eval_count Ollama reports"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.factors: Dict[str, float] = {}
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        return int(estimate_tokens(text) * self.factors.get(model, 1.0)) + 1
+
+    def calibrate(self, model: str, prompt: str, prompt_tokens: Optional[int]):
+        """Fold the real token count of a prompt into the model's correction factor"""
+        estimate = estimate_tokens(prompt)
+        if not prompt_tokens or estimate < CALIBRATION_MIN_TOKENS:
+            return
+        # A prompt prefix Ollama still had cached may be reported short; the bounds absorb that
+        ratio = min(max(prompt_tokens / estimate, CALIBRATION_BOUNDS[0]), CALIBRATION_BOUNDS[1])
+        with self._lock:
+            current = self.factors.get(model, 1.0)
+            self.factors[model] = current + CALIBRATION_WEIGHT * (ratio - current)
+
+
+class TokenUsage:
+    """Prompt and completion tokens of a set of generations, as reported by Ollama"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+        }
+
+
+def usable(budget: int) -> int:
+    """A token budget less the safety margin"""
+    return max(0, int(budget * (1 - SAFETY_MARGIN)))
+
+
+def fit_text(text: str, max_tokens: int, count: Callable[[str], int]) -> str:
+    """The longest prefix of text, cut at a line break where possible, that fits in max_tokens"""
+    if max_tokens <= 0:
+        return ''
+    total = count(text)
+    if total <= max_tokens:
+        return text
+
+    # Scale by the token density, then step back until the estimate agrees
+    end = int(len(text) * max_tokens / total)
+    while end > 0:
+        cut = text.rfind('\n', 0, end)
+        prefix = text[:cut] if cut > end // 2 else text[:end]
+        if count(prefix) <= max_tokens:
+            return prefix
+        end = int(end * 0.9)
+    return ''
+
+
+def pack_texts(texts: List[str], max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    """Cut texts so that together they fit in max_tokens, sharing the budget evenly
+
+    Texts smaller than their share are kept whole and what they leave over goes to the others.
+    """
+    sizes = [count(text) for text in texts]
+    result: List[Optional[str]] = [None] * len(texts)
+    remaining = max_tokens
+    pending: List[Tuple[int, int]] = sorted(enumerate(sizes), key=lambda item: item[1])
+    while pending:
+        share = remaining // len(pending)
+        index, size = pending[0]
+        if size > share:
+            # Every text left is larger than its share: cut each one to that share
+            for index, _ in pending:
+                result[index] = fit_text(texts[index], share, count)
+            break
+        result[index] = texts[index]
+        remaining -= size
+        pending.pop(0)
+    return result
+
+
+def group_by_tokens(texts: List[str], max_tokens: int, count: Callable[[str], int]) -> List[List[str]]:
+    """Consecutive texts gathered into groups of at most max_tokens (one separator token each)
+
+    A text larger than max_tokens makes a group of its own.
+    """
+    groups: List[List[str]] = [[]]
+    size = 0
+    for text in texts:
+        tokens = count(text) + 1
+        if groups[-1] and size + tokens > max_tokens:
+            groups.append([])
+            size = 0
+        groups[-1].append(text)
+        size += tokens
+    return groups if groups[0] else []
+
+
+def reduce_texts(texts: List[str], max_tokens: int, count: Callable[[str], int],
+                 condense: Callable[[str], Optional[str]], concurrency: int = 1) -> List[str]:
+    """Condense groups of consecutive texts, concurrently, until together they fit in max_tokens
+
+    condense gets a group joined by blank lines and returns one shorter text, or None when it
+    failed; the group is then cut to half its size instead.
+    """
+    def step(group: List[str]) -> str:
+        joined = '\n\n'.join(group)
+        condensed = condense(joined)
+        if condensed is None:
+            # Half of what the group held, so that the next round can pair it up
+            return fit_text(joined, count(joined) // 2, count)
+        return condensed
+
+    while len(texts) > 1 and sum(count(text) + 1 for text in texts) > max_tokens:
+        groups = group_by_tokens(texts, max_tokens, count)
+        if len(groups) == len(texts):
+            # Every text is too large to pair up; trim them instead of looping forever
+            return pack_texts(texts, max_tokens - len(texts), count)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            texts = list(executor.map(step, groups))
+    return texts
@@ -0,0 +1,53 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+# Deliberately free of Django imports: worker processes import this module on their own
+
+BATCHES_PER_WORKER = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by searches and symbol extraction in this process, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver/spawn instead of fork: forking a threaded server can copy held locks
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def balanced_batches(sizes: Sequence[int], count: int) -> List[List[int]]:
+    """Indexes of sizes split into at most count non-empty batches of similar total size, largest first"""
+    batches: List[List[int]] = [[] for _ in range(count)]
+    totals = [0] * count
+    for index in sorted(range(len(sizes)), key=lambda index: -sizes[index]):
+        smallest = totals.index(min(totals))
+        batches[smallest].append(index)
+        totals[smallest] += sizes[index]
+    return [batch for batch in batches if batch]
+
+
+def map_batched(func: Callable, items: Sequence, sizes: Sequence[int], workers: int, *args) -> List:
+    """func(*args, batch) over size-balanced batches of items in the shared pool
+
+    func must be a module-level function returning one result per item of its batch; the results
+    come back in the order of items. Several batches per worker, so one huge item does not
+    serialize the rest.
+    """
+    pool = get_pool(workers)
+    futures = [
+        (batch, pool.submit(func, *args, [items[index] for index in batch]))
+        for batch in balanced_batches(sizes, workers * BATCHES_PER_WORKER)
+    ]
+    results: List = [None] * len(items)
+    for batch, future in futures:
+        for index, result in zip(batch, future.result()):
+            results[index] = result
+    return results
@@ -1,3 +1,633 @@
-from django.test import TestCase
+import hashlib
+import json
+import posixpath
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .models import AnalysisCacheEntry, AnalysisCacheUsage, FileBlob, Repository, RepositoryFile
+from .services.cache_service import AnalysisCache
+from .services.dependency_service import DependencyGraph, PathResolver
+from .services.file_listing_service import CursorError, FileListing, decode_cursor, encode_cursor, under_prefix
+from .services.github_service import GitHubService
+from .services.ingestion_service import BatchIngestion, IngestionService
+from .services.llm_service import LLMStreamError, OllamaLLMService
+from .services.memory_service import MemoryService
+from .services.search_index import SearchIndex
+from .services.symbol_extraction import extract_symbols
+from .services.text_search import SearchQueryError, TextSearchEngine, compile_terms, scan_file
+from .views import _search_inputs, _search_options
+
+
+class CompileTermsTests(SimpleTestCase):
+    def test_escapes_literal_terms(self):
+        specs = compile_terms(['a.b'], 'substring')
+        self.assertIsNotNone(scan_file('f.py', 'x = a.b', specs, 10))
+        self.assertIsNone(scan_file('f.py', 'x = axb', specs, 10))
+
+    def test_word_mode_matches_whole_words_only(self):
+        specs = compile_terms(['cache'], 'word')
+        self.assertEqual(scan_file('f.py', 'cache = cached_cache', specs, 10)['match_count'], 1)
+
+    def test_rejects_patterns_matching_the_empty_string(self):
+        for pattern in ('a*', '^', '(x)?'):
+            with self.assertRaises(SearchQueryError):
+                compile_terms([pattern], 'regex')
+
+    def test_rejects_invalid_regexes(self):
+        with self.assertRaisesRegex(SearchQueryError, 'Invalid regular expression'):
+            compile_terms(['def (foo'], 'regex')
+
+    def test_rejects_unknown_modes(self):
+        with self.assertRaises(SearchQueryError):
+            compile_terms(['x'], 'fuzzy')
+
+
+class ScanFileTests(SimpleTestCase):
+    def test_maps_matches_to_lines(self):
+        content = 'one\r\ntwo token\nthree\n\ntoken token five\n'
+        result = scan_file('f.py', content, compile_terms(['token'], 'substring'), 10)
+        self.assertEqual([match['line'] for match in result['matches']], [2, 5])
+        self.assertEqual(result['matches'][0]['text'], 'two token')
+        self.assertIn('   1: one', result['matches'][0]['context'])
+
+    def test_counts_every_match_per_term(self):
+        content = 'alpha beta\nalpha alpha\n'
+        result = scan_file('f.py', content, compile_terms(['alpha', 'beta', 'gamma'], 'word'), 10)
+        self.assertEqual(result['term_counts'], [3, 1, 0])
+        self.assertEqual(result['match_count'], 4)
+        self.assertEqual(result['matching_lines'], 2)
+
+    def test_caps_listed_lines_but_not_counts(self):
+        content = 'hit\n' * 30
+        result = scan_file('f.py', content, compile_terms(['hit'], 'substring'), 5)
+        self.assertEqual(len(result['matches']), 5)
+        self.assertEqual(result['match_count'], 30)
+        self.assertEqual(result['matching_lines'], 30)
+
+    def test_match_spanning_lines_counts_on_its_first_line(self):
+        result = scan_file('f.py', 'a\nfoo\nbar\n', compile_terms([r'foo\nbar'], 'regex'), 10)
+        self.assertEqual([match['line'] for match in result['matches']], [2])
+
+    def test_no_match_returns_none(self):
+        self.assertIsNone(scan_file('f.py', 'nothing here', compile_terms(['token'], 'substring'), 10))
+
+
+class TextSearchEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = TextSearchEngine(workers=1)
+
+    def test_ranks_by_bm25(self):
+        filler = 'x = 1\n' * 50
+        files = {
+            'many.py': 'token\n' * 5 + filler,
+            'once.py': 'token\n' + filler,
+            'short.py': 'token\n',
+            'none.py': filler,
+        }
+        results = self.engine.search(files, 'token')['results']
+        self.assertEqual(len(results), 3)
+        scores = {result['file_path']: result['score'] for result in results}
+        # More matches beat fewer at equal length, and a shorter file beats a longer one at equal counts
+        self.assertGreater(scores['many.py'], scores['once.py'])
+        self.assertGreater(scores['short.py'], scores['once.py'])
+        self.assertEqual([result['score'] for result in results], sorted(scores.values(), reverse=True))
+
+    def test_rare_terms_weigh_more(self):
+        files = {'common.py': 'common\n', 'rare.py': 'rare\n', 'a.py': 'common\n', 'b.py': 'common\n'}
+        results = self.engine.search(files, 'common rare', require_all=False)['results']
+        self.assertEqual(results[0]['file_path'], 'rare.py')
+
+    def test_require_all_keeps_files_with_every_term(self):
+        files = {'both.py': 'alpha beta', 'one.py': 'alpha'}
+        self.assertEqual(
+            [result['file_path'] for result in self.engine.search(files, 'alpha beta')['results']], ['both.py']
+        )
+        self.assertEqual(self.engine.search(files, 'alpha beta', require_all=False)['total_files'], 2)
+
+    def test_paginates_ranked_results(self):
+        files = {f'f{i:02d}.py': 'token\n' * (i + 1) for i in range(25)}
+        first = self.engine.search(files, 'token', page=1, page_size=10)
+        third = self.engine.search(files, 'token', page=3, page_size=10)
+        beyond = self.engine.search(files, 'token', page=4, page_size=10)
+        self.assertEqual(first['total_files'], 25)
+        self.assertEqual(first['total_matches'], sum(range(1, 26)))
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(len(third['results']), 5)
+        self.assertEqual(beyond['results'], [])
+
+        pages = [self.engine.search(files, 'token', page=page, page_size=10)['results'] for page in (1, 2, 3)]
+        paths = [result['file_path'] for page in pages for result in page]
+        everything = self.engine.search(files, 'token', page_size=25)['results']
+        self.assertEqual(paths, [result['file_path'] for result in everything])
+
+    def test_empty_query_is_rejected(self):
+        with self.assertRaises(SearchQueryError):
+            self.engine.search({'a.py': 'x'}, '   ')
+
+    def test_search_options_validate_paging(self):
+        self.assertEqual(_search_options({'page': '2', 'page_size': '5'})['page'], 2)
+        for data in ({'page': 0}, {'page_size': 0}, {'page_size': 10 ** 6}, {'page': 'two'}):
+            with self.assertRaises(SearchQueryError):
+                _search_options(data)
+
+
+class ExtractSymbolsTests(SimpleTestCase):
+    @staticmethod
+    def _spans(symbols):
+        return [
+            (symbol['qualified_name'], symbol['kind'], symbol['start_line'], symbol['end_line']) for symbol in symbols
+        ]
+
+    def test_python_is_parsed_with_ast(self):
+        content = (
+            'import os\n'
+            '\n'
+            '@dataclass\n'
+            'class Point(Base, metaclass=Meta):\n'
+            '    def norm(self, scale: float = 1.0) -> float:\n'
+            '        def helper():\n'
+            '            return 1\n'
+            '        return helper()\n'
+            '\n'
+            'if os.name:\n'
+            '    async def fetch(url):\n'
+            '        pass\n'
+        )
+        symbols = extract_symbols('python', content)
+        self.assertEqual(self._spans(symbols), [
+            ('Point', 'class', 3, 8),
+            ('Point.norm', 'method', 5, 8),
+            ('Point.norm.helper', 'function', 6, 7),
+            ('fetch', 'function', 11, 12),
+        ])
+        self.assertEqual(symbols[0]['signature'], 'class Point(Base, metaclass=Meta)')
+        self.assertEqual(symbols[1]['signature'], 'def norm(self, scale: float=1.0) -> float')
+        self.assertEqual(symbols[3]['signature'], 'async def fetch(url)')
+
+    def test_unparseable_python_falls_back_to_indentation(self):
+        content = (
+            'class Legacy:\n'
+            '    def run(self):\n'
+            '        print "python 2"\n'
+            '\n'
+            '    def stop(self):\n'
+            '        pass\n'
+            '\n'
+            'def main():\n'
+            '    Legacy().run()\n'
+        )
+        self.assertEqual(self._spans(extract_symbols('python', content)), [
+            ('Legacy', 'class', 1, 6),
+            ('Legacy.run', 'method', 2, 3),
+            ('Legacy.stop', 'method', 5, 6),
+            ('main', 'function', 8, 9),
+        ])
+
+    def test_javascript_braces_in_strings_and_comments_are_ignored(self):
+        content = (
+            'export class Parser {\n'
+            '  parse(text) {\n'
+            '    const open = "{";\n'
+            "    const close = '}}';\n"
+            '    // a stray } in a comment\n'
+            '    return `${open}}`;\n'
+            '  }\n'
+            '  /* function fake() { */\n'
+            '}\n'
+            '\n'
+            'const render = (items) => {\n'
+            '  return items.map((item) => item.name);\n'
+            '};\n'
+        )
+        self.assertEqual(self._spans(extract_symbols('javascript', content)), [
+            ('Parser', 'class', 1, 9),
+            ('Parser.parse', 'method', 2, 7),
+            ('render', 'function', 11, 13),
+        ])
+
+    def test_go_methods_are_qualified_by_their_receiver(self):
+        content = (
+            'package store\n'
+            '\n'
+            'type Cache struct {\n'
+            '\titems map[string]int\n'
+            '}\n'
+            '\n'
+            'func (c *Cache) Get(key string) int {\n'
+            '\treturn c.items[key]\n'
+            '}\n'
+            '\n'
+            'func New() *Cache {\n'
+            '\treturn &Cache{items: map[string]int{}}\n'
+            '}\n'
+        )
+        symbols = extract_symbols('go', content)
+        self.assertEqual(self._spans(symbols), [
+            ('Cache', 'type', 3, 5),
+            ('Cache.Get', 'method', 7, 9),
+            ('New', 'function', 11, 13),
+        ])
+        self.assertEqual(symbols[1]['name'], 'Get')
+
+    def test_unknown_languages_have_no_symbols(self):
+        self.assertEqual(extract_symbols(None, 'def f():\n    pass\n'), [])
+
+
+@override_settings(ANALYSIS_CACHE_MAX_BYTES=100)
+class AnalysisCacheTests(TestCase):
+    def _total(self):
+        return AnalysisCacheUsage.objects.get(pk=1).total_bytes
+
+    def test_running_total_follows_puts(self):
+        AnalysisCache.put('a', 'm', 'x' * 30)
+        AnalysisCache.put('b', 'm', 'x' * 20)
+        AnalysisCache.put('a', 'm', 'x' * 10)
+        self.assertEqual(self._total(), 30)
+
+    def test_puts_under_the_limit_do_not_evict(self):
+        with mock.patch.object(AnalysisCache, 'evict') as evict:
+            for key in 'abcde':
+                AnalysisCache.put(key, 'm', 'x' * 20)
+            evict.assert_not_called()
+            AnalysisCache.put('f', 'm', 'x' * 20)
+            evict.assert_called_once_with(100)
+
+    def test_eviction_drops_least_recently_used_below_the_limit(self):
+        for key in 'abcde':
+            AnalysisCache.put(key, 'm', 'x' * 20)
+        AnalysisCache.get('a')
+        AnalysisCache.put('f', 'm', 'x' * 20)
+
+        self.assertEqual(sorted(AnalysisCacheEntry.objects.values_list('key', flat=True)), ['a', 'd', 'e', 'f'])
+        self.assertEqual(self._total(), 80)
+
+    def test_eviction_corrects_a_drifted_total(self):
+        AnalysisCache.put('a', 'm', 'x' * 20)
+        AnalysisCacheUsage.objects.update(total_bytes=500)
+        AnalysisCache.put('b', 'm', 'x' * 20)
+        self.assertEqual(AnalysisCacheEntry.objects.count(), 2)
+        self.assertEqual(self._total(), 40)
+
+
+class PathResolverTests(SimpleTestCase):
+    resolver = PathResolver([
+        'setup.py',
+        'manage.py',
+        'helpers.py',
+        'src/shop/__init__.py',
+        'src/shop/cart.py',
+        'src/shop/models/__init__.py',
+        'src/shop/models/order.py',
+        'scripts/run.py',
+        'scripts/helpers.py',
+    ])
+
+    def test_absolute_imports_start_at_package_roots(self):
+        self.assertEqual(self.resolver.python_roots, {'', 'src'})
+        self.assertEqual(self.resolver.resolve('shop.cart', 'src/shop/models/order.py'), ['src/shop/cart.py'])
+        self.assertEqual(self.resolver.resolve('shop.models', 'setup.py'), ['src/shop/models/__init__.py'])
+        # A name that only matches the tail of a path is not an absolute import
+        self.assertEqual(self.resolver.resolve('models.order', 'src/shop/cart.py'), [])
+
+    def test_relative_imports_climb_one_package_per_dot(self):
+        self.assertEqual(self.resolver.resolve('.cart', 'src/shop/__init__.py'), ['src/shop/cart.py'])
+        self.assertEqual(self.resolver.resolve('..cart', 'src/shop/models/order.py'), ['src/shop/cart.py'])
+        self.assertEqual(self.resolver.resolve('.', 'src/shop/models/order.py'), ['src/shop/models/__init__.py'])
+        self.assertEqual(self.resolver.resolve('.missing', 'src/shop/cart.py'), [])
+
+    def test_scripts_import_their_own_directory_first(self):
+        self.assertEqual(self.resolver.resolve('helpers', 'scripts/run.py'), ['scripts/helpers.py'])
+        self.assertEqual(self.resolver.resolve('helpers', 'manage.py'), ['helpers.py'])
+        self.assertEqual(self.resolver.resolve('helpers', 'src/shop/cart.py'), ['helpers.py'])
+
+
+class FileRelationshipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.repository = Repository.objects.create(
+            github_url='https://github.com/acme/shop', owner='acme', repo_name='shop'
+        )
+        for path, content in {
+            'manage.py': 'import settings\n',
+            'settings.py': 'DEBUG = True\n',
+            'README.md': '# Shop\n',
+            'shop/cart.py': 'CART = []\n',
+            'shop/orders/order.py': 'from ..cart import CART\n',
+        }.items():
+            repo_file = RepositoryFile(repository=cls.repository, file_path=path, file_type=path.rsplit('.', 1)[1])
+            repo_file.content = content
+            repo_file.save()
+        DependencyGraph.rebuild(cls.repository)
+
+    def _related(self, path):
+        return {
+            related['file_path']: related['relationship']
+            for related in MemoryService.get_file_relationships(self.repository, path)
+        }
+
+    def test_root_files_are_siblings_of_each_other_only(self):
+        self.assertEqual(self._related('manage.py'), {'settings.py': 'imports', 'README.md': 'same_directory'})
+
+    def test_subdirectories_are_not_siblings(self):
+        self.assertEqual(self._related('shop/cart.py'), {'shop/orders/order.py': 'imported_by'})
+        self.assertEqual(
+            list(RepositoryFile.objects.filter(directory='shop').values_list('file_path', flat=True)),
+            ['shop/cart.py'],
+        )
+
+
+class FileListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.repository = Repository.objects.create(
+            github_url='https://github.com/acme/app', owner='acme', repo_name='app'
+        )
+        cls.paths = [
+            'README.md', 'src/a.py', 'src/b.js', 'src/sub/c.py', 'src/\u00e9t\u00e9.py',
+            'src0.py', 'src_x/d.py', 'srcery.py',
+        ]
+        RepositoryFile.objects.bulk_create(
+            RepositoryFile(
+                repository=cls.repository, file_path=path, directory=posixpath.dirname(path),
+                file_type=path.rsplit('.', 1)[1]
+            )
+            for path in cls.paths
+        )
+
+    def test_cursor_round_trip(self):
+        for path in ('src/a.py', 'docs/\u00fcber \U0001f600.md', ''):
+            self.assertEqual(decode_cursor(encode_cursor(path)), path)
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('not base64!', encode_cursor('x')[:-3], 'eyJhZnRlciI6IDF9', 'e30'):
+            with self.assertRaises(CursorError):
+                decode_cursor(cursor)
+
+    def test_pages_cover_every_file_once_in_path_order(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = FileListing.page(self.repository, fields=('id',), cursor=cursor, limit=3)
+            seen.extend(row['id'] for row in rows)
+            pages += 1
+            if cursor is None:
+                break
+        expected = list(RepositoryFile.objects.filter(repository=self.repository).order_by('file_path').values_list(
+            'id', flat=True
+        ))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_last_full_page_has_no_next_cursor(self):
+        rows, cursor = FileListing.page(self.repository, limit=len(self.paths))
+        self.assertEqual(len(rows), len(self.paths))
+        self.assertIsNone(cursor)
+
+    def test_cursor_survives_files_added_before_it(self):
+        rows, cursor = FileListing.page(self.repository, limit=2)
+        RepositoryFile.objects.create(repository=self.repository, file_path='AAA.md', file_type='md')
+        rows, cursor = FileListing.page(self.repository, cursor=cursor, limit=1)
+        self.assertEqual([row['file_path'] for row in rows], ['src/b.js'])
+
+    def test_under_prefix_bounds(self):
+        files = RepositoryFile.objects.filter(repository=self.repository)
+        self.assertEqual(
+            sorted(under_prefix(files, 'src/').values_list('file_path', flat=True)),
+            ['src/a.py', 'src/b.js', 'src/sub/c.py', 'src/\u00e9t\u00e9.py'],
+        )
+        self.assertEqual(
+            sorted(under_prefix(files, 'src').values_list('file_path', flat=True)),
+            sorted(path for path in self.paths if path.startswith('src')),
+        )
+        self.assertEqual(under_prefix(files, 'src/sub/c.py').count(), 1)
+        self.assertEqual(under_prefix(files, 'zzz').count(), 0)
+        self.assertEqual(under_prefix(files, '').count(), len(self.paths))
+
+    def test_tree_level_lists_direct_children_and_directory_counts(self):
+        def level(path):
+            tree = FileListing.tree_level(self.repository, path, fields=['file_path'])
+            return (
+                [(directory['path'], directory['file_count']) for directory in tree['directories']],
+                [file['file_path'] for file in tree['files']],
+            )
+
+        self.assertEqual(level(''), ([('src', 4), ('src_x', 1)], ['README.md', 'src0.py', 'srcery.py']))
+        self.assertEqual(level('src'), ([('src/sub', 1)], ['src/a.py', 'src/b.js', 'src/\u00e9t\u00e9.py']))
+        self.assertEqual(level('src/sub'), ([], ['src/sub/c.py']))
+        self.assertEqual(level('missing'), ([], []))
+
+    def test_page_filters_by_prefix_and_type(self):
+        rows, cursor = FileListing.page(self.repository, fields=('file_path',), file_types=['py'], prefix='src/')
+        self.assertEqual([row['file_path'] for row in rows], ['src/a.py', 'src/sub/c.py', 'src/\u00e9t\u00e9.py'])
+        self.assertIsNone(cursor)
+        self.assertEqual(FileListing.count(self.repository, file_types=['py'], prefix='src/'), 3)
+
+
+class SearchCandidateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.repository = Repository.objects.create(
+            github_url='https://github.com/acme/search', owner='acme', repo_name='search'
+        )
+        contents = {f'pkg/module_{i}.py': f'def compute_{i}(value):\n    return value * {i}\n' for i in range(20)}
+        contents['pkg/haystack.py'] = 'def find():\n    return load_needle_case()\n'
+        contents['pkg/other.py'] = 'NEEDLES = ["a", "b"]\n'
+        files = []
+        for path, content in contents.items():
+            repo_file = RepositoryFile(repository=cls.repository, file_path=path, file_type='py')
+            repo_file.content = content
+            repo_file.save()
+            files.append((repo_file.id, content))
+        SearchIndex.index_files(cls.repository, files)
+        cls.ids = dict(RepositoryFile.objects.filter(repository=cls.repository).values_list('file_path', 'id'))
+
+    def _search(self, query, **options):
+        options = _search_options(options)
+        with mock.patch.object(FileBlob, 'decompress', side_effect=FileBlob.decompress) as decompress:
+            files_content, matches, files_searched = _search_inputs(self.repository, query, options)
+        return matches, decompress.call_count
+
+    def test_substring_search_reads_only_candidate_files(self):
+        # 'eedl' starts mid-identifier, so only the trigram signatures can narrow it down
+        matches, reads = self._search('eedl')
+        self.assertEqual({result['file_path'] for result in matches['results']}, {'pkg/haystack.py', 'pkg/other.py'})
+        self.assertEqual(reads, 2)
+
+        matches, reads = self._search('needle_c', case_sensitive=True)
+        self.assertEqual([result['file_path'] for result in matches['results']], ['pkg/haystack.py'])
+        self.assertEqual(reads, 1)
+
+    def test_substring_candidates_keep_every_possible_match(self):
+        candidates = SearchIndex.substring_candidates(self.repository, ['NEEDLE'])
+        self.assertEqual(candidates, {self.ids['pkg/haystack.py'], self.ids['pkg/other.py']})
+        candidates = SearchIndex.substring_candidates(self.repository, ['NEEDLE'], case_sensitive=True)
+        self.assertIn(self.ids['pkg/other.py'], candidates)
+        self.assertEqual(SearchIndex.substring_candidates(self.repository, ['eedl', 'zzzz'], require_all=False),
+                         {self.ids['pkg/haystack.py'], self.ids['pkg/other.py']})
+
+    def test_terms_without_trigrams_scan_every_file(self):
+        self.assertIsNone(SearchIndex.substring_candidates(self.repository, ['ne']))
+        matches, reads = self._search(r'value \* \d', mode='regex')
+        self.assertEqual(reads, len(self.ids))
+
+
+class GenerateStreamTests(SimpleTestCase):
+    def _stream(self, *lines):
+        response = mock.MagicMock(status_code=200)
+        response.__enter__.return_value = response
+        response.iter_lines.return_value = [json.dumps(line).encode() for line in lines]
+        service = OllamaLLMService('http://ollama.test')
+        with mock.patch.object(service.session, 'post', return_value=response):
+            fragments = []
+            try:
+                for fragment in service.generate_stream('prompt', model='codellama:7b'):
+                    fragments.append(fragment)
+            except LLMStreamError as e:
+                return fragments, e
+            return fragments, None
+
+    def test_yields_fragments_until_done(self):
+        fragments, error = self._stream(
+            {'response': 'Hello'}, {'response': ' world'}, {'done': True, 'eval_count': 2}
+        )
+        self.assertEqual(fragments, ['Hello', ' world'])
+        self.assertIsNone(error)
+
+    def test_stream_ending_without_done_is_an_error(self):
+        fragments, error = self._stream({'response': 'Hello'}, {'response': ' wor'})
+        self.assertEqual(fragments, ['Hello', ' wor'])
+        self.assertIn('stream ended before completion', str(error))
+
+
+class FileBlobReadLinesTests(SimpleTestCase):
+    def _check(self, text):
+        blob = FileBlob.from_text(text)
+        lines = text.splitlines()
+        self.assertEqual(blob.line_count, len(lines))
+        for start, count in ((0, 1), (0, 64), (63, 2), (60, 10), (64, 64), (127, 2), (128, 1),
+                             (190, 20), (len(lines) - 1, 5), (len(lines), 1), (5, 0)):
+            self.assertEqual(blob.read_lines(start, count), lines[start:start + count], (start, count))
+
+    def test_lines_across_index_boundaries_and_at_the_end(self):
+        self._check(''.join(f'line {i} \u00e9\u20ac\n' for i in range(200)))
+
+    def test_last_line_without_newline(self):
+        self._check('\r\n'.join(f'line {i}' for i in range(129)))
+
+    def test_text_shorter_than_one_block(self):
+        self._check('one\ntwo')
+        self.assertEqual(FileBlob.from_text('').read_lines(0, 10), [])
+
+
+class FakeGitHub(GitHubService):
+    """Serves repositories from {repo_name: {path: content}} without network requests"""
+
+    def __init__(self, repositories, listings=None):
+        super().__init__()
+        self.fetch_concurrency = 2
+        self.repositories = repositories
+        self.listings = listings or {}
+
+    def get_repo_info(self, owner, repo):
+        return {'description': '', 'language': 'Python', 'default_branch': 'main'}
+
+    def get_repo_files(self, owner, repo, ref=None):
+        if repo in self.listings:
+            return self.listings[repo]
+        return [
+            {'path': path, 'type': 'blob', 'sha': hashlib.sha1(content.encode()).hexdigest()}
+            for path, content in self.repositories[repo].items()
+        ]
+
+    def fetch_file(self, owner, repo, file_path):
+        return self.fetch_result(file_path, self.repositories[repo][file_path])
+
+
+class IngestionTests(TransactionTestCase):
+    def test_files_mentioning_errors_are_stored(self):
+        github = FakeGitHub({'a': {
+            'errors.py': 'class ParseError(Exception):\n    pass\n',
+            'bad.py': 'Unable to decode file content',
+        }})
+        result = IngestionService(github).ingest('https://github.com/acme/a')
+
+        stored = RepositoryFile.objects.get(repository__repo_name='a', file_path='errors.py')
+        self.assertIn('ParseError', stored.content)
+        self.assertEqual([failure['file_path'] for failure in result['failed_files']], ['bad.py'])
+
+    def test_reingest_rewrites_only_changed_files(self):
+        files = {'a.py': 'A = 1\n', 'b.py': 'B = 1\n', 'c.py': 'C = 1\n'}
+        github = FakeGitHub({'a': files})
+        service = IngestionService(github)
+        service.ingest('https://github.com/acme/a')
+        RepositoryFile.objects.update(analysis='reviewed')
+        before = {row['file_path']: row for row in RepositoryFile.objects.values('id', 'file_path', 'blob_id')}
+
+        files['b.py'] = 'B = 2\n'
+        with mock.patch.object(github, 'fetch_file', wraps=github.fetch_file) as fetch_file:
+            result = service.ingest('https://github.com/acme/a')
+
+        self.assertEqual([call.args[2] for call in fetch_file.call_args_list], ['b.py'])
+        self.assertEqual(result['stats'], {'added': 0, 'updated': 1, 'unchanged': 2, 'removed': 0})
+        after = {row['file_path']: row for row in RepositoryFile.objects.values('id', 'file_path', 'blob_id', 'analysis')}
+        self.assertEqual({path: row['id'] for path, row in after.items()}, {path: row['id'] for path, row in before.items()})
+        for path in ('a.py', 'c.py'):
+            self.assertEqual((after[path]['blob_id'], after[path]['analysis']), (before[path]['blob_id'], 'reviewed'))
+        self.assertEqual(after['b.py']['analysis'], '')
+        self.assertEqual(RepositoryFile.objects.get(file_path='b.py').content, 'B = 2\n')
+        self.assertFalse(FileBlob.objects.filter(hash=before['b.py']['blob_id']).exists())
+
+    def test_shared_blobs_outlive_one_repository(self):
+        shared = 'def shared():\n    return 1\n'
+        github = FakeGitHub({
+            'a': {'shared.py': shared, 'a.py': 'A = 1\n'},
+            'b': {'lib/shared.py': shared},
+        })
+        service = IngestionService(github)
+        service.ingest('https://github.com/acme/a')
+        service.ingest('https://github.com/acme/b')
+        digest = FileBlob.hash_text(shared)
+        self.assertEqual(RepositoryFile.objects.filter(blob_id=digest).count(), 2)
+
+        # Dropping the file from one repository releases its blob only if nothing else refers to it
+        del github.repositories['a']['shared.py']
+        service.ingest('https://github.com/acme/a')
+        self.assertTrue(FileBlob.objects.filter(hash=digest).exists())
+
+        Repository.objects.get(repo_name='a').delete()
+        self.assertEqual(RepositoryFile.objects.get(file_path='lib/shared.py').content, shared)
+
+
+class BatchIngestionTests(TransactionTestCase):
+    def test_one_failing_repository_does_not_abort_the_batch(self):
+        shared = 'def shared():\n    return 1\n'
+        github = FakeGitHub({
+            'a': {'a.py': 'A = 1\n', 'shared.py': shared},
+            'b': {'b.py': 'B = 1\n', 'shared.py': shared},
+            'c': {'c.py': 'C = 1\n'},
+            'd': {'d.py': 'D = 1\n', 'shared.py': shared},
+        }, listings={'c': [{'path': 'c.py'}]})  # Malformed: no type
+        service = IngestionService(github)
+
+        def store(repository, *args):
+            if repository.repo_name == 'b':
+                raise DatabaseError('disk I/O error')
+            return IngestionService._store(repository, *args)
+
+        batch = BatchIngestion(service, 'api', concurrency=2)
+        with mock.patch.object(service, '_store', side_effect=store):
+            result = batch.run([f'https://github.com/acme/{name}' for name in 'abcd'])
+
+        summaries = {summary['github_url'].rsplit('/', 1)[1]: summary for summary in result['repositories']}
+        self.assertEqual(summaries['a']['status'], 'completed')
+        self.assertEqual(summaries['d']['status'], 'completed')
+        self.assertEqual(summaries['b']['status'], 'failed')
+        self.assertEqual(summaries['b']['error'], 'disk I/O error')
+        self.assertEqual(summaries['c']['status'], 'failed')
+        self.assertEqual((result['succeeded'], result['failed']), (2, 2))
+        self.assertEqual(batch.unstored, {})
+        self.assertEqual(
+            sorted(RepositoryFile.objects.filter(repository__repo_name='d').values_list('file_path', flat=True)),
+            ['d.py', 'shared.py'],
+        )
@@ -1,11 +1,30 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/analyze-repository/', views.analyze_repository, name='analyze_repository'),
+    path('api/analyze-repositories/', views.analyze_repositories, name='analyze_repositories'),
+    path('api/analyze-repository-files/', views.analyze_repository_files, name='analyze_repository_files'),
+    path('api/summarize-repository/', views.summarize_repository, name='summarize_repository'),
+    path('api/repository-summary/<int:repository_id>/', views.repository_summary, name='repository_summary'),
     path('api/preview-file/<int:file_id>/', views.preview_file, name='preview_file'),
+    path('api/preview-file/<int:file_id>/lines/', views.preview_file_lines, name='preview_file_lines'),
+    path('api/file-relationships/<int:file_id>/', views.file_relationships, name='file_relationships'),
+    path('api/symbols/<int:repository_id>/', views.find_symbols, name='find_symbols'),
+    path('api/files/<int:repository_id>/', views.list_files, name='list_files'),
+    path('api/file-tree/<int:repository_id>/', views.file_tree, name='file_tree'),
     path('api/analyze-file/', views.analyze_file, name='analyze_file'),
+    path('api/analyze-file/stream/', views.analyze_file_stream, name='analyze_file_stream'),
     path('api/search-code/', views.search_code, name='search_code'),
+    path('api/search-code/stream/', views.search_code_stream, name='search_code_stream'),
     path('api/llm-status/', views.llm_status, name='llm_status'),
+    path('api/jobs/', views.list_jobs, name='list_jobs'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
+    # Same contracts on async views, for ASGI deployments
+    path('api/async/analyze-repository/', async_views.analyze_repository, name='async_analyze_repository'),
+    path('api/async/analyze-file/', async_views.analyze_file, name='async_analyze_file'),
+    path('api/async/search-code/', async_views.search_code, name='async_search_code'),
+    path('api/async/llm-status/', async_views.llm_status, name='async_llm_status'),
 ]
@@ -1,19 +1,67 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from .models import Repository, RepositoryFile, CodeSearch
-from .services.github_service import GitHubService
-from .services.llm_service import FileAnalyzer
+from django.urls import reverse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from .models import Repository, RepositoryFile, CodeSearch, FileBlob, Job
+from .renderers import EventStreamRenderer
+from .services.ingestion_service import IngestionService, IngestionError, INGEST_MODES
+from .services.cache_service import AnalysisCache
+from .services.embedding_service import EmbeddingIndex
+from .services.file_listing_service import (
+    FILE_LIST_DEFAULT_FIELDS, FILE_LIST_FIELDS, CursorError, FileListing
+)
+from .services.job_service import JobService
+from .services.llm_service import FileAnalyzer, LLMStreamInterrupted
 from .services.memory_service import MemoryService
+from .services import metrics
+from .services.search_index import SearchIndex, text_search_engine
+from .services.summary_service import RepositorySummarizer
+from .services.symbol_index import SymbolIndex
+from .services.text_search import SEARCH_MODES, SearchQueryError, compile_terms, parse_terms
 from datetime import datetime
 import json
 
+# Partially matching files handed to the LLM search prompt in addition to exact matches
+SEARCH_CONTEXT_FILES = 20
+# Ranked exact-match files returned per search page
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+# Upper bound on lines returned by one ranged preview request
+PREVIEW_MAX_LINES = 1000
+# Repositories accepted by one batch ingestion request
+BATCH_MAX_REPOSITORIES = 100
+SYMBOL_KINDS = ('class', 'function', 'method', 'type')
+SYMBOL_MAX_LIMIT = 200
+# Files per page of the repository file listing
+FILE_PAGE_SIZE = 500
+FILE_MAX_PAGE_SIZE = 5000
+
 def index(request):
     """Main application page"""
     return render(request, 'analyzer/index.html')
 
+def _flag(value) -> bool:
+    """A boolean request field, which form and query data send as a string"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def _run_in_background(request) -> bool:
+    """Whether the caller asked for a queued job instead of a synchronous result"""
+    return _flag(request.data.get('background', getattr(settings, 'JOBS_BACKGROUND_DEFAULT', False)))
+
+def _job_accepted(job):
+    """202 response pointing the client at the job status endpoint"""
+    return Response({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': reverse('job_status', args=[job.id])
+    }, status=202)
+
 @api_view(['POST'])
 def analyze_repository(request):
     """Load and analyze a GitHub repository"""
@@ -21,78 +69,128 @@ def analyze_repository(request):
     if not github_url:
         return Response({'error': 'GitHub URL required'}, status=400)
     
-    github_service = GitHubService()
-    owner, repo_name = github_service.parse_repo_url(github_url)
+    ingest_mode = request.data.get('ingest_mode') or getattr(settings, 'GITHUB_INGEST_MODE', 'api')
+    if ingest_mode not in INGEST_MODES:
+        return Response({'error': "ingest_mode must be 'api', 'tarball' or 'zipball'"}, status=400)
     
-    if not owner or not repo_name:
-        return Response({'error': 'Invalid GitHub URL format'}, status=400)
+    if _run_in_background(request):
+        job = JobService.enqueue(Job.KIND_INGEST_REPOSITORY, {'github_url': github_url, 'ingest_mode': ingest_mode})
+        return _job_accepted(job)
     
-    # Get repository info
-    repo_info = github_service.get_repo_info(owner, repo_name)
+    try:
+        result = IngestionService().ingest(github_url, ingest_mode)
+    except IngestionError as e:
+        return Response({'error': str(e)}, status=400)
     
-    # Create or get repository
-    repository, created = Repository.objects.get_or_create(
-        github_url=github_url,
-        defaults={
-            'owner': owner, 
-            'repo_name': repo_name,
-            'description': repo_info.get('description', ''),
-            'language': repo_info.get('language', '')
-        }
-    )
+    files = FileListing.all(result['repository']) if _flag(request.data.get('include_files', False)) else None
+    return Response(_ingestion_response(result, files))
+
+@api_view(['POST'])
+def analyze_repositories(request):
+    """Load several GitHub repositories in one batch sharing a single pool of GitHub requests"""
+    github_urls = request.data.get('github_urls')
+    if not isinstance(github_urls, list) or not github_urls or not all(isinstance(url, str) and url for url in github_urls):
+        return Response({'error': 'github_urls must be a non-empty list of GitHub URLs'}, status=400)
+    if len(github_urls) > BATCH_MAX_REPOSITORIES:
+        return Response({'error': f'At most {BATCH_MAX_REPOSITORIES} repositories per batch'}, status=400)
     
-    # Clear existing files if repository was recreated
-    if not created:
-        RepositoryFile.objects.filter(repository=repository).delete()
-    
-    # Get files from GitHub
-    files = github_service.get_repo_files(owner, repo_name)
-    
-    if not files:
-        return Response({'error': 'Unable to fetch repository files. Check if the repository exists and is public.'}, status=400)
-    
-    processed_files = []
-    for file_data in files:
-        if file_data['type'] == 'blob' and github_service.is_text_file(file_data['path']):
-            file_path = file_data['path']
-            content = github_service.get_file_content(owner, repo_name, file_path)
-            
-            if content and len(content.strip()) > 0 and "Error" not in content:
-                file_ext = file_path.split('.')[-1] if '.' in file_path else ''
-                
-                repo_file = RepositoryFile.objects.create(
-                    repository=repository,
-                    file_path=file_path,
-                    file_type=file_ext,
-                    file_size=len(content),
-                    content=content
-                )
-                
-                processed_files.append({
-                    'id': repo_file.id,
-                    'file_path': file_path,
-                    'file_type': file_ext,
-                    'file_size': len(content),
-                    'analyzed': False
-                })
+    ingest_mode = request.data.get('ingest_mode') or getattr(settings, 'GITHUB_INGEST_MODE', 'api')
+    if ingest_mode not in INGEST_MODES:
+        return Response({'error': "ingest_mode must be 'api', 'tarball' or 'zipball'"}, status=400)
     
-    return Response({
+    if _run_in_background(request):
+        job = JobService.enqueue(Job.KIND_INGEST_REPOSITORIES, {'github_urls': github_urls, 'ingest_mode': ingest_mode})
+        return _job_accepted(job)
+    
+    return Response(IngestionService().ingest_many(github_urls, ingest_mode))
+
+def _ingestion_response(result, files=None):
+    """Ingestion summary; without files, where to page through them instead"""
+    repository = result['repository']
+    response = {
         'repository_id': repository.id,
         'repository_info': {
-            'owner': owner,
-            'name': repo_name,
+            'owner': repository.owner,
+            'name': repository.repo_name,
             'description': repository.description,
             'language': repository.language
         },
-        'files': processed_files,
-        'total_files': len(processed_files)
-    })
+        'total_files': result['total_files'],
+        'failed_files': result['failed_files'],
+        'changes': result['stats'],
+        'embeddings': result['embeddings']
+    }
+    if files is not None:
+        response['files'] = files
+    else:
+        response['files_url'] = reverse('list_files', args=[repository.id])
+        response['tree_url'] = reverse('file_tree', args=[repository.id])
+    return response
+
+def _list_fields(request):
+    """Fields named by ?fields=a,b (in FILE_LIST_FIELDS), or None if one is unknown"""
+    requested = request.query_params.get('fields')
+    if not requested:
+        return list(FILE_LIST_DEFAULT_FIELDS)
+    fields = list(dict.fromkeys(field.strip() for field in requested.split(',') if field.strip()))
+    if not fields or any(field not in FILE_LIST_FIELDS for field in fields):
+        return None
+    return fields
+
+def _compact(rows, fields):
+    """Rows as value lists under one list of field names, instead of repeating the keys in every row"""
+    return [[row[field] for field in fields] for row in rows]
+
+@api_view(['GET'])
+def list_files(request, repository_id):
+    """Page through a repository's files in path order, without loading their content"""
+    repository = get_object_or_404(Repository, id=repository_id)
+    fields = _list_fields(request)
+    if fields is None:
+        return Response({'error': f"fields must be a comma-separated subset of {', '.join(FILE_LIST_FIELDS)}"}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get('limit', FILE_PAGE_SIZE)), 1), FILE_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    file_types = [file_type.strip() for file_type in request.query_params.get('type', '').split(',') if file_type.strip()]
+    prefix = request.query_params.get('prefix', '')
+    cursor = request.query_params.get('cursor') or None
+    
+    try:
+        files, next_cursor = FileListing.page(
+            repository, fields, file_types=file_types, prefix=prefix, cursor=cursor, limit=limit
+        )
+    except CursorError as e:
+        return Response({'error': str(e)}, status=400)
+    
+    response = {'repository_id': repository.id, 'next_cursor': next_cursor}
+    if cursor is None:
+        # Counted on the first page only; later pages do not pay for a full count again
+        response['total_files'] = FileListing.count(repository, file_types=file_types, prefix=prefix)
+    if request.query_params.get('layout') == 'compact':
+        response.update({'fields': fields, 'files': _compact(files, fields)})
+    else:
+        response['files'] = files
+    return Response(response)
+
+@api_view(['GET'])
+def file_tree(request, repository_id):
+    """One level of a repository's directory tree: the subdirectories and files directly inside ?path="""
+    repository = get_object_or_404(Repository, id=repository_id)
+    fields = _list_fields(request)
+    if fields is None:
+        return Response({'error': f"fields must be a comma-separated subset of {', '.join(FILE_LIST_FIELDS)}"}, status=400)
+    
+    level = FileListing.tree_level(repository, request.query_params.get('path', '').strip('/'), fields)
+    if request.query_params.get('layout') == 'compact':
+        level.update({'fields': fields, 'files': _compact(level['files'], fields)})
+    return Response({'repository_id': repository.id, **level})
 
 @api_view(['GET'])
 def preview_file(request, file_id):
     """Get file preview with syntax highlighting info"""
     try:
-        repo_file = get_object_or_404(RepositoryFile, id=file_id)
+        repo_file = get_object_or_404(RepositoryFile.objects.select_related('blob').defer('blob__data'), id=file_id)
         preview = repo_file.get_preview(lines=100)
         
         return Response({
@@ -101,22 +199,93 @@ def preview_file(request, file_id):
             'file_type': repo_file.file_type,
             'file_size': repo_file.file_size,
             'preview': preview,
-            'total_lines': len(repo_file.content.splitlines()),
+            'total_lines': repo_file.blob.line_count if repo_file.blob_id else 0,
             'analyzed': bool(repo_file.analysis)
         })
     except RepositoryFile.DoesNotExist:
         return Response({'error': 'File not found'}, status=404)
 
+@api_view(['GET'])
+def preview_file_lines(request, file_id):
+    """Return a range of lines of a file, located through the stored line index"""
+    repo_file = get_object_or_404(RepositoryFile.objects.select_related('blob'), id=file_id)
+    
+    try:
+        start = max(int(request.query_params.get('start', 1)), 1)
+        count = min(max(int(request.query_params.get('count', 100)), 1), PREVIEW_MAX_LINES)
+    except ValueError:
+        return Response({'error': 'start and count must be integers'}, status=400)
+    
+    total_lines = repo_file.blob.line_count if repo_file.blob_id else 0
+    lines = repo_file.blob.read_lines(start - 1, count) if repo_file.blob_id else []
+    
+    return Response({
+        'file_id': file_id,
+        'file_path': repo_file.file_path,
+        'start': start,
+        'end': start + len(lines) - 1,
+        'total_lines': total_lines,
+        'has_more': start - 1 + len(lines) < total_lines,
+        'lines': lines
+    })
+
+@api_view(['GET'])
+def file_relationships(request, file_id):
+    """List files related to a file through imports (optionally transitive) and shared directories"""
+    repo_file = get_object_or_404(RepositoryFile.objects.only('id', 'file_path', 'repository'), id=file_id)
+    
+    try:
+        depth = min(max(int(request.query_params.get('depth', 1)), 1), 5)
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+    except ValueError:
+        return Response({'error': 'depth and limit must be integers'}, status=400)
+    
+    return Response({
+        'file_id': repo_file.id,
+        'file_path': repo_file.file_path,
+        'depth': depth,
+        'relationships': MemoryService.get_file_relationships(repo_file.repository, repo_file.file_path, depth, limit)
+    })
+
+@api_view(['GET'])
+def find_symbols(request, repository_id):
+    """Go to definition: where classes, functions and methods of a repository are defined"""
+    repository = get_object_or_404(Repository, id=repository_id)
+    name = request.query_params.get('name', '').strip()
+    kind = request.query_params.get('kind') or None
+    if not name:
+        return Response({'error': 'name required'}, status=400)
+    if kind is not None and kind not in SYMBOL_KINDS:
+        return Response({'error': f"kind must be one of {', '.join(SYMBOL_KINDS)}"}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 50)), 1), SYMBOL_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    prefix = request.query_params.get('match', 'exact') == 'prefix'
+    
+    symbols = SymbolIndex.lookup(repository, name, kind=kind, prefix=prefix, limit=limit)
+    return Response({
+        'repository_id': repository.id,
+        'name': name,
+        'match': 'prefix' if prefix else 'exact',
+        'symbols': symbols,
+        'indexed': bool(symbols) or SymbolIndex.is_indexed(repository)
+    })
+
 @api_view(['POST'])
 def analyze_file(request):
     """Analyze a specific file using local LLM"""
     file_id = request.data.get('file_id')
     
     try:
-        repo_file = get_object_or_404(RepositoryFile, id=file_id)
+        repo_file = get_object_or_404(RepositoryFile.objects.select_related('blob'), id=file_id)
     except RepositoryFile.DoesNotExist:
         return Response({'error': 'File not found'}, status=404)
     
+    if _run_in_background(request):
+        job = JobService.enqueue(Job.KIND_ANALYZE_FILE, {'file_id': repo_file.id}, repository=repo_file.repository)
+        return _job_accepted(job)
+    
     # Initialize analyzer
     analyzer = FileAnalyzer()
     
@@ -125,16 +294,118 @@ def analyze_file(request):
     
     # Store analysis
     MemoryService.store_analysis(repo_file, analysis)
-    repo_file.analyzed_at = datetime.now()
-    repo_file.save()
     
     return Response({
         'file_id': file_id,
         'file_path': repo_file.file_path,
         'analysis': analysis,
-        'analyzed_at': repo_file.analyzed_at.isoformat()
+        'analyzed_at': repo_file.analyzed_at.isoformat(),
+        'token_usage': analyzer.usage.as_dict()
     })
 
+def _search_options(data):
+    """Parse the matching and paging parameters of a search request; raises SearchQueryError"""
+    mode = data.get('mode') or 'substring'
+    if mode not in SEARCH_MODES:
+        raise SearchQueryError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+    case_sensitive = data.get('case_sensitive', False)
+    if isinstance(case_sensitive, str):
+        case_sensitive = case_sensitive.lower() in ('1', 'true', 'yes')
+    operator = str(data.get('operator') or 'and').lower()
+    if operator not in ('and', 'or'):
+        raise SearchQueryError('operator must be "and" or "or"')
+    try:
+        page = int(data.get('page', 1))
+        page_size = int(data.get('page_size', SEARCH_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise SearchQueryError('page and page_size must be integers')
+    if page < 1 or not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        raise SearchQueryError(f'page must be at least 1 and page_size between 1 and {SEARCH_MAX_PAGE_SIZE}')
+    return {
+        'mode': mode, 'case_sensitive': bool(case_sensitive), 'require_all': operator == 'and',
+        'page': page, 'page_size': page_size,
+    }
+
+@metrics.timed('search_inputs')
+def _search_inputs(repository, search_query, options):
+    """Collect the file contents a search needs and run the exact-match search over them
+
+    Returns (files_content, matches, files_searched): the files the LLM prompt draws on,
+    ranked TextSearchEngine results and the repository file count.
+    Raises SearchQueryError for queries that cannot be compiled.
+    """
+    terms = parse_terms(search_query, options['mode'])
+    compile_terms(terms, options['mode'], options['case_sensitive'])
+    
+    files = RepositoryFile.objects.filter(repository=repository, blob__isnull=False)
+    files_searched = RepositoryFile.objects.filter(repository=repository).count()
+    indexed = SearchIndex.is_indexed(repository)
+    
+    # Whole words are always indexed identifiers, so postings rule files out for word mode;
+    # substring matches may start mid-identifier and are ruled out by trigram signatures.
+    # Only regex mode and terms too short for a trigram need every file scanned
+    scan_ids = None
+    if indexed and options['mode'] == 'word':
+        scan_ids = SearchIndex.candidate_files(repository, terms, options['require_all'])
+    elif indexed and options['mode'] == 'substring':
+        scan_ids = SearchIndex.substring_candidates(
+            repository, terms, options['case_sensitive'], options['require_all']
+        )
+    hits = SearchIndex.lookup(repository, search_query) if indexed and options['mode'] != 'regex' else None
+    
+    context_ids = None
+    if hits is not None:
+        # Every exact-match file plus the best partial matches for the LLM
+        context_ids = list(hits['lines']) + [
+            file_id for file_id in hits['ranked_files'][:SEARCH_CONTEXT_FILES] if file_id not in hits['lines']
+        ]
+    
+    if scan_ids is None or context_ids is None:
+        rows = files
+    else:
+        rows = files.filter(id__in=scan_ids | set(context_ids))
+    by_id = {
+        file_id: (file_path, FileBlob.decompress(data))
+        for file_id, file_path, data in rows.values_list('id', 'file_path', 'blob__data')
+    }
+    
+    scanned = dict(by_id.values()) if scan_ids is None else dict(by_id[i] for i in scan_ids if i in by_id)
+    matches = text_search_engine().search(
+        scanned, search_query, options['mode'], options['case_sensitive'], options['require_all'],
+        options['page'], options['page_size']
+    )
+    
+    if context_ids is None:
+        files_content = dict(by_id.values())
+    else:
+        ranked_ids = [file_id for file_id in hits['ranked_files'] if file_id in by_id]
+        files_content = {by_id[file_id][0]: by_id[file_id][1] for file_id in ranked_ids}
+    
+    return files_content, matches, files_searched
+
+def _search_response(search_query, search_results, files_searched, files_content, matches, snippets, token_usage):
+    return {
+        'search_query': search_query,
+        'results': search_results,
+        'files_searched': files_searched,
+        'candidate_files': len(files_content),
+        'matches': matches,
+        'retrieved_chunks': [
+            {key: snippet[key] for key in ('file_path', 'start_line', 'end_line', 'score')} for snippet in snippets or []
+        ],
+        'token_usage': token_usage
+    }
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
 @api_view(['POST'])
 def search_code(request):
     """Search code across repository"""
@@ -149,13 +420,16 @@ def search_code(request):
     except Repository.DoesNotExist:
         return Response({'error': 'Repository not found'}, status=404)
     
-    # Get all files content
-    files = RepositoryFile.objects.filter(repository=repository)
-    files_content = {f.file_path: f.content for f in files}
+    try:
+        files_content, matches, files_searched = _search_inputs(repository, search_query, _search_options(request.data))
+    except SearchQueryError as e:
+        return Response({'error': str(e)}, status=400)
+    # The chunks most similar to the query are what the LLM sees (None without usable embeddings)
+    snippets = EmbeddingIndex().search(repository, search_query)
     
     # Perform AI search
     analyzer = FileAnalyzer()
-    search_results = analyzer.search_code(files_content, search_query)
+    search_results = analyzer.search_code(files_content, search_query, snippets=snippets, matches=matches)
     
     # Store search results
     CodeSearch.objects.create(
@@ -164,11 +438,82 @@ def search_code(request):
         results=search_results
     )
     
-    return Response({
-        'search_query': search_query,
-        'results': search_results,
-        'files_searched': len(files_content)
-    })
+    return Response(_search_response(
+        search_query, search_results, files_searched, files_content, matches, snippets, analyzer.usage.as_dict()
+    ))
+
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def analyze_file_stream(request):
+    """Analyze a file, streaming the LLM output as Server-Sent Events"""
+    file_id = request.data.get('file_id')
+    repo_file = get_object_or_404(RepositoryFile.objects.select_related('blob'), id=file_id)
+    
+    def events():
+        analyzer = FileAnalyzer()
+        fragments = []
+        try:
+            for fragment in analyzer.analyze_file_stream(repo_file.content, repo_file.file_path):
+                fragments.append(fragment)
+                yield _sse('token', {'text': fragment})
+        except LLMStreamInterrupted as e:
+            # The client has a truncated analysis; it is neither stored nor cached
+            yield _sse('error', {'error': str(e), 'incomplete': True, 'file_id': repo_file.id})
+            return
+        
+        # Persist only once the whole analysis has been generated
+        MemoryService.store_analysis(repo_file, ''.join(fragments))
+        yield _sse('done', {
+            'file_id': repo_file.id,
+            'file_path': repo_file.file_path,
+            'analyzed_at': repo_file.analyzed_at.isoformat(),
+            'token_usage': analyzer.usage.as_dict()
+        })
+    
+    return _event_stream(events())
+
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def search_code_stream(request):
+    """Search code, streaming the results as Server-Sent Events"""
+    repository_id = request.data.get('repository_id')
+    search_query = request.data.get('search_query')
+    
+    if not repository_id or not search_query:
+        return Response({'error': 'Repository ID and search query required'}, status=400)
+    
+    repository = get_object_or_404(Repository, id=repository_id)
+    try:
+        files_content, matches, files_searched = _search_inputs(repository, search_query, _search_options(request.data))
+    except SearchQueryError as e:
+        return Response({'error': str(e)}, status=400)
+    snippets = EmbeddingIndex().search(repository, search_query)
+    
+    def events():
+        yield _sse('start', {
+            'files_searched': files_searched,
+            'candidate_files': len(files_content),
+            'total_files': matches['total_files'],
+            'total_matches': matches['total_matches'],
+            'retrieved_chunks': len(snippets or [])
+        })
+        
+        analyzer = FileAnalyzer()
+        fragments = []
+        try:
+            for fragment in analyzer.search_code_stream(
+                files_content, search_query, snippets=snippets, matches=matches
+            ):
+                fragments.append(fragment)
+                yield _sse('token', {'text': fragment})
+        except LLMStreamInterrupted as e:
+            yield _sse('error', {'error': str(e), 'incomplete': True, 'search_query': search_query})
+            return
+        
+        CodeSearch.objects.create(repository=repository, search_query=search_query, results=''.join(fragments))
+        yield _sse('done', {'search_query': search_query, 'matches': matches, 'token_usage': analyzer.usage.as_dict()})
+    
+    return _event_stream(events())
 
 @api_view(['GET'])
 def llm_status(request):
@@ -177,6 +522,92 @@ def llm_status(request):
     
     return Response({
         'ollama_available': analyzer.llm.is_available(),
+        'circuit_open': analyzer.llm.breaker.is_open,
         'available_models': analyzer.llm.get_available_models(),
-        'recommended_models': list(analyzer.llm.models.values())
+        'recommended_models': list(analyzer.llm.models.values()),
+        'context_windows': analyzer.llm.known_context_windows(),
+        'token_usage': analyzer.llm.usage.as_dict(),  # Since this process started
+        'analysis_cache': AnalysisCache.stats()
+    })
+
+def prometheus_metrics(request):
+    """This process's request, upstream and LLM metrics in the Prometheus text format"""
+    if not metrics.enabled():
+        raise Http404('Metrics are disabled')
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api_view(['POST'])
+def analyze_repository_files(request):
+    """Queue LLM analysis of every not-yet-analyzed file in a repository"""
+    repository = get_object_or_404(Repository, id=request.data.get('repository_id'))
+    
+    payload = {'repository_id': repository.id}
+    try:
+        for field, cast in (('concurrency', int), ('time_budget', float)):
+            if request.data.get(field) not in (None, ''):
+                payload[field] = cast(request.data[field])
+    except (TypeError, ValueError):
+        return Response({'error': 'concurrency and time_budget must be numbers'}, status=400)
+    
+    job = JobService.enqueue(Job.KIND_ANALYZE_REPOSITORY, payload, repository=repository)
+    return _job_accepted(job)
+
+@api_view(['POST'])
+def summarize_repository(request):
+    """Build or refresh the repository summary from its file analyses, one directory level at a time"""
+    repository = get_object_or_404(Repository, id=request.data.get('repository_id'))
+    
+    payload = {'repository_id': repository.id}
+    if request.data.get('concurrency') not in (None, ''):
+        try:
+            payload['concurrency'] = int(request.data['concurrency'])
+        except (TypeError, ValueError):
+            return Response({'error': 'concurrency must be a number'}, status=400)
+    
+    if _run_in_background(request):
+        job = JobService.enqueue(Job.KIND_SUMMARIZE_REPOSITORY, payload, repository=repository)
+        return _job_accepted(job)
+    
+    try:
+        result = RepositorySummarizer(concurrency=payload.get('concurrency')).run(repository)
+    except RuntimeError as e:
+        return Response({'error': str(e)}, status=503)
+    
+    return Response(result)
+
+@api_view(['GET'])
+def repository_summary(request, repository_id):
+    """Stored summary of the repository (or of the directory at ?path=) and of the directories below it"""
+    repository = get_object_or_404(Repository, id=repository_id)
+    path = request.query_params.get('path', '').strip('/')
+    
+    nodes = RepositorySummarizer.stored(repository, path)
+    top = next((node for node in nodes if node['path'] == path), None)
+    return Response({
+        'repository_id': repository.id,
+        'path': path,
+        'summary': top['summary'] if top else None,
+        'updated_at': top['updated_at'] if top else None,
+        'directories': [node for node in nodes if node['path'] != path],
     })
+
+@api_view(['GET'])
+def job_status(request, job_id):
+    """Report status, progress and errors of a background job"""
+    job = get_object_or_404(Job, id=job_id)
+    return Response(job.as_dict())
+
+@api_view(['GET'])
+def list_jobs(request):
+    """List recent background jobs, optionally for one repository"""
+    jobs = Job.objects.order_by('-created_at')
+    
+    repository_id = request.query_params.get('repository_id')
+    if repository_id:
+        jobs = jobs.filter(repository_id=repository_id)
+    
+    job_status_filter = request.query_params.get('status')
+    if job_status_filter:
+        jobs = jobs.filter(status=job_status_filter)
+    
+    return Response({'jobs': [job.as_dict() for job in jobs[:50]]})
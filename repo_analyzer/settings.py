@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'analyzer.middleware.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,9 +65,67 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,  # Wait for concurrent writers instead of failing with "database is locked"
+        },
     }
 }
 
+# Applied to every SQLite connection (see analyzer.apps.configure_sqlite).
+# WAL lets readers proceed during ingestion writes; synchronous=NORMAL is safe under WAL
+# and drops the fsync on every commit.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # 64 MB page cache
+    'mmap_size': 268435456,  # 256 MB
+}
+
+# Return a job id from analyze endpoints instead of doing the work in the request
+# (requests can override with "background": true/false). Jobs are run by `manage.py run_worker`.
+JOBS_BACKGROUND_DEFAULT = os.getenv('JOBS_BACKGROUND_DEFAULT', 'False').lower() == 'true'
+# Running jobs without a heartbeat for this long are requeued when a worker starts
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '600'))
+
+# Ollama
+OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+OLLAMA_PARALLEL = int(os.getenv('OLLAMA_PARALLEL', '2'))  # Concurrent generations for batch analysis (match OLLAMA_NUM_PARALLEL)
+OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', '10'))  # Keep-alive connections per process
+OLLAMA_HEALTH_TTL = int(os.getenv('OLLAMA_HEALTH_TTL', '30'))  # Seconds to trust the last /api/tags probe
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv('OLLAMA_BREAKER_THRESHOLD', '3'))  # Consecutive connection failures before skipping Ollama
+OLLAMA_REPROBE_INTERVAL = int(os.getenv('OLLAMA_REPROBE_INTERVAL', '10'))  # Seconds between background re-probes
+OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', '8192'))  # Context window cap; prompts are sized to fit it
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '100'))  # Per event loop, for the /api/async/ views
+
+# Upper bound for stored LLM analyses; least recently used entries are evicted beyond it
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Files longer than one analysis prompt are analyzed chunk by chunk, then the notes are merged
+ANALYSIS_CHUNK_CHARS = int(os.getenv('ANALYSIS_CHUNK_CHARS', '3500'))
+ANALYSIS_CHUNK_BUDGET = float(os.getenv('ANALYSIS_CHUNK_BUDGET', '90'))  # Seconds for the per-chunk pass of one file
+
+# Semantic search: chunk embeddings from Ollama, one memory-mapped matrix per repository
+OLLAMA_EMBED_MODEL = os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+EMBEDDINGS_DIR = Path(os.getenv('EMBEDDINGS_DIR', str(BASE_DIR / 'embeddings')))
+EMBEDDING_CHUNK_CHARS = int(os.getenv('EMBEDDING_CHUNK_CHARS', '800'))
+SEARCH_TOP_K = int(os.getenv('SEARCH_TOP_K', '5'))  # Chunks given to the LLM per search
+
+# Exact-match search: repositories with more text than this are scanned by a process pool
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', str(os.cpu_count() or 1)))
+SEARCH_PARALLEL_MIN_BYTES = int(os.getenv('SEARCH_PARALLEL_MIN_BYTES', str(4 * 1024 * 1024)))
+
+# Symbol table: ingested source is parsed by a process pool once there is this much of it
+SYMBOL_WORKERS = int(os.getenv('SYMBOL_WORKERS', str(os.cpu_count() or 1)))
+SYMBOL_PARALLEL_MIN_BYTES = int(os.getenv('SYMBOL_PARALLEL_MIN_BYTES', str(2 * 1024 * 1024)))
+
+# Rows per bulk_create/bulk_update chunk when persisting ingested files
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+
+# Request metrics: per-request timings and query counts, upstream GitHub/Ollama call stats and LLM
+# token throughput, served at /metrics and in Server-Timing headers. Off adds no overhead.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -83,6 +142,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # API Keys
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+
+# How repository contents are downloaded: 'api' (one request per file) or
+# 'tarball'/'zipball' (the whole archive in a single request)
+GITHUB_INGEST_MODE = os.getenv('GITHUB_INGEST_MODE', 'api')
+
+# Number of parallel GitHub content requests used while ingesting a repository
+GITHUB_FETCH_CONCURRENCY = int(os.getenv('GITHUB_FETCH_CONCURRENCY', '8'))
+
+# GitHub rate limiting: retries for 403/429/5xx responses, the longest wait (seconds) for a
+# Retry-After or a rate-limit reset before giving up, and the fraction of the hourly budget
+# below which requests are spread out until the reset instead of sent at once
+GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+GITHUB_RATE_LIMIT_MAX_WAIT = int(os.getenv('GITHUB_RATE_LIMIT_MAX_WAIT', '300'))
+GITHUB_RATE_LIMIT_RESERVE = float(os.getenv('GITHUB_RATE_LIMIT_RESERVE', '0.1'))
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG